@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+# Persistent connections belong to a thread, and under ASGI each request's
+# queries run in a thread of their own, so they would never be reused or
+# closed. Use DB_POOL on PostgreSQL instead.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
 application = get_asgi_application()
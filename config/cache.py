@@ -0,0 +1,54 @@
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_from_url(url, base_dir=None, key_prefix='', timeout=300):
+    """
+    Build a CACHES entry from a URL
+
+    locmem://name is a per-process cache, file:///cache is a directory relative
+    to base_dir (file:////var/cache/cognicare is absolute), redis://host:port/db
+    or rediss:// is any Redis-protocol server (needs the redis package) and
+    dummy:// caches nothing. For locmem and file the query string sets
+    max_entries and cull_frequency; for Redis it goes to the client.
+    """
+    parts = urlsplit(url)
+    backend = BACKENDS.get(parts.scheme)
+    if backend is None:
+        raise ImproperlyConfigured(f'Unsupported cache URL scheme {parts.scheme!r}, expected one of {", ".join(BACKENDS)}')
+
+    config = {
+        'BACKEND': backend,
+        'KEY_PREFIX': key_prefix,
+        'TIMEOUT': timeout,
+    }
+
+    if backend == BACKENDS['redis']:
+        # redis-py reads host, db, password and options from the URL itself
+        config['LOCATION'] = url
+        return config
+
+    options = {key.upper(): int(value) for key, value in parse_qsl(parts.query)}
+    if options:
+        config['OPTIONS'] = options
+
+    if backend == BACKENDS['file']:
+        path = unquote(parts.path)[1:]
+        if not path:
+            raise ImproperlyConfigured('A file cache URL needs a directory, e.g. file:///cache')
+        if not Path(path).is_absolute() and base_dir is not None:
+            path = Path(base_dir) / path
+        config['LOCATION'] = str(path)
+    elif backend == BACKENDS['locmem']:
+        config['LOCATION'] = parts.netloc or 'default'
+    return config
@@ -10,15 +10,18 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
-function loadPatientNotes(patientId, container) {
-    fetch(`/taskmanager/get-patient-notes/${patientId}/`, {
+function loadPatientNotes(patientId, container, after) {
+    // after is the next_cursor of the page already shown, to append the page after it
+    const query = after ? `?after=${encodeURIComponent(after)}` : '';
+    fetch(`/taskmanager/get-patient-notes/${patientId}/${query}`, {
         method: 'GET',
         headers: { 'X-CSRFToken': getCookie('csrftoken') }
     })
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            displayNotes(container, data.notes);
+            displayNotes(container, data.notes, Boolean(after));
+            addLoadMoreButton(patientId, container, data.next_cursor);
         } else {
             container.innerHTML = '<div class="empty-state"><p>Error loading notes: ' + data.message + '</p></div>';
         }
@@ -29,13 +32,13 @@ function loadPatientNotes(patientId, container) {
     });
 }
 
-function displayNotes(container, notes) {
-    if (notes.length === 0) {
+function displayNotes(container, notes, append) {
+    if (notes.length === 0 && !append) {
         container.innerHTML = '<div class="empty-state"><p>📝 No notes from provider yet.</p></div>';
         return;
     }
     
-    let notesHtml = '<div class="notes-list">';
+    let notesHtml = '';
     notes.forEach(note => {
         notesHtml += `
             <div class="note-item">
@@ -47,8 +50,33 @@ function displayNotes(container, notes) {
             </div>
         `;
     });
-    notesHtml += '</div>';
-    container.innerHTML = notesHtml;
+    if (append) {
+        container.querySelector('.notes-list').insertAdjacentHTML('beforeend', notesHtml);
+    } else {
+        container.innerHTML = '<div class="notes-list">' + notesHtml + '</div>';
+    }
+}
+
+function addLoadMoreButton(patientId, container, nextCursor) {
+    const existing = container.querySelector('.load-more');
+    if (existing) {
+        existing.remove();
+    }
+    if (!nextCursor) {
+        return;
+    }
+    const wrapper = document.createElement('div');
+    wrapper.className = 'load-more';
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.className = 'action-btn outline-btn';
+    button.textContent = 'Load more';
+    button.addEventListener('click', () => {
+        button.disabled = true;
+        loadPatientNotes(patientId, container, nextCursor);
+    });
+    wrapper.appendChild(button);
+    container.appendChild(wrapper);
 }
 
 function getCookie(name) {
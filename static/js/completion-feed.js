@@ -0,0 +1,26 @@
+// Live feed of task and checklist completions
+
+// Opened by dashboards that include this script with data-feed-url. The browser
+// reconnects on its own, and sends the last event id so missed events are replayed
+(function() {
+    const feedUrl = document.currentScript && document.currentScript.dataset.feedUrl;
+    if (!feedUrl || !window.EventSource) {
+        return;
+    }
+
+    const source = new EventSource(feedUrl);
+
+    source.addEventListener('completion', function(event) {
+        const completion = JSON.parse(event.data);
+        CogniCare.utils.showNotification(completion.message, 'success');
+    });
+
+    // Sent when more happened while disconnected than the server replays
+    source.addEventListener('reset', function() {
+        CogniCare.utils.showNotification('There is new activity - refresh the page to see it', 'info');
+    });
+
+    window.addEventListener('pagehide', function() {
+        source.close();
+    });
+})();
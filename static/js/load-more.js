@@ -0,0 +1,44 @@
+// "Load more" for keyset-paged lists
+
+// Each [data-load-more="<list>"] link fetches the next page of rows and appends
+// them to the matching [data-list="<list>"] container instead of reloading the page
+document.addEventListener('click', function(event) {
+    const link = event.target.closest('[data-load-more]');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+
+    const listName = link.dataset.loadMore;
+    const container = document.querySelector(`[data-list="${listName}"]`);
+    if (!container || link.classList.contains('loading')) {
+        return;
+    }
+    link.classList.add('loading');
+
+    fetch(link.href, {
+        method: 'GET',
+        headers: { 'X-Requested-With': 'XMLHttpRequest' }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.message);
+        }
+        container.insertAdjacentHTML('beforeend', data.html);
+        if (data.next_cursor) {
+            const url = new URL(link.href);
+            url.searchParams.set('after', data.next_cursor);
+            link.href = url.toString();
+            link.classList.remove('loading');
+        } else {
+            link.parentElement.remove();
+        }
+    })
+    .catch(error => {
+        console.error('Error loading more rows:', error);
+        link.classList.remove('loading');
+        // fall back to a full page load of the next page
+        window.location.href = link.href;
+    });
+});
@@ -293,7 +293,7 @@ document.addEventListener('DOMContentLoaded', function () {
             fetch(form.action, {
                 method: 'POST',
                 headers: {
-                    'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value,
+                    'X-CSRFToken': getCookie('csrftoken'),
                     'Accept': 'application/json'
                 }
             })
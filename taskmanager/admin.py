@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Task, QuestionnaireTemplate, TaskResponse, TaskNotification, DailyChecklistSubmission
+from .services.job_service import JobService
+from .models import Task, QuestionnaireTemplate, TaskResponse, TaskNotification, DailyChecklistSubmission, PatientDailyActivity, ArchivedTask, UnreadNotificationCount, CompletionEvent, Job, TaskReminder
 
 
 # Admin configs
@@ -48,13 +49,20 @@ class TaskResponseAdmin(admin.ModelAdmin):
     search_fields = ['task__title', 'task__assigned_to__user__username']
     readonly_fields = ['started_at']
 
-# task notification
+# task notification - read_at is counted by NotificationService, so it is read only here
 @admin.register(TaskNotification)
 class TaskNotificationAdmin(admin.ModelAdmin):
     list_display = ['task', 'recipient', 'notification_type', 'created_at', 'read_at']
     list_filter = ['notification_type', 'created_at', 'read_at']
     search_fields = ['task__title', 'recipient__user__username', 'message']
-    readonly_fields = ['created_at']
+    readonly_fields = ['created_at', 'read_at']
+
+# unread counters - maintained by NotificationService, read only here
+@admin.register(UnreadNotificationCount)
+class UnreadNotificationCountAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'unread']
+    search_fields = ['recipient__user__username']
+    readonly_fields = ['recipient', 'unread']
 
 # daily checklist submission
 @admin.register(DailyChecklistSubmission)
@@ -77,3 +85,52 @@ class DailyChecklistSubmissionAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+# daily activity rollup - maintained by ActivityService, read only here
+@admin.register(PatientDailyActivity)
+class PatientDailyActivityAdmin(admin.ModelAdmin):
+    list_display = ['patient', 'provider', 'task_type', 'activity_date', 'tasks_assigned', 'tasks_completed', 'checklists_submitted']
+    list_filter = ['task_type', 'activity_date']
+    search_fields = ['patient__user__username', 'provider__user__username']
+    readonly_fields = ['patient', 'provider', 'task_type', 'activity_date', 'tasks_assigned', 'tasks_completed', 'checklists_submitted']
+
+# archived tasks - written by ArchiveService, read only here
+@admin.register(ArchivedTask)
+class ArchivedTaskAdmin(admin.ModelAdmin):
+    list_display = ['task_id', 'title', 'task_type', 'assigned_by', 'assigned_to', 'completed_at', 'score', 'archived_at']
+    list_filter = ['task_type', 'completed_at', 'archived_at']
+    search_fields = ['title', 'assigned_to__user__username', 'assigned_by__user__username']
+    # the compressed payload isn't editable here
+    exclude = ['payload']
+    readonly_fields = ['task_id', 'title', 'task_type', 'difficulty', 'assigned_by', 'assigned_to', 'completed_by',
+                       'created_at', 'due_date', 'completed_at', 'score', 'archived_at']
+
+# due-date reminders sent - written by ReminderService, read only here
+@admin.register(TaskReminder)
+class TaskReminderAdmin(admin.ModelAdmin):
+    list_display = ['task', 'window', 'due_date', 'sent_at']
+    list_filter = ['window', 'sent_at']
+    search_fields = ['task__title', 'task__assigned_to__user__username']
+    readonly_fields = ['task', 'window', 'due_date', 'sent_at']
+
+# live feed events - written by CompletionFeedService, read only here
+@admin.register(CompletionEvent)
+class CompletionEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event_type', 'patient', 'provider', 'message', 'created_at']
+    list_filter = ['event_type', 'created_at']
+    search_fields = ['patient__user__username', 'provider__user__username']
+    readonly_fields = ['patient', 'provider', 'event_type', 'object_id', 'message', 'created_at']
+
+# background jobs - run by the run_jobs worker; failed ones can be queued again here
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'created_at', 'run_after', 'finished_at']
+    list_filter = ['status', 'name', 'created_at']
+    readonly_fields = ['name', 'kwargs', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'last_error',
+                       'created_at', 'started_at', 'finished_at']
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected failed jobs')
+    def retry_jobs(self, request, queryset):
+        count = JobService.retry(queryset)
+        self.message_user(request, f'Queued {count} failed job(s) again')
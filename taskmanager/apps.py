@@ -4,3 +4,20 @@ from django.apps import AppConfig
 # config class for app
 class TaskmanagerConfig(AppConfig):
     name = 'taskmanager'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from users.models import UserProfile
+        from .caching import profile_changed, user_changed
+        from .db import configure_sqlite_connection
+
+        # tune every new SQLite connection with the SQLITE_PROFILE pragmas
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='taskmanager_sqlite_profile')
+
+        # names and caregiver links are shown on the dashboards, so invalidate
+        # the namespaces they appear in (caching.py) when they change
+        post_save.connect(user_changed, sender=User, dispatch_uid='taskmanager_user_saved')
+        post_save.connect(profile_changed, sender=UserProfile, dispatch_uid='taskmanager_profile_saved')
+        post_delete.connect(profile_changed, sender=UserProfile, dispatch_uid='taskmanager_profile_deleted')
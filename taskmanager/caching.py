@@ -0,0 +1,198 @@
+"""
+Namespaced cache keys invalidated by version counters
+
+Each cached value depends on one or more namespaces, a provider's or a
+patient's data, and its key carries the current version of each of them:
+
+    task_stats:provider:7 -> task_stats:provider:7@1718031547123456789
+
+A write bumps the versions of the namespaces it touched once it commits.
+From then on every key under them misses and is rebuilt, and the old
+entries expire on their own; nothing has to find and delete them.
+
+The version counters live in the cache itself, so a bump in one worker is
+seen by all workers sharing that cache (see CACHE_URL in settings).
+
+Dashboard templates cache whole panels the same way with {% cachefragment %}
+(templatetags/fragment_cache.py), and count their hits and misses here.
+"""
+from typing import Callable, Dict, Iterable, List, Tuple
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from users.models import UserProfile
+from .db import use_primary
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Namespace covering every task, for the global statistics
+TASKS_NAMESPACE = 'tasks'
+
+VERSION_KEY = 'version:{}'
+CACHE_TIMEOUT = 300  # seconds
+BUILD_LOCK_TIMEOUT = 10  # seconds a rebuild may hold the lock
+BUILD_LOCK_WAIT = 2.0  # seconds other requests wait for the rebuild
+BUILD_LOCK_POLL = 0.05
+
+# Dashboard fragment cache settings
+FRAGMENT_TIMEOUT = 600  # seconds
+FRAGMENT_STATS_KEY = 'fragment_stats:{}:{}'
+# Fragments reported by fragment_cache_stats
+DASHBOARD_FRAGMENTS = (
+    'provider_assign',
+    'provider_patient_select',
+    'provider_patients',
+    'provider_caregivers',
+    'caregiver_patient',
+    'patient_panels',
+)
+
+_MISSING = object()
+
+
+def is_shared() -> bool:
+    """
+    Whether other processes see this process's cache
+
+    The locmem backend is private to one process, so versions bumped by a job
+    worker or the reminder loop would never reach the web workers.
+    """
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def provider_namespace(provider_id) -> str:
+    return f'provider:{provider_id}'
+
+
+def patient_namespace(patient_id) -> str:
+    return f'patient:{patient_id}'
+
+
+def inbox_namespace(profile_id) -> str:
+    """A recipient's notifications and unread count"""
+    return f'inbox:{profile_id}'
+
+
+def profile_namespaces(profile) -> List[str]:
+    """The namespaces a profile's name and links are shown in"""
+    namespaces = []
+    if profile.user_type == 'provider':
+        namespaces.append(provider_namespace(profile.pk))
+    elif profile.user_type == 'patient':
+        namespaces.append(patient_namespace(profile.pk))
+    if profile.patient_id:
+        namespaces.append(patient_namespace(profile.patient_id))
+    if profile.provider_id:
+        namespaces.append(provider_namespace(profile.provider_id))
+    return namespaces
+
+
+def get_versions(namespaces: Iterable[str]) -> Dict[str, int]:
+    """The current version of each namespace, starting any that have none"""
+    keys = {VERSION_KEY.format(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # Seed from the clock so an evicted version never reuses an old number;
+        # add() is a no-op if another worker already set it
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {namespace: found[key] for key, namespace in keys.items()}
+
+
+def make_key(name: str, *namespaces: str) -> str:
+    """The key of a value depending on namespaces, at their current versions"""
+    versions = get_versions(namespaces)
+    return ':'.join([name, *(f'{namespace}@{versions[namespace]}' for namespace in namespaces)])
+
+
+def get_or_build(name: str, namespaces: Iterable[str], build: Callable, timeout: int = CACHE_TIMEOUT):
+    """
+    The cached value of name under namespaces, calling build() on a miss
+
+    Only one request builds a cold key; the others wait briefly for its
+    result instead of all hitting the database. build() reads from the
+    primary, since a lagging replica would pin old data under the new version.
+    """
+    key = make_key(name, *namespaces)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, BUILD_LOCK_TIMEOUT):
+        # Someone else is building this key - wait for their result
+        deadline = time.monotonic() + BUILD_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(BUILD_LOCK_POLL)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        logger.warning(f'Timed out waiting for cache rebuild of {name}')
+        # Not cached, but still at least as new as the versions in the key
+        with use_primary():
+            return build()
+
+    try:
+        with use_primary():
+            value = build()
+        cache.set(key, value, timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def bump(*namespaces: str) -> None:
+    """Invalidate everything cached under the namespaces once the current transaction commits"""
+    namespaces = set(namespaces)
+    if namespaces:
+        transaction.on_commit(lambda: _bump_versions(namespaces))
+
+
+def _bump_versions(namespaces) -> None:
+    # A version missing from the cache has nothing cached under it - the next
+    # read seeds a fresh one. Where incr() isn't atomic (the file cache) two
+    # bumps may land on the same number, which is still newer than any reader's
+    for namespace in namespaces:
+        try:
+            cache.incr(VERSION_KEY.format(namespace))
+        except ValueError:
+            pass
+
+
+def record_fragment(name: str, hit: bool) -> None:
+    """Count a hit or miss of a cached template fragment"""
+    key = FRAGMENT_STATS_KEY.format(name, 'hits' if hit else 'misses')
+    try:
+        cache.incr(key)
+    except ValueError:
+        # First count - if another worker just added it, count on top of theirs
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_fragment_stats(names: Iterable[str] = DASHBOARD_FRAGMENTS) -> Dict[str, Tuple[int, int]]:
+    """(hits, misses) of each template fragment since the counters were last reset"""
+    keys = {name: (FRAGMENT_STATS_KEY.format(name, 'hits'), FRAGMENT_STATS_KEY.format(name, 'misses')) for name in names}
+    counts = cache.get_many([key for pair in keys.values() for key in pair])
+    return {name: (counts.get(hits, 0), counts.get(misses, 0)) for name, (hits, misses) in keys.items()}
+
+
+def reset_fragment_stats(names: Iterable[str] = DASHBOARD_FRAGMENTS) -> None:
+    cache.delete_many([FRAGMENT_STATS_KEY.format(name, kind) for name in names for kind in ('hits', 'misses')])
+
+
+# Signal receivers, connected in TaskmanagerConfig.ready
+
+def profile_changed(sender, instance, **kwargs):
+    bump(*profile_namespaces(instance))
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which no page shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    profile = UserProfile.objects.filter(user_id=instance.pk).first()
+    if profile is not None:
+        bump(*profile_namespaces(profile))
@@ -26,6 +26,9 @@ TASK_STATUS = (
     ('completed', 'Completed'),
 )
 
+# Statuses that still need work from the patient
+PENDING_STATUSES = ('assigned', 'in_progress')
+
 # Task Templates Configuration
 TASK_TEMPLATES = {
     'puzzle': {
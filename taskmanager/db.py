@@ -0,0 +1,104 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Alias of the read replica in DATABASES
+REPLICA_DB_ALIAS = 'replica'
+# Cookie that keeps a client's reads on the primary for a while after it writes
+REPLICA_PIN_COOKIE = 'db_pin_primary'
+
+# Set for the duration of a read_replica view; cleared by the first write
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def get_sqlite_pragmas(profile_name: Optional[str] = None) -> List[Tuple[str, object]]:
+    """The (pragma, value) pairs of a SQLITE_PROFILES entry, the SQLITE_PROFILE one by default"""
+    profile_name = profile_name or settings.SQLITE_PROFILE
+    try:
+        profile = settings.SQLITE_PROFILES[profile_name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'Unknown SQLITE_PROFILE {profile_name!r}, expected one of {", ".join(settings.SQLITE_PROFILES)}'
+        )
+    return list(profile.items())
+
+
+def apply_sqlite_pragmas(cursor, pragmas: List[Tuple[str, object]]) -> None:
+    """Run each PRAGMA on a DB-API cursor; journal_mode goes first so the rest apply to the new mode"""
+    for name, value in sorted(pragmas, key=lambda pragma: pragma[0] != 'journal_mode'):
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs) -> None:
+    """connection_created receiver that tunes each new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_sqlite_pragmas()
+    if not pragmas:
+        return
+
+    cursor = connection.connection.cursor()
+    try:
+        apply_sqlite_pragmas(cursor, pragmas)
+    finally:
+        cursor.close()
+    logger.debug(f'Applied SQLite profile {settings.SQLITE_PROFILE} to {connection.alias}')
+
+
+def replica_configured() -> bool:
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Send reads in this block to the replica, if one is configured"""
+    token = _use_replica.set(replica_configured())
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Send reads in this block to the primary, e.g. to fill a shared cache"""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Route reads inside use_replica() to the replica and everything else to the primary
+
+    Once a request writes, or opens a transaction on the primary, its later
+    reads go to the primary as well so it always sees its own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or model._meta.app_label == 'sessions':
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Pin the rest of the request, and never write an instance back to the replica it came from
+        _use_replica.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != REPLICA_DB_ALIAS
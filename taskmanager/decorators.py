@@ -1,8 +1,11 @@
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.contrib import messages
 from users.models import UserProfile
+from .db import REPLICA_PIN_COOKIE, use_replica
+from .identity import get_identity
 
 
 def ajax_required(f):
@@ -19,7 +22,7 @@ def provider_api(f):
     """Decorator for provider API endpoints"""
     @wraps(f)
     def wrap(request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'provider':
+        if not get_identity(request).has_role('provider'):
             return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
         return f(request, *args, **kwargs)
     return wrap
@@ -29,7 +32,7 @@ def admin_api(f):
     """Decorator for admin API endpoints"""
     @wraps(f)
     def wrap(request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'admin':
+        if not get_identity(request).has_role('admin'):
             return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
         return f(request, *args, **kwargs)
     return wrap
@@ -39,7 +42,7 @@ def patient_or_caregiver_api(f):
     """Decorator for patient or caregiver API endpoints"""
     @wraps(f)
     def wrap(request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type not in ['patient', 'caregiver']:
+        if not get_identity(request).has_role('patient', 'caregiver'):
             return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
         return f(request, *args, **kwargs)
     return wrap
@@ -56,7 +59,7 @@ def validate_patient_access(patient_id_param='patient_id'):
             
             try:
                 patient_profile = UserProfile.objects.get(id=patient_id, user_type='patient')
-                if patient_profile.provider != request.user.profile:
+                if not get_identity(request).manages(patient_profile):
                     return JsonResponse({'success': False, 'message': 'You do not have permission to access this patient.'}, status=403)
                 # Add patient to kwargs for the view function
                 kwargs['patient_profile'] = patient_profile
@@ -79,4 +82,29 @@ def json_response(f):
             return result
         except Exception as e:
             return JsonResponse({'success': False, 'message': str(e)}, status=500)
-    return wrap 
\ No newline at end of file
+    return wrap
+
+
+def read_replica(f):
+    """Decorator to serve a read-only view, sync or async, from the read replica"""
+    def stays_on_primary(request):
+        # Writes, and clients pinned by ReplicaPinMiddleware after their own writes, stay on the primary
+        return request.method not in ('GET', 'HEAD') or REPLICA_PIN_COOKIE in request.COOKIES
+
+    if iscoroutinefunction(f):
+        # The router's context variable is copied into the threads the async ORM runs queries in
+        @wraps(f)
+        async def wrap(request, *args, **kwargs):
+            if stays_on_primary(request):
+                return await f(request, *args, **kwargs)
+            with use_replica():
+                return await f(request, *args, **kwargs)
+    else:
+        @wraps(f)
+        def wrap(request, *args, **kwargs):
+            if stays_on_primary(request):
+                return f(request, *args, **kwargs)
+            with use_replica():
+                return f(request, *args, **kwargs)
+    wrap.read_replica = True
+    return wrap
@@ -0,0 +1,169 @@
+"""
+In-process fan-out of completion events to the live feed's listeners
+
+Completions are appended to CompletionEvent (see CompletionFeedService).
+Each event loop serving feed streams - one per ASGI worker process - runs a
+single CompletionFeedHub. While anyone listens, it reads the events after
+the last one it saw once every FEED_POLL_INTERVAL seconds, and at once when
+a commit in this process wakes it. It hands each event to the listeners
+following that provider or patient. An idle listener is a parked coroutine
+and a small queue, so a worker holding thousands of them still runs one
+indexed query a second.
+
+Ids are handed out when a row is inserted, not when it commits, so with
+concurrent writers (PostgreSQL) an event can become visible after one with a
+higher id has been read. The hub keeps the ids it skipped as gaps and reads
+them again with each check for FEED_GAP_TIMEOUT seconds, handing out any that
+turn up late.
+"""
+from collections import defaultdict
+from typing import Dict, Set
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+from .services.completion_feed_service import CompletionFeedService
+
+logger = logging.getLogger(__name__)
+
+FEED_POLL_INTERVAL = 1.0  # seconds between checks for events written by other processes
+FEED_BATCH_SIZE = 200  # events read per check
+FEED_QUEUE_SIZE = 100  # events a listener may fall behind by before it is dropped
+FEED_GAP_TIMEOUT = 10.0  # seconds a skipped id is read again, in case it commits late
+FEED_MAX_GAPS = 1000  # skipped ids tracked per jump; older ones are given up on
+
+# One hub per event loop; the lock guards the mapping against wake_listeners in other threads
+_hubs = weakref.WeakKeyDictionary()
+_hubs_lock = threading.Lock()
+
+
+class Listener:
+    """One open feed stream, and the events waiting to be sent on it"""
+
+    def __init__(self, identity):
+        self.identity = identity
+        self.key = CompletionFeedService.listener_key(identity)
+        self.queue = asyncio.Queue(FEED_QUEUE_SIZE)
+        # Set when the client falls too far behind; the stream then ends and
+        # the client reconnects and catches up from Last-Event-ID
+        self.overflowed = False
+
+    def offer(self, event: Dict) -> None:
+        if self.overflowed or not CompletionFeedService.is_visible(event, self.identity):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class CompletionFeedHub:
+    """Reads new completion events and hands them to this event loop's listeners"""
+
+    def __init__(self):
+        self.listeners: Dict[tuple, Set[Listener]] = defaultdict(set)
+        # Highest event id read; None while nobody listens
+        self.last_id = None
+        # Ids below last_id not read yet, and when to stop looking for them
+        self.gaps: Dict[int, float] = {}
+        self._wake = asyncio.Event()
+        self._start_lock = asyncio.Lock()
+        self._poller = None
+
+    async def subscribe(self, listener: Listener) -> int:
+        """
+        Start handing events to a listener
+
+        Returns:
+            int: id of the last event read before it subscribed; every
+            later one will be offered to it
+        """
+        self.listeners[listener.key].add(listener)
+        async with self._start_lock:
+            if self.last_id is None:
+                self.last_id = await CompletionFeedService.alatest_event_id()
+            if self._poller is None:
+                self._poller = asyncio.create_task(self._poll())
+        return self.last_id
+
+    def unsubscribe(self, listener: Listener) -> None:
+        listeners = self.listeners.get(listener.key)
+        if listeners is not None:
+            listeners.discard(listener)
+            if not listeners:
+                del self.listeners[listener.key]
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _poll(self):
+        try:
+            while self.listeners:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), FEED_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                self._expire_gaps()
+                try:
+                    events = await CompletionFeedService.aget_new_events(self.last_id, FEED_BATCH_SIZE, list(self.gaps))
+                except Exception:
+                    logger.exception('Could not read new completion events')
+                    continue
+                for event in events:
+                    self._advance(event['id'])
+                    self._dispatch(event)
+                if len(events) == FEED_BATCH_SIZE:
+                    # More are waiting
+                    self._wake.set()
+        finally:
+            # The next subscriber starts from the latest event again
+            self._poller = None
+            self.last_id = None
+            self.gaps = {}
+
+    def _advance(self, event_id: int) -> None:
+        """Note an event as read: fill its gap, or move last_id up to it and keep the ids it skipped"""
+        if event_id <= self.last_id:
+            self.gaps.pop(event_id, None)
+            return
+        skipped = range(max(self.last_id + 1, event_id - FEED_MAX_GAPS), event_id)
+        if skipped.start > self.last_id + 1:
+            logger.warning(f'Completion feed skipped {event_id - self.last_id - 1} ids, watching the last {FEED_MAX_GAPS}')
+        deadline = time.monotonic() + FEED_GAP_TIMEOUT
+        self.gaps.update(dict.fromkeys(skipped, deadline))
+        self.last_id = event_id
+
+    def _expire_gaps(self) -> None:
+        # Rolled back inserts leave ids that never commit
+        now = time.monotonic()
+        self.gaps = {event_id: deadline for event_id, deadline in self.gaps.items() if deadline > now}
+
+    def _dispatch(self, event: Dict) -> None:
+        for key in (('provider', event['provider_id']), ('patient', event['patient_id'])):
+            for listener in self.listeners.get(key, ()):
+                listener.offer(event)
+
+
+def get_hub() -> CompletionFeedHub:
+    """The hub of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _hubs_lock:
+        hub = _hubs.get(loop)
+        if hub is None:
+            hub = _hubs[loop] = CompletionFeedHub()
+    return hub
+
+
+def wake_listeners() -> None:
+    """Have every hub in this process check for new events now - safe to call from any thread"""
+    with _hubs_lock:
+        hubs = list(_hubs.items())
+    for loop, hub in hubs:
+        try:
+            loop.call_soon_threadsafe(hub.wake)
+        except RuntimeError:
+            # The loop has closed
+            pass
@@ -0,0 +1,87 @@
+"""
+Work that runs outside the request, in the run_jobs worker
+
+Each function here is registered under its name with @job and queued with
+JobService.enqueue(name, **kwargs). kwargs come back from JSON, so jobs take
+ids and ISO 8601 times. A job can run more than once - after a failed
+attempt, or when a worker dies mid-job - so each must be safe to repeat.
+"""
+from contextlib import suppress
+from typing import Callable, Dict, List, Optional
+from django.utils.dateparse import parse_datetime
+
+from users.models import UserProfile
+from .models import Task
+from .services.account_service import AccountService
+from .services.job_service import JOB_MAX_ATTEMPTS
+from .services.notification_service import NotificationService
+from .services.task_service import TaskService
+
+JOBS: Dict[str, Callable] = {}
+
+
+def job(max_attempts: int = JOB_MAX_ATTEMPTS):
+    """Register a function as a job under its name"""
+    def register(function):
+        function.max_attempts = max_attempts
+        JOBS[function.__name__] = function
+        return function
+    return register
+
+
+def _profile(profile_id: Optional[int]) -> Optional[UserProfile]:
+    if profile_id is None:
+        return None
+    return UserProfile.objects.get(id=profile_id)
+
+
+def _time(value: Optional[str]):
+    return parse_datetime(value) if value else None
+
+
+# Notifications
+
+@job()
+def notify_assigned(task_ids: List[int]):
+    NotificationService.notify_assigned(task_ids)
+
+
+@job()
+def notify_completed(task_id: int):
+    task = Task.objects.filter(id=task_id).first()
+    if task is not None:
+        NotificationService.notify_completed(task)
+
+
+# Bulk task operations, limited to the tasks there were when they were queued.
+# A profile deleted since took its tasks with it, so there's nothing left to do.
+
+@job(max_attempts=3)
+def clear_all_tasks(provider_id: Optional[int] = None, created_before: Optional[str] = None):
+    with suppress(UserProfile.DoesNotExist):
+        TaskService.clear_all_tasks(_profile(provider_id), created_before=_time(created_before))
+
+
+@job(max_attempts=3)
+def reset_task_responses(provider_id: Optional[int] = None, created_before: Optional[str] = None):
+    with suppress(UserProfile.DoesNotExist):
+        TaskService.reset_task_responses(_profile(provider_id), created_before=_time(created_before))
+
+
+@job(max_attempts=3)
+def archive_completed_tasks(provider_id: Optional[int] = None, cutoff: Optional[str] = None):
+    with suppress(UserProfile.DoesNotExist):
+        TaskService.archive_completed_tasks(_profile(provider_id), cutoff=_time(cutoff))
+
+
+@job(max_attempts=3)
+def delete_patient_tasks(patient_id: int, created_before: Optional[str] = None):
+    with suppress(UserProfile.DoesNotExist):
+        TaskService.delete_patient_tasks(_profile(patient_id), created_before=_time(created_before))
+
+
+# Accounts
+
+@job()
+def delete_account(user_id: int):
+    AccountService.delete_account(user_id)
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from taskmanager.models import ArchivedTask
+from taskmanager.services.archive_service import ArchiveService
+from taskmanager.services.deletion_service import DELETE_BATCH_SIZE, DELETE_BATCH_PAUSE
+from taskmanager.services.task_service import TaskService
+from users.models import UserProfile
+
+
+# command to move old completed tasks into the archive
+class Command(BaseCommand):
+    help = 'Move completed tasks older than a cutoff, with their responses, into the compressed task archive'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=90,
+            help='Archive tasks completed more than this many days ago (default: 90)',
+        )
+        parser.add_argument(
+            '--provider-id',
+            type=int,
+            help='Only tasks assigned by this provider profile ID',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELETE_BATCH_SIZE,
+            help=f'Tasks per transaction (default: {DELETE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=DELETE_BATCH_PAUSE,
+            help=f'Seconds to wait between batches (default: {DELETE_BATCH_PAUSE})',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        provider = None
+        if options['provider_id']:
+            provider = UserProfile.objects.filter(id=options['provider_id'], user_type='provider').first()
+            if provider is None:
+                raise CommandError(f'Provider {options["provider_id"]} not found')
+
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        tasks = ArchiveService.get_completed_before(cutoff, provider_profile=provider)
+        self.stdout.write(f'Archiving tasks completed before {cutoff:%Y-%m-%d %H:%M}')
+        owners = TaskService.get_task_owners(tasks)
+
+        archived = 0
+        for walked, total, archived in ArchiveService.archive_tasks(
+            tasks, batch_size=options['batch_size'], pause=options['pause']
+        ):
+            self.stdout.write(f'  {walked}/{total} tasks processed')
+        if archived:
+            TaskService.invalidate_task_statistics(*owners)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} task(s), {ArchivedTask.objects.count()} in the archive'
+        ))
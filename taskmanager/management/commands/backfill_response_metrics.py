@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from taskmanager.models import TaskResponse, RESPONSE_METRICS_VERSION
+from taskmanager.services.deletion_service import DELETE_BATCH_SIZE, DELETE_BATCH_PAUSE
+from taskmanager.services.results_service import ResultsService
+
+
+# command to fill the response metric columns for existing rows
+class Command(BaseCommand):
+    help = 'Extract score, moves and duration from saved task responses into their columns; safe to stop and rerun'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELETE_BATCH_SIZE,
+            help=f'Responses per transaction (default: {DELETE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=DELETE_BATCH_PAUSE,
+            help=f'Seconds to wait between batches (default: {DELETE_BATCH_PAUSE})',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        self.stdout.write(f'Extracting response metrics (version {RESPONSE_METRICS_VERSION})')
+
+        updated = 0
+        for walked, total, updated in ResultsService.backfill_metrics(
+            batch_size=options['batch_size'], pause=options['pause']
+        ):
+            self.stdout.write(f'  {walked}/{total} responses processed')
+
+        remaining = TaskResponse.objects.filter(metrics_version__lt=RESPONSE_METRICS_VERSION).count()
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} response(s), {remaining} left'))
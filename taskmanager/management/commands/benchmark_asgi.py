@@ -0,0 +1,259 @@
+from importlib.util import find_spec
+from statistics import median, quantiles
+from typing import Dict
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from users.models import UserProfile
+
+# How each deployment is started: gunicorn sync workers as in the Procfile, uvicorn for config/asgi.py
+SERVERS = {
+    'wsgi': ('gunicorn', [
+        'gunicorn', 'config.wsgi:application', '--worker-class', 'sync', '--backlog', '2048',
+        '--log-level', 'warning', '--timeout', '120',
+    ]),
+    'asgi': ('uvicorn', [
+        'uvicorn', 'config.asgi:application', '--backlog', '2048', '--log-level', 'warning', '--no-access-log',
+    ]),
+}
+STARTUP_TIMEOUT = 30  # seconds
+WARMUP_SECONDS = 2
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def tree_rss(pid: int) -> Dict[int, int]:
+    """Resident memory in bytes of a process and each of its descendants, by pid, from /proc"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # the ppid follows the parenthesised command name
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    rss = {}
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, ()))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss[current] = int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return rss
+
+
+async def fetch(port: int, request: bytes, timeout: float) -> int:
+    """Send one request on a new connection and return the response status"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(request)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        # Connection: close - the body ends when the server hangs up
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def load(port: int, request: bytes, connections: int, duration: float, timeout: float):
+    """Keep connections requests in flight for duration seconds; returns (latencies, errors)"""
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, request, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return latencies, errors
+
+
+# command to compare the WSGI and ASGI deployments at the same memory budget
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn (WSGI) and uvicorn (ASGI) with as many workers as fit in the same memory budget, '
+        'and measure throughput and latency at increasing numbers of concurrent connections. Linux only.'
+    )
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='/taskmanager/api/v1/tasks/',
+            help='Path to request, as the --user (default: /taskmanager/api/v1/tasks/)',
+        )
+        parser.add_argument('--user', help='Username to log in as (default: the first provider)')
+        parser.add_argument('--memory', type=int, default=512, help='Memory budget per server in MB (default: 512)')
+        parser.add_argument(
+            '--connections', type=int, nargs='+', default=[10, 50, 200, 500],
+            help='Concurrent connection counts to measure (default: 10 50 200 500)',
+        )
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per measurement (default: 10)')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed (default: 30)')
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS), help='Servers to compare (default: both)')
+        parser.add_argument('--wsgi-workers', type=int, help='gunicorn workers (default: as many as fit in --memory)')
+        parser.add_argument('--asgi-workers', type=int, help='uvicorn workers (default: as many as fit in --memory)')
+
+    # execute
+    def handle(self, *args, **options):
+        if not os.path.isdir('/proc'):
+            raise CommandError('Memory is read from /proc, so this needs Linux')
+        for name in options['servers']:
+            module = SERVERS[name][0]
+            if find_spec(module) is None:
+                raise CommandError(f'{module} is not installed - pip install {module}')
+
+        client, cookie = self.log_in(options['user'])
+        request = (
+            f'GET {options["url"]} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+            f'Cookie: {settings.SESSION_COOKIE_NAME}={cookie}\r\nConnection: close\r\n\r\n'
+        ).encode()
+        budget = options['memory'] * 1024 * 1024
+
+        # Extra workers only add throughput up to the CPU count, and the load generator shares the CPUs
+        self.stdout.write(f'{os.cpu_count()} CPUs, {options["memory"]} MB per server, GET {options["url"]}')
+        try:
+            workers_by_server = {
+                name: options[f'{name}_workers'] or self.fit_workers(name, request, budget) for name in options['servers']
+            }
+            self.stdout.write(
+                f'{"server":<6} {"workers":>8} {"rss MB":>7} {"conns":>6} {"req/s":>8} '
+                f'{"p50 ms":>8} {"p99 ms":>8} {"errors":>7}'
+            )
+            for name, workers in workers_by_server.items():
+                with _Server(name, workers, request) as (port, pid):
+                    rss = sum(tree_rss(pid).values())
+                    for connections in options['connections']:
+                        latencies, errors = asyncio.run(
+                            load(port, request, connections, options['duration'], options['timeout'])
+                        )
+                        self.report(name, workers, rss, connections, latencies, errors, options['duration'])
+                        # Memory after load, once the workers have grown
+                        rss = max(rss, sum(tree_rss(pid).values()))
+        finally:
+            client.logout()
+
+    def log_in(self, username):
+        """A session for the user, which the servers read from the shared session store"""
+        profiles = UserProfile.objects.select_related('user')
+        profile = profiles.filter(user__username=username).first() if username else profiles.filter(user_type='provider').first()
+        if profile is None:
+            raise CommandError(f'No user {username}' if username else 'No provider to log in as - pass --user')
+        client = Client()
+        client.force_login(profile.user)
+        return client, client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def fit_workers(self, name, request, budget) -> int:
+        """Workers that fit in the budget beside the parent process, measured on a warmed-up two-worker server"""
+        with _Server(name, 2, request) as (port, pid):
+            rss = tree_rss(pid)
+        parent = rss.pop(pid)
+        worker = max(rss.values())
+        workers = max(1, (budget - parent) // worker)
+        self.stdout.write(
+            f'{name}: parent process {parent / 2**20:.0f} MB, workers {worker / 2**20:.0f} MB each, '
+            f'so {workers} fit in {budget / 2**20:.0f} MB'
+        )
+        return workers
+
+    def report(self, name, workers, rss, connections, latencies, errors, duration):
+        if latencies:
+            p50 = f'{median(latencies) * 1000:>8.1f}'
+            p99 = f'{(quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]) * 1000:>8.1f}'
+        else:
+            p50 = p99 = f'{"-":>8}'
+        self.stdout.write(
+            f'{name:<6} {workers:>8} {rss / 2**20:>7.0f} {connections:>6} {len(latencies) / duration:>8.1f} '
+            f'{p50} {p99} {errors:>7}'
+        )
+
+
+class _Server:
+    """A server running the project in a child process, started and warmed up on entry"""
+
+    def __init__(self, name, workers, request):
+        self.name = name
+        self.workers = workers
+        self.request = request
+        self.port = free_port()
+
+    def __enter__(self):
+        module, command = SERVERS[self.name]
+        if module == 'gunicorn':
+            command = [*command, '--bind', f'127.0.0.1:{self.port}', '--workers', str(self.workers)]
+        else:
+            command = [*command, '--host', '127.0.0.1', '--port', str(self.port), '--workers', str(self.workers)]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, DEBUG='False')
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', *command], cwd=settings.BASE_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        try:
+            self.wait_until_ready()
+        except BaseException:
+            self.__exit__()
+            raise
+        return self.port, self.process.pid
+
+    def wait_until_ready(self):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if self.process.poll() is not None:
+                self.log.seek(0)
+                output = self.log.read().decode(errors='replace').strip().splitlines()
+                raise CommandError(f'{self.name} server exited: {output[-1] if output else "no output"}')
+            try:
+                status = asyncio.run(fetch(self.port, self.request, 5))
+                break
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                if time.monotonic() > deadline:
+                    raise CommandError(f'{self.name} server did not start within {STARTUP_TIMEOUT}s')
+                time.sleep(0.2)
+        if status >= 400:
+            raise CommandError(f'{self.name} server answered {status} - check --url and --user')
+        # Load code and fill caches in every worker before measuring
+        asyncio.run(load(self.port, self.request, min(self.workers * 2, 50), WARMUP_SECONDS, 5))
+
+    def __exit__(self, *exc_info):
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
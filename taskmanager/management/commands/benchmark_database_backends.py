@@ -0,0 +1,137 @@
+from statistics import median, quantiles
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core import signals
+from django.db import connection, close_old_connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from .check_view_budgets import Command as ViewBudgetCommand, VIEW_BUDGETS
+
+# The dashboard cases from the view budgets, with the role that loads each one
+DASHBOARDS = [
+    (case, role)
+    for case in VIEW_BUDGETS if case.url_name.endswith('_dashboard')
+    for role in case.budgets
+]
+
+
+# command to compare database backends on the dashboard workloads
+class Command(BaseCommand):
+    help = 'Seed a test database on each backend and time the dashboards and a fresh connection'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database-urls', nargs='+',
+            help='DATABASE_URLs to compare, e.g. sqlite:///bench.sqlite3 postgres://localhost/cognicare '
+                 '(default: the configured database)',
+        )
+        parser.add_argument('--patients', type=int, default=25, help='Patients to seed (default: 25)')
+        parser.add_argument('--tasks', type=int, default=40, help='Tasks per patient (default: 40)')
+        parser.add_argument('--days', type=int, default=60, help='Days of checklist history per patient (default: 60)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed loads per dashboard (default: 20)')
+        parser.add_argument('--worker', action='store_true', help='Benchmark the configured database and print JSON')
+
+    # execute
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(options)))
+            return
+
+        self.stdout.write(f'{"backend":<12} {"workload":<32} {"queries":>8} {"p50 ms":>8} {"p95 ms":>8}')
+        failures = 0
+        for url in options['database_urls'] or [settings.DATABASE_URL]:
+            try:
+                results = self.run_backend(url, options)
+            except CommandError as e:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'{url}: {e}'))
+                continue
+            for row in results['rows']:
+                self.stdout.write(
+                    f'{results["vendor"]:<12} {row["workload"]:<32} {row["queries"]:>8} '
+                    f'{row["p50"]:>8.2f} {row["p95"]:>8.2f}'
+                )
+        if failures:
+            raise CommandError(f'{failures} backend(s) could not be benchmarked')
+
+    def run_backend(self, url, options):
+        """Run the worker for one URL in a fresh process, so it picks up that backend's settings"""
+        command = [
+            sys.executable, '-m', 'django', 'benchmark_database_backends', '--worker',
+            '--patients', str(options['patients']), '--tasks', str(options['tasks']),
+            '--days', str(options['days']), '--repeat', str(options['repeat']),
+        ]
+        env = dict(os.environ, DATABASE_URL=url)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'worker failed')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def run_worker(self, options):
+        """Seed and time this process's default database"""
+        budgets = ViewBudgetCommand()
+        setup_test_environment()
+        scratch = tempfile.TemporaryDirectory()
+        if connection.vendor == 'sqlite':
+            # an on-disk test database, so SQLite pays for real I/O like the server does
+            connection.settings_dict['TEST']['NAME'] = os.path.join(scratch.name, 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Keep the connection open between requests, as CONN_MAX_AGE does
+        signals.request_started.disconnect(close_old_connections)
+        signals.request_finished.disconnect(close_old_connections)
+        try:
+            with override_settings(DEBUG=False, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+                fixtures = budgets.seed(options['patients'], options['tasks'], options['days'])
+                logging.disable(logging.CRITICAL)
+                try:
+                    rows = [self.time_connect(options['repeat'])]
+                    for case, role in DASHBOARDS:
+                        rows.append(self.time_dashboard(budgets, case, role, fixtures, options['repeat']))
+                finally:
+                    logging.disable(logging.NOTSET)
+        finally:
+            signals.request_started.connect(close_old_connections)
+            signals.request_finished.connect(close_old_connections)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            scratch.cleanup()
+        return {'vendor': connection.vendor, 'rows': rows}
+
+    def time_connect(self, repeat):
+        """Cost of opening a connection - what CONN_MAX_AGE or a pool saves on each request"""
+        timings = []
+        for _ in range(repeat):
+            connection.close()
+            start = time.perf_counter()
+            connection.ensure_connection()
+            timings.append(time.perf_counter() - start)
+        return self.summary('new connection', 0, timings)
+
+    def time_dashboard(self, budgets, case, role, fixtures, repeat):
+        url = budgets._reverse(case.url_name, case.kwargs(fixtures))
+        # first load warms templates and is not timed
+        budgets.request(case, url, role, fixtures)
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            queries, elapsed, _ = budgets.request(case, url, role, fixtures)
+            timings.append(elapsed)
+        return self.summary(f'{case.method.upper()} {case.url_name}', queries, timings)
+
+    def summary(self, workload, queries, timings):
+        return {
+            'workload': workload,
+            'queries': queries,
+            'p50': median(timings) * 1000,
+            'p95': quantiles(timings, n=20)[18] * 1000 if len(timings) > 1 else timings[0] * 1000,
+        }
@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from taskmanager.db import apply_sqlite_pragmas, get_sqlite_pragmas
+
+# A stand-in for a task submission: one indexed row per commit
+SCHEMA = '''
+    CREATE TABLE submission (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER NOT NULL,
+        responses TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX submission_patient_idx ON submission (patient_id, created_at);
+'''
+RESPONSES = '{"answers": [1, 2, 3, 4, 5], "notes": "' + 'x' * 200 + '"}'
+
+
+def connect(path, pragmas):
+    """A connection set up the way Django opens one: autocommit, IMMEDIATE writes, profile applied"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    apply_sqlite_pragmas(conn.cursor(), pragmas)
+    return conn
+
+
+def submit(conn, patient_id):
+    """One write transaction, returning (seconds, lock errors hit)"""
+    start = time.perf_counter()
+    errors = 0
+    while True:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            break
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            errors += 1
+    conn.execute(
+        'INSERT INTO submission (patient_id, responses, created_at) VALUES (?, ?, ?)',
+        (patient_id, RESPONSES, time.time())
+    )
+    conn.execute('COMMIT')
+    return time.perf_counter() - start, errors
+
+
+def write_worker(path, pragmas, worker, commits, start, results):
+    conn = connect(path, pragmas)
+    start.wait()
+    errors = 0
+    for i in range(commits):
+        errors += submit(conn, worker * commits + i)[1]
+    conn.close()
+    results.put(errors)
+
+
+def read_worker(path, pragmas, start, stop, results):
+    conn = connect(path, pragmas)
+    start.wait()
+    reads = 0
+    errors = 0
+    while not stop.is_set():
+        try:
+            conn.execute(
+                'SELECT COUNT(*), MAX(created_at) FROM submission WHERE patient_id < ?', (reads % 1000,)
+            ).fetchone()
+            reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    results.put((reads, errors))
+
+
+# command to compare SQLite connection profiles
+class Command(BaseCommand):
+    help = 'Measure commit latency and concurrent writer throughput under each SQLITE_PROFILES entry'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+',
+            help=f'Profiles to compare (default: all of {", ".join(settings.SQLITE_PROFILES)})',
+        )
+        parser.add_argument('--commits', type=int, default=500, help='Commits per writer (default: 500)')
+        parser.add_argument('--writers', type=int, default=4, help='Concurrent writer processes (default: 4)')
+        parser.add_argument('--readers', type=int, default=2, help='Reader processes running alongside (default: 2)')
+        parser.add_argument(
+            '--dir',
+            help='Directory for the scratch databases - use the disk the real database lives on (default: system temp)',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        profiles = options['profiles'] or list(settings.SQLITE_PROFILES)
+        for name in profiles:
+            if name not in settings.SQLITE_PROFILES:
+                raise CommandError(f'Unknown profile {name}')
+
+        self.stdout.write(
+            f'{"profile":<12} {"commit p50":>11} {"p95":>8} {"p99":>8} '
+            f'{"writers":>8} {"commits/s":>10} {"reads/s":>9} {"locked":>7}'
+        )
+        with tempfile.TemporaryDirectory(dir=options['dir']) as scratch:
+            for name in profiles:
+                path = os.path.join(scratch, f'{name}.sqlite3')
+                pragmas = get_sqlite_pragmas(name)
+                self.create_database(path, pragmas)
+
+                latencies = self.measure_commits(path, pragmas, options['commits'])
+                throughput, reads, locked = self.measure_concurrency(
+                    path, pragmas, options['writers'], options['readers'], options['commits']
+                )
+                self.report(name, latencies, options['writers'], throughput, reads, locked)
+
+    def create_database(self, path, pragmas):
+        conn = connect(path, pragmas)
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def measure_commits(self, path, pragmas, commits):
+        """Latency of single-row commits from one writer with nothing else running"""
+        conn = connect(path, pragmas)
+        latencies = [submit(conn, i)[0] for i in range(commits)]
+        conn.close()
+        return latencies
+
+    def measure_concurrency(self, path, pragmas, writers, readers, commits):
+        """Commits/s and reads/s with several writer processes and readers hitting the same file"""
+        start = multiprocessing.Event()
+        stop = multiprocessing.Event()
+        write_results = multiprocessing.Queue()
+        read_results = multiprocessing.Queue()
+
+        writer_processes = [
+            multiprocessing.Process(target=write_worker, args=(path, pragmas, i, commits, start, write_results))
+            for i in range(writers)
+        ]
+        reader_processes = [
+            multiprocessing.Process(target=read_worker, args=(path, pragmas, start, stop, read_results))
+            for _ in range(readers)
+        ]
+        for process in writer_processes + reader_processes:
+            process.start()
+
+        began = time.perf_counter()
+        start.set()
+        locked = 0
+        for _ in writer_processes:
+            locked += write_results.get()
+        elapsed = time.perf_counter() - began
+        stop.set()
+
+        reads = 0
+        for _ in reader_processes:
+            count, errors = read_results.get()
+            reads += count
+            locked += errors
+        for process in writer_processes + reader_processes:
+            process.join()
+        return writers * commits / elapsed, reads / elapsed, locked
+
+    def report(self, name, latencies, writers, throughput, reads, locked):
+        cuts = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{name:<12} {statistics.median(latencies) * 1000:>9.2f}ms {cuts[94] * 1000:>6.2f}ms '
+            f'{cuts[98] * 1000:>6.2f}ms {writers:>8} {throughput:>10.0f} {reads:>9.0f} {locked:>7}'
+        )
@@ -0,0 +1,89 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from taskmanager.constants import TASK_TYPES
+from taskmanager.services.task_service import TaskService
+from users.models import UserProfile
+
+
+# command to measure bulk task assignment throughput
+class Command(BaseCommand):
+    help = 'Seed a test database and time assigning a task set to cohorts of patients'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cohorts', type=int, nargs='+', default=[1, 100, 10000],
+            help='Cohort sizes to assign to (default: 1 100 10000)',
+        )
+        parser.add_argument('--tasks', type=int, default=7, help='Tasks in the assigned set (default: 7, a week)')
+        parser.add_argument(
+            '--baseline', type=int, default=100,
+            help='Also time one create_task call per task for cohorts up to this size (default: 100, 0 to skip)',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            provider, patients = self.seed(max(options['cohorts']))
+            tasks_data = [
+                {'task_type': task_type, 'difficulty': 'easy'}
+                for task_type, _ in (TASK_TYPES * options['tasks'])[:options['tasks']]
+            ]
+
+            self.stdout.write(f'{"method":<10} {"patients":>9} {"tasks":>8} {"queries":>8} {"seconds":>9} {"tasks/s":>10}')
+            for size in options['cohorts']:
+                cohort = patients[:size]
+                self.report('bulk', cohort, tasks_data, *self.measure(
+                    lambda: TaskService.assign_tasks(provider, cohort, tasks_data)
+                ))
+                if size <= options['baseline']:
+                    self.report('per-task', cohort, tasks_data, *self.measure(
+                        lambda: self.assign_one_by_one(provider, cohort, tasks_data)
+                    ))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, patient_count):
+        """One provider and a caseload of patients, without password hashing"""
+        provider_user = User.objects.create(username='bench_provider')
+        provider = UserProfile.objects.create(user=provider_user, user_type='provider')
+
+        users = User.objects.bulk_create([
+            User(username=f'bench_patient_{i}', password='!') for i in range(patient_count)
+        ])
+        patients = UserProfile.objects.bulk_create([
+            UserProfile(user=user, user_type='patient', provider=provider) for user in users
+        ])
+        return provider, patients
+
+    def assign_one_by_one(self, provider, cohort, tasks_data):
+        """The previous path - one create_task transaction per task"""
+        for patient in cohort:
+            for task_data in TaskService._build_task_specs(tasks_data):
+                TaskService.create_task(assigned_by=provider, assigned_to=patient, **task_data)
+
+    def measure(self, assign):
+        """Run one assignment, rolled back afterwards so every run starts from the same data"""
+        with transaction.atomic():
+            reset_queries()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                assign()
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return len(context.captured_queries), elapsed
+
+    def report(self, method, cohort, tasks_data, queries, elapsed):
+        task_count = len(cohort) * len(tasks_data)
+        self.stdout.write(
+            f'{method:<10} {len(cohort):>9} {task_count:>8} {queries:>8} '
+            f'{elapsed:>9.3f} {task_count / elapsed:>10.0f}'
+        )
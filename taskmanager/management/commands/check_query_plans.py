@@ -0,0 +1,167 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from taskmanager.services.archive_service import ArchiveService
+from taskmanager.services.job_service import FINISHED_STATUSES
+from taskmanager.services.notification_service import NotificationService
+from taskmanager.services.reminder_service import ReminderService
+from taskmanager.services.results_service import ResultsService
+from taskmanager.services.task_service import TaskService
+from django.utils import timezone
+from taskmanager.identity import Identity
+from taskmanager.models import ArchivedTask, CompletionEvent, DailyChecklistSubmission, Job, PatientNote
+from taskmanager.pagination import encode_cursor, paginate_keyset
+from users.models import UserProfile
+
+# Plan steps that mean the index did not cover the query
+BAD_PLAN_STEPS = ('USE TEMP B-TREE',)
+
+
+# command to check the task query plans against the indexes
+class Command(BaseCommand):
+    help = 'Run EXPLAIN QUERY PLAN over the hot task querysets and fail on full scans or temp sorts'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database alias to check (default: "default")',
+        )
+        parser.add_argument(
+            '--show-plans',
+            action='store_true',
+            help='Print the full plan for every query',
+        )
+
+    def get_querysets(self):
+        """
+        Canonical task querysets, built the same way the views build them
+
+        Returns:
+            list of (name, queryset) tuples
+        """
+        # Plans do not depend on the ids, so unsaved profiles are fine here
+        patient = UserProfile(id=1, user_type='patient')
+        provider = UserProfile(id=2, user_type='provider')
+
+        patient_tasks = TaskService.get_patient_tasks(patient)
+        provider_tasks = TaskService.get_provider_tasks(provider)
+        now = timezone.now()
+
+        return [
+            # PatientTasksView
+            ('patient tasks: pending', patient_tasks.pending()),
+            ('patient tasks: completed', patient_tasks.completed()),
+            # ProviderTaskManagementView
+            ('provider tasks: all', provider_tasks),
+            ('provider tasks: pending', provider_tasks.pending()),
+            ('provider tasks: completed', provider_tasks.completed()),
+            # provider_dashboard
+            ('provider dashboard: recent tasks', provider_tasks.select_related('assigned_to__user')[:10]),
+            ('provider dashboard: patient tasks', patient_tasks.filter(assigned_by=provider)),
+            # patient_dashboard / caregiver_dashboard
+            ('dashboard: pending tasks', TaskService.get_patient_pending_tasks(patient)),
+            ('dashboard: completed tasks', TaskService.get_patient_completed_tasks(patient)),
+            # TaskResultsView fallback and archive reads
+            ('archive: task result', ArchivedTask.objects.filter(task_id=1)),
+            ('archive: patient history', ArchiveService.get_archived_tasks(patient_profile=patient)),
+            ('archive: provider history', ArchiveService.get_archived_tasks(provider_profile=provider)),
+            # Game results over the response metric columns
+            ('results: score trend', ResultsService.get_score_trend(patient, 'pairs')),
+            ('results: low scores', ResultsService.get_low_scores(patient, 0.5)),
+            # Notification inbox
+            ('notifications: inbox', NotificationService.get_inbox(patient.id)),
+            ('notifications: unread', NotificationService.get_inbox(patient.id, unread_only=True)),
+            # Completion feed replay and fan-out
+            ('feed: provider replay', CompletionEvent.objects.visible_to(
+                Identity(role='provider', profile_id=provider.id)).after(0)),
+            ('feed: caregiver replay', CompletionEvent.objects.visible_to(
+                Identity(role='caregiver', profile_id=3, patient_id=patient.id, provider_id=provider.id)).after(0)),
+            ('feed: new events', CompletionEvent.objects.after(0)),
+            ('feed: new events and gaps', CompletionEvent.objects.filter(id__gte=1).filter(
+                Q(id__gt=3) | Q(id__in=[1, 2])).order_by('id')),
+            ('feed: settled replay', CompletionEvent.objects.visible_to(
+                Identity(role='provider', profile_id=provider.id)).after(0).filter(created_at__lt=now)),
+            ('feed: settled latest', CompletionEvent.objects.filter(created_at__lt=now).order_by('-created_at', '-id')[:1]),
+            # Job worker
+            ('jobs: due', Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')[:10]),
+            ('jobs: stale', Job.objects.filter(status='running', started_at__lt=now)),
+            ('jobs: finished', Job.objects.filter(status__in=FINISHED_STATUSES, finished_at__gte=now)),
+            # Due-date reminder scheduler, first and later batches
+            ('reminders: due soon', ReminderService.get_batch('due_soon', now, now)),
+            ('reminders: overdue', ReminderService.get_batch('overdue', now, now)),
+            ('reminders: next batch', ReminderService.get_batch('overdue', now, now, after=(now, 1))),
+        ] + self.get_page_querysets(patient, provider, patient_tasks, provider_tasks)
+
+    def get_page_querysets(self, patient, provider, patient_tasks, provider_tasks):
+        """Later pages of the keyset-paged lists, which must seek through an index like the first"""
+        now = timezone.now()
+        cursor = encode_cursor(now, 1)
+        date_cursor = encode_cursor(now.date(), 1)
+
+        def page(queryset, cursor, order_field='created_at'):
+            keyset_page = paginate_keyset(queryset, cursor, order_field)
+            return keyset_page.queryset[:keyset_page.page_size + 1]
+
+        return [
+            ('page: patient pending tasks', page(patient_tasks.pending(), cursor)),
+            ('page: patient completed tasks', page(patient_tasks.completed(), cursor)),
+            ('page: provider pending tasks', page(provider_tasks.pending(), cursor)),
+            ('page: provider completed tasks', page(provider_tasks.completed(), cursor)),
+            ('page: provider archived tasks', page(ArchiveService.get_archived_tasks(provider_profile=provider), cursor, 'completed_at')),
+            ('page: checklist submissions', page(
+                DailyChecklistSubmission.objects.filter(patient=patient), date_cursor, 'submission_date'
+            )),
+            ('page: patient notes', page(PatientNote.objects.filter(patient=patient, provider=provider), cursor)),
+            ('page: notification inbox', page(NotificationService.get_inbox(patient.id), cursor)),
+            ('page: unread notifications', page(NotificationService.get_inbox(patient.id, unread_only=True), cursor)),
+        ]
+
+    def explain(self, connection, queryset):
+        """Return the plan detail lines for a queryset"""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            # rows are (id, parent, notused, detail)
+            return [row[3] for row in cursor.fetchall()]
+
+    def find_problems(self, plan, tables):
+        """Full scans of the tables or temp sorts anywhere in the plan"""
+        problems = []
+        for step in plan:
+            if step.startswith(tuple(f'SCAN {table}' for table in tables)):
+                problems.append(step)
+            elif step.startswith(BAD_PLAN_STEPS):
+                problems.append(step)
+        return problems
+
+    # execute
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING(f'Query plan check only supports SQLite, skipping {connection.vendor}'))
+            return
+
+        failures = 0
+        for name, queryset in self.get_querysets():
+            # A UNION also reads the tables of its other queries
+            tables = [query.model._meta.db_table for query in (queryset.query, *queryset.query.combined_queries)]
+            plan = self.explain(connection, queryset)
+            problems = self.find_problems(plan, tables)
+
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'FAIL {name}'))
+                for step in problems:
+                    self.stdout.write(f'    {step}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'ok   {name}'))
+
+            if options['show_plans']:
+                for step in plan:
+                    self.stdout.write(f'    | {step}')
+
+        if failures:
+            raise CommandError(f'{failures} task queries fall back to a full scan or temp sort')
+        self.stdout.write(self.style.SUCCESS('All task queries use an index'))
@@ -0,0 +1,411 @@
+from datetime import timedelta
+from statistics import median
+import json
+import logging
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core import signals
+from django.db import connection, close_old_connections, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+import taskmanager.urls
+import users.urls
+from taskmanager.models import Appointment, DailyChecklistSubmission, PatientNote, Task
+from taskmanager.services.task_service import TaskService
+from users.models import UserProfile
+
+ROLES = ('anonymous', 'admin', 'provider', 'caregiver', 'patient')
+
+# Budget for any role a case does not list - permission checks, redirects and error responses
+DEFAULT_BUDGET = (6, 100)
+
+# Statuses expected by default for a role a case lists, and for any other role -
+# sent away (to the login or home page), refused, or kept out of someone else's rows
+OK_STATUSES = (200,)
+REFUSED_STATUSES = (302, 403, 404)
+
+
+class ViewBudget:
+    """One URL to drive, with its query and wall-time (ms) budget and expected statuses per role"""
+
+    def __init__(self, url_name, budgets, method='get', kwargs=None, data=None, json_body=False, ajax=False,
+                 others=DEFAULT_BUDGET, statuses=None, other_statuses=REFUSED_STATUSES):
+        self.url_name = url_name
+        self.budgets = budgets
+        self.others = others
+        self.statuses = statuses or {}
+        self.other_statuses = other_statuses
+        self.method = method
+        self.kwargs = kwargs or (lambda fixtures: {})
+        self.data = data or (lambda fixtures: {})
+        self.json_body = json_body
+        self.ajax = ajax
+
+    def budget_for(self, role):
+        return self.budgets.get(role, self.others)
+
+    def statuses_for(self, role):
+        if role in self.statuses:
+            return self.statuses[role]
+        return OK_STATUSES if role in self.budgets else self.other_statuses
+
+
+# Declared budgets - (max queries, max ms) per role, measured against the default seed sizes.
+# Every route in taskmanager/urls.py and users/urls.py needs at least one entry.
+# A listed role must get 200 and any other role must be refused, unless statuses say
+# otherwise; a server error always fails.
+VIEW_BUDGETS = [
+    # Logins
+    ViewBudget('admin_login', {'anonymous': (1, 50)}, other_statuses=OK_STATUSES),
+    ViewBudget('provider_login', {'anonymous': (1, 50)}, other_statuses=OK_STATUSES),
+    ViewBudget('caregiver_login', {'anonymous': (1, 50)}, other_statuses=OK_STATUSES),
+    ViewBudget('patient_login', {'anonymous': (1, 50)}, other_statuses=OK_STATUSES),
+    ViewBudget('patient_login', {'anonymous': (6, 100)}, method='post', others=(8, 100),
+               statuses={'anonymous': (302,)}, other_statuses=(302,),
+               data=lambda f: {'username': 'budget_patient', 'password': 'budget'}),
+    ViewBudget('logout', {'admin': (4, 50), 'provider': (4, 50), 'caregiver': (4, 50), 'patient': (4, 50)},
+               statuses=dict.fromkeys(ROLES, (302,))),
+
+    # Dashboards
+    ViewBudget('admin_dashboard', {'admin': (7, 250)}),
+    ViewBudget('provider_dashboard', {'provider': (9, 400)}),
+    ViewBudget('provider_dashboard', {'provider': (14, 400)}, method='post',
+               data=lambda f: {'selected_patient': f['patient'].id}),
+    ViewBudget('caregiver_dashboard', {'caregiver': (8, 150)}),
+    ViewBudget('patient_dashboard', {'patient': (6, 150)}),
+
+    # Account management
+    ViewBudget('create_provider', {'admin': (8, 100)}, method='post', statuses={'admin': (302,)},
+               data=lambda f: {'username': 'new_provider', 'password': 'x', 'first_name': 'New', 'last_name': 'Provider'}),
+    ViewBudget('create_patient', {'provider': (8, 100)}, method='post', statuses={'provider': (302,)},
+               data=lambda f: {'username': 'new_patient', 'password': 'x', 'first_name': 'New', 'last_name': 'Patient'}),
+    ViewBudget('create_caregiver', {'provider': (6, 100)}, method='post', statuses={'provider': (302,)},
+               data=lambda f: {'username': 'new_caregiver', 'password': 'x', 'first_name': 'New', 'last_name': 'Caregiver'}),
+    ViewBudget('manage_account', {'admin': (5, 100), 'provider': (5, 100), 'caregiver': (5, 100), 'patient': (5, 100)},
+               kwargs=lambda f: {'user_id': f['patient'].user_id}),
+    ViewBudget('delete_account', {'admin': (5, 100), 'provider': (6, 100), 'caregiver': (5, 100), 'patient': (5, 100)},
+               statuses={'admin': (302,), 'caregiver': (302,)},
+               kwargs=lambda f: {'user_id': f['patient'].user_id}),
+    ViewBudget('assign_caregiver', {'provider': (6, 150)},
+               kwargs=lambda f: {'patient_id': f['patient'].id}),
+
+    # Task assignment
+    ViewBudget('assign_task', {}),
+    ViewBudget('assign_multiple_tasks', {'provider': (10, 150)}, method='post', json_body=True,
+               data=lambda f: {'patient_id': f['patient'].id, 'tasks': [
+                   {'task_type': 'puzzle', 'difficulty': 'easy'},
+                   {'task_type': 'memory_questionnaire'},
+               ]}),
+    ViewBudget('assign_multiple_tasks', {'provider': (10, 300)}, method='post', json_body=True,
+               data=lambda f: {'patient_ids': f['patient_ids'], 'tasks': [
+                   {'task_type': 'puzzle', 'difficulty': 'easy'},
+                   {'task_type': 'memory_questionnaire'},
+               ]}),
+
+    # Task lists and results
+    ViewBudget('provider_task_management', {'provider': (6, 400)}),
+    ViewBudget('patient_tasks', {'caregiver': (6, 200), 'patient': (5, 200)}),
+    ViewBudget('patient_tasks', {'provider': (8, 150)}, kwargs=lambda f: {'patient_id': f['patient'].id}),
+    ViewBudget('take_task', {'provider': (8, 100), 'caregiver': (11, 150), 'patient': (8, 150)},
+               kwargs=lambda f: {'task_id': f['pending_task'].id}),
+    ViewBudget('take_task', {'provider': (9, 100), 'caregiver': (11, 150), 'patient': (9, 150)}, method='post', json_body=True,
+               kwargs=lambda f: {'task_id': f['pending_task'].id},
+               data=lambda f: {'score': 10, 'moves': 20, 'time': 30}),
+    ViewBudget('task_results', {'admin': (9, 100), 'provider': (9, 100), 'caregiver': (11, 150), 'patient': (9, 150)},
+               kwargs=lambda f: {'task_id': f['completed_task'].id}),
+
+    # Daily checklist
+    ViewBudget('daily_checklist_submit', {'caregiver': (5, 150), 'patient': (4, 150)}),
+    ViewBudget('daily_checklist_results', {'caregiver': (6, 400), 'patient': (4, 400)}),
+    ViewBudget('daily_checklist_results_patient', {'admin': (6, 400), 'provider': (6, 400), 'caregiver': (6, 400), 'patient': (5, 400)},
+               kwargs=lambda f: {'patient_id': f['patient'].id}),
+    ViewBudget('reset_daily_checklist_patient', {'provider': (9, 100)}, method='post',
+               kwargs=lambda f: {'patient_id': f['patient'].id}),
+
+    # Bulk clears and archiving only queue a job (run_jobs does the batches)
+    ViewBudget('clear_completed_tasks', {'admin': (3, 100)}, method='post'),
+    ViewBudget('clear_all_tasks', {'admin': (3, 100)}, method='post'),
+    ViewBudget('clear_task_responses', {'admin': (3, 100)}, method='post'),
+    ViewBudget('clear_provider_completed_tasks', {'provider': (3, 100)}, method='post'),
+    ViewBudget('clear_provider_all_tasks', {'provider': (3, 100)}, method='post'),
+    ViewBudget('clear_provider_task_responses', {'provider': (3, 100)}, method='post'),
+    ViewBudget('delete_task', {'provider': (14, 100)}, method='post', ajax=True,
+               kwargs=lambda f: {'task_id': f['completed_task'].id}),
+    ViewBudget('delete_patient_tasks', {'provider': (5, 100)}, method='post', statuses={'provider': (302,)},
+               kwargs=lambda f: {'patient_id': f['patient'].id}),
+
+    # Appointments
+    ViewBudget('create_appointment', {'provider': (7, 100)}, method='post',
+               kwargs=lambda f: {'patient_id': f['patient'].id},
+               data=lambda f: {'datetime': '2030-01-01T10:00', 'notes': 'Check-in'}),
+    ViewBudget('delete_appointment', {'provider': (6, 100)}, method='post',
+               kwargs=lambda f: {'appointment_id': f['appointment'].id}),
+    ViewBudget('patient_appointments', {'patient': (4, 150)}),
+
+    # Notes
+    ViewBudget('create_patient_note', {'provider': (8, 100)}, method='post',
+               kwargs=lambda f: {'patient_id': f['patient'].id},
+               data=lambda f: {'caregiver_id': f['caregiver'].id, 'note': 'Doing well'}),
+    ViewBudget('get_patient_notes', {'provider': (6, 150), 'caregiver': (6, 150)},
+               kwargs=lambda f: {'patient_id': f['patient'].id}),
+    ViewBudget('delete_patient_note', {'provider': (6, 100)}, method='post',
+               kwargs=lambda f: {'note_id': f['note'].id}),
+
+    # Notifications
+    ViewBudget('mark_notifications_read', {'admin': (4, 100), 'provider': (4, 100), 'caregiver': (4, 100), 'patient': (4, 100)},
+               method='post'),
+
+    # Read API
+    ViewBudget('api_tasks', {'admin': (3, 100), 'provider': (3, 100), 'caregiver': (3, 100), 'patient': (3, 100)}),
+    ViewBudget('api_appointments', {'admin': (3, 100), 'provider': (3, 100), 'caregiver': (3, 100), 'patient': (3, 100)}),
+    ViewBudget('api_notes', {'admin': (3, 100), 'provider': (3, 100), 'caregiver': (3, 100), 'patient': (3, 100)}),
+    ViewBudget('api_notifications', {'admin': (4, 100), 'provider': (4, 100), 'caregiver': (4, 100), 'patient': (4, 100)}),
+    ViewBudget('api_unread_count', {'admin': (3, 100), 'provider': (3, 100), 'caregiver': (3, 100), 'patient': (3, 100)}),
+    ViewBudget('api_checklist_status', {'admin': (3, 100), 'provider': (4, 100), 'caregiver': (3, 100), 'patient': (3, 100)}),
+    ViewBudget('api_statistics', {'admin': (4, 100), 'provider': (4, 100), 'caregiver': (4, 100), 'patient': (4, 100)}),
+    ViewBudget('api_activity', {'admin': (4, 100), 'provider': (5, 100), 'caregiver': (4, 100), 'patient': (4, 100)}),
+    ViewBudget('api_activity', {'admin': (4, 100), 'provider': (5, 100), 'caregiver': (4, 100), 'patient': (4, 100)},
+               data=lambda f: {'patient': f['patient'].id}),
+    ViewBudget('api_results', {'provider': (3, 100), 'caregiver': (3, 100), 'patient': (3, 100)},
+               data=lambda f: {'game': 'pairs'}),
+    ViewBudget('api_results', {'provider': (4, 100), 'caregiver': (3, 100), 'patient': (3, 100)},
+               data=lambda f: {'game': 'pairs', 'patient': f['patient'].id}),
+    ViewBudget('api_provider_bootstrap', {'provider': (12, 200)}),
+    ViewBudget('api_patient_bootstrap', {'patient': (8, 150)}),
+    ViewBudget('api_caregiver_bootstrap', {'caregiver': (10, 150)}),
+    # live feed - the test client is WSGI, so this is the short replay response
+    ViewBudget('completion_feed', {'provider': (3, 100), 'caregiver': (3, 100)}),
+    ViewBudget('completion_feed', {'provider': (4, 100), 'caregiver': (3, 100)}, data=lambda f: {'last_event_id': 0}),
+
+    # Test mode
+    ViewBudget('test_puzzle', {'provider': (4, 100)}, kwargs=lambda f: {'difficulty': 'easy'}),
+    ViewBudget('test_color', {'provider': (4, 100)}, kwargs=lambda f: {'difficulty': 'easy'}),
+    ViewBudget('test_pairs', {'provider': (4, 100)}, kwargs=lambda f: {'difficulty': 'easy'}),
+    ViewBudget('test_questionnaire', {'provider': (4, 100)}),
+    ViewBudget('test_daily_checklist', {'provider': (4, 100)}),
+]
+
+
+# command to check query count and latency budgets for every view
+class Command(BaseCommand):
+    help = (
+        'Seed a test database, drive every URL as each role and fail on query-count or wall-time budget '
+        'overruns, server errors, or a status the role should not get'
+    )
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=25, help='Patients to seed (default: 25)')
+        parser.add_argument('--tasks', type=int, default=40, help='Tasks per patient (default: 40)')
+        parser.add_argument('--days', type=int, default=60, help='Days of checklist history per patient (default: 60)')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per view, median is reported (default: 3)')
+        parser.add_argument('--time-scale', type=float, default=1.0, help='Multiply wall-time budgets, for slow machines')
+        parser.add_argument('--no-time', action='store_true', help='Only check query counts')
+
+    # execute
+    def handle(self, *args, **options):
+        self.check_coverage()
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Keep the connection open between requests, as Django's TestCase does
+        signals.request_started.disconnect(close_old_connections)
+        signals.request_finished.disconnect(close_old_connections)
+        try:
+            # Production-like settings, with fast hashing so logins and seeding don't dominate
+            with override_settings(DEBUG=False, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+                fixtures = self.seed(options['patients'], options['tasks'], options['days'])
+                # views log their own errors - the report shows the status codes
+                logging.disable(logging.CRITICAL)
+                try:
+                    results = self.run_budgets(fixtures, options)
+                finally:
+                    logging.disable(logging.NOTSET)
+        finally:
+            signals.request_started.connect(close_old_connections)
+            signals.request_finished.connect(close_old_connections)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        failures = self.report(results)
+        if failures:
+            raise CommandError(f'{failures} view checks failed - over budget, a server error or an unexpected status')
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} view checks within budget'))
+
+    def check_coverage(self):
+        """Every route in the app urlconfs must have a declared budget"""
+        routes = {f'{p.pattern}' for p in users.urls.urlpatterns}
+        routes |= {f'taskmanager/{p.pattern}' for p in taskmanager.urls.urlpatterns}
+
+        covered = set()
+        for case in VIEW_BUDGETS:
+            kwargs = {key: 1 if key.endswith('_id') else 'easy' for key in self._kwarg_names(case)}
+            covered.add(resolve(self._reverse(case.url_name, kwargs)).route)
+
+        missing = sorted(routes - covered)
+        if missing:
+            raise CommandError('No view budget declared for: ' + ', '.join(missing))
+
+    def seed(self, patient_count, tasks_per_patient, days):
+        """Build a provider caseload with task, appointment, note and checklist history"""
+        def make_profile(username, user_type, **kwargs):
+            user = User.objects.create_user(username=username, password='budget', first_name=username, last_name='User')
+            return UserProfile.objects.create(user=user, user_type=user_type, **kwargs)
+
+        admin = make_profile('budget_admin', 'admin')
+        provider = make_profile('budget_provider', 'provider')
+        patients = [make_profile('budget_patient', 'patient', provider=provider)]
+        patients += [make_profile(f'budget_patient_{i}', 'patient', provider=provider) for i in range(1, patient_count)]
+        caregivers = [
+            make_profile(f'budget_caregiver_{i}' if i else 'budget_caregiver', 'caregiver', provider=provider, patient=patient)
+            for i, patient in enumerate(patients)
+        ]
+
+        task_types = ['puzzle', 'color', 'pairs', 'memory_questionnaire']
+        now = timezone.now()
+        for patient, caregiver in zip(patients, caregivers):
+            for i in range(tasks_per_patient):
+                task_type = task_types[i % len(task_types)]
+                task = TaskService.create_task(
+                    title=task_type.title(),
+                    task_type=task_type,
+                    difficulty='easy' if task_type != 'memory_questionnaire' else None,
+                    assigned_by=provider,
+                    assigned_to=patient,
+                    due_date=now + timedelta(days=i),
+                )
+                if i % 2:
+                    TaskService.complete_task(task, patient, {'score': i, 'moves': i * 2, 'time': i * 3})
+            for i in range(5):
+                Appointment.objects.create(provider=provider, patient=patient, datetime=now + timedelta(days=i))
+            for i in range(10):
+                PatientNote.objects.create(provider=provider, patient=patient, caregiver=caregiver, note=f'Note {i}')
+
+            # submission_date is auto_now_add, so backdate each one after creating it
+            for i in range(days):
+                submission = DailyChecklistSubmission.objects.create(
+                    patient=patient, submitted_by=patient, provider=provider, responses={'mood': 'good'}
+                )
+                DailyChecklistSubmission.objects.filter(pk=submission.pk).update(
+                    submission_date=now.date() - timedelta(days=i + 1)
+                )
+
+        patient = patients[0]
+        return {
+            'users': {
+                'admin': admin.user,
+                'provider': provider.user,
+                'caregiver': caregivers[0].user,
+                'patient': patient.user,
+            },
+            'patient': patient,
+            'patient_ids': [profile.id for profile in patients],
+            'caregiver': caregivers[0],
+            'pending_task': Task.objects.filter(assigned_to=patient).pending().first(),
+            'completed_task': Task.objects.filter(assigned_to=patient).completed().first(),
+            'appointment': Appointment.objects.filter(patient=patient).first(),
+            'note': PatientNote.objects.filter(patient=patient).first(),
+        }
+
+    def run_budgets(self, fixtures, options):
+        """Drive every case as every role; each request runs in a rolled back transaction"""
+        results = []
+        for case in VIEW_BUDGETS:
+            url = self._reverse(case.url_name, case.kwargs(fixtures))
+            for role in ROLES:
+                max_queries, max_ms = case.budget_for(role)
+                timings = []
+                queries = None
+                # first run warms templates and is not timed
+                for run in range(options['repeat'] + 1):
+                    cache.clear()
+                    count, elapsed, status = self.request(case, url, role, fixtures)
+                    if run:
+                        timings.append(elapsed)
+                        queries = count
+                elapsed_ms = median(timings) * 1000
+                results.append({
+                    'view': f'{case.method.upper()} {case.url_name}',
+                    'role': role,
+                    'status': status,
+                    'statuses': case.statuses_for(role),
+                    'queries': queries,
+                    'max_queries': max_queries,
+                    'ms': elapsed_ms,
+                    'max_ms': max_ms * options['time_scale'],
+                    'check_time': not options['no_time'],
+                })
+        return results
+
+    def request(self, case, url, role, fixtures):
+        """Make one request and roll back whatever it wrote"""
+        with transaction.atomic():
+            client = Client(raise_request_exception=False)
+            if role != 'anonymous':
+                client.force_login(fixtures['users'][role])
+
+            extra = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if case.ajax else {}
+            data = case.data(fixtures)
+            if case.json_body:
+                data = json.dumps(data)
+                extra['content_type'] = 'application/json'
+
+            # the query log is a bounded deque, so start each capture from empty
+            reset_queries()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = getattr(client, case.method)(url, data, **extra)
+                elapsed = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+        # savepoint queries from atomic blocks inside the view are not real work
+        count = sum(1 for query in context.captured_queries if 'SAVEPOINT' not in query['sql'])
+        return count, elapsed, response.status_code
+
+    def report(self, results):
+        """Print a per-view report and return the number of failures"""
+        failures = 0
+        self.stdout.write(f'{"view":<45} {"role":<10} {"status":>6} {"queries":>9} {"ms":>13}')
+        for row in results:
+            over_queries = row['queries'] > row['max_queries']
+            over_time = row['check_time'] and row['ms'] > row['max_ms']
+            line = (
+                f'{row["view"]:<45} {row["role"]:<10} {row["status"]:>6} '
+                f'{row["queries"]:>4}/{row["max_queries"]:<4} '
+                f'{row["ms"]:>6.1f}/{row["max_ms"]:<6.0f}'
+            )
+            if row['status'] >= 500:
+                problem = 'SERVER ERROR'
+            elif row['status'] not in row['statuses']:
+                problem = f'UNEXPECTED STATUS (expected {"/".join(map(str, row["statuses"]))})'
+            elif over_queries or over_time:
+                problem = 'OVER BUDGET'
+            else:
+                self.stdout.write(line)
+                continue
+            failures += 1
+            self.stdout.write(self.style.ERROR(f'{line} {problem}'))
+        return failures
+
+    def _kwarg_names(self, case):
+        # placeholder fixtures - only the kwarg names are needed for coverage
+        class Anything:
+            id = 1
+            user_id = 1
+        placeholder = {name: Anything() for name in ('patient', 'caregiver', 'pending_task', 'completed_task', 'appointment', 'note')}
+        return case.kwargs(placeholder).keys()
+
+    def _reverse(self, url_name, kwargs):
+        # taskmanager routes are namespaced, users routes are not
+        for name in (f'taskmanager:{url_name}', url_name):
+            try:
+                return reverse(name, kwargs=kwargs)
+            except Exception:
+                continue
+        raise CommandError(f'Cannot reverse {url_name} with {kwargs}')
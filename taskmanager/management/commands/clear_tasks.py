@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from taskmanager.models import Task
+from taskmanager.services.deletion_service import DeletionService, DELETE_BATCH_SIZE, DELETE_BATCH_PAUSE
+from taskmanager.services.task_service import TaskService
+from users.models import UserProfile
+
+
+# command to clear or reset tasks in short batches
+class Command(BaseCommand):
+    help = 'Delete tasks or reset task responses in primary key batches, without holding the write lock'
+
+    # command line args
+    def add_arguments(self, parser):
+        # what to clear
+        parser.add_argument(
+            '--completed',
+            action='store_true',
+            help='Only delete completed tasks',
+        )
+        parser.add_argument(
+            '--reset-responses',
+            action='store_true',
+            help='Delete task responses and set tasks back to assigned instead of deleting tasks',
+        )
+        # whose tasks
+        parser.add_argument(
+            '--provider-id',
+            type=int,
+            help='Only tasks assigned by this provider profile ID',
+        )
+        parser.add_argument(
+            '--patient-id',
+            type=int,
+            help='Only tasks assigned to this patient profile ID',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Required to clear tasks for every provider and patient',
+        )
+        # batching
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELETE_BATCH_SIZE,
+            help=f'Rows per transaction (default: {DELETE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=DELETE_BATCH_PAUSE,
+            help=f'Seconds to wait between batches (default: {DELETE_BATCH_PAUSE})',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        tasks = Task.objects.all()
+        scope = 'all tasks'
+
+        if options['provider_id']:
+            if not UserProfile.objects.filter(id=options['provider_id'], user_type='provider').exists():
+                raise CommandError(f'Provider {options["provider_id"]} not found')
+            tasks = tasks.filter(assigned_by_id=options['provider_id'])
+            scope = f'tasks assigned by provider {options["provider_id"]}'
+        if options['patient_id']:
+            if not UserProfile.objects.filter(id=options['patient_id'], user_type='patient').exists():
+                raise CommandError(f'Patient {options["patient_id"]} not found')
+            tasks = tasks.filter(assigned_to_id=options['patient_id'])
+            scope = f'tasks for patient {options["patient_id"]}'
+        if not (options['provider_id'] or options['patient_id'] or options['all']):
+            raise CommandError('Please specify --provider-id, --patient-id or --all')
+
+        if options['reset_responses']:
+            operation = DeletionService.reset_responses
+            action = 'Resetting responses for'
+        else:
+            if options['completed']:
+                tasks = tasks.filter(status='completed')
+                scope = f'completed {scope}'
+            operation = DeletionService.delete_tasks
+            action = 'Deleting'
+
+        self.stdout.write(f'{action} {scope}')
+        owners = TaskService.get_task_owners(tasks)
+        changed = 0
+        for walked, total, changed in operation(tasks, batch_size=options['batch_size'], pause=options['pause']):
+            self.stdout.write(f'  {walked}/{total} tasks processed')
+        TaskService.invalidate_task_statistics(*owners)
+
+        if options['reset_responses']:
+            self.stdout.write(self.style.SUCCESS(f'Reset {changed} task response(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {changed} task(s)'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from taskmanager.caching import DASHBOARD_FRAGMENTS, get_fragment_stats, reset_fragment_stats
+
+
+# command to report how often dashboard fragments come from the cache
+class Command(BaseCommand):
+    help = 'Show hits, misses and hit ratio of the cached dashboard fragments'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fragments',
+            nargs='*',
+            help=f'Fragment names (default: {", ".join(DASHBOARD_FRAGMENTS)})',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zero the counters after reporting them',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        names = options['fragments'] or DASHBOARD_FRAGMENTS
+        stats = get_fragment_stats(names)
+
+        self.stdout.write(f'{"fragment":<26} {"hits":>8} {"misses":>8} {"hit ratio":>10}')
+        total_hits = total_misses = 0
+        for name, (hits, misses) in stats.items():
+            total_hits += hits
+            total_misses += misses
+            self.stdout.write(f'{name:<26} {hits:>8} {misses:>8} {self._ratio(hits, misses):>10}')
+        self.stdout.write(f'{"total":<26} {total_hits:>8} {total_misses:>8} {self._ratio(total_hits, total_misses):>10}')
+
+        if options['reset']:
+            reset_fragment_stats(names)
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
+
+    def _ratio(self, hits, misses):
+        if not hits + misses:
+            return '-'
+        return f'{hits / (hits + misses):.1%}'
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from taskmanager.services.job_service import JobService
+
+
+# command to report background job throughput and latency
+class Command(BaseCommand):
+    help = 'Show the job queue depth, and outcomes and latency of recently finished jobs by name'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=24,
+            help='Report jobs finished in the last this many hours (default: 24)',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        depth = JobService.get_queue_depth()
+        self.stdout.write(
+            f'Queued {depth["queued"]} ({depth["due"]} due, oldest waiting {depth["oldest_wait"]:.1f}s), '
+            f'running {depth["running"]}'
+        )
+
+        metrics = JobService.get_metrics(timezone.now() - timedelta(hours=options['hours']))
+        if not metrics:
+            self.stdout.write(f'No jobs finished in the last {options["hours"]:g} hours')
+            return
+
+        self.stdout.write(
+            f'{"job":<26} {"ok":>6} {"failed":>6} {"retried":>7} '
+            f'{"wait p50/p95 s":>16} {"run p50/p95 s":>16} {"total p50/p95 s":>16}'
+        )
+        for name, job in sorted(metrics.items()):
+            self.stdout.write(
+                f'{name:<26} {job["succeeded"]:>6} {job["failed"]:>6} {job["retried"]:>7} '
+                f'{self._pair(job["wait"]):>16} {self._pair(job["run"]):>16} {self._pair(job["total"]):>16}'
+            )
+
+    def _pair(self, summary):
+        if summary is None:
+            return '-'
+        p50, p95 = summary
+        return f'{p50:.2f}/{p95:.2f}'
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from taskmanager.services.completion_feed_service import CompletionFeedService
+
+
+# command to delete old events from the live completion feed
+class Command(BaseCommand):
+    help = 'Delete completion feed events older than a cutoff; clients only replay recent ones on reconnect'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=7,
+            help='Delete events created more than this many days ago (default: 7)',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        deleted = CompletionFeedService.prune(timedelta(days=options['older_than_days']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} completion event(s)'))
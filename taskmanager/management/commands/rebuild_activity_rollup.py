@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from taskmanager.services.activity_service import ActivityService
+from taskmanager.models import PatientDailyActivity
+
+
+# command to rebuild the daily activity rollup from history
+class Command(BaseCommand):
+    help = 'Rebuild the per-patient daily activity rollup from tasks and checklist submissions'
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows aggregated per transaction (default: 1000)',
+        )
+
+    # execute
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        self.stdout.write(f'Rebuilding activity rollup in chunks of {chunk_size}')
+
+        # progress after every chunk
+        for source, processed in ActivityService.rebuild(chunk_size=chunk_size):
+            self.stdout.write(f'  {source}: {processed} rows processed')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt activity rollup: {PatientDailyActivity.objects.count()} rows')
+        )
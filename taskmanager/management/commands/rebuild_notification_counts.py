@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from taskmanager.services.notification_service import NotificationService
+
+
+# command to recount the unread notification counters
+class Command(BaseCommand):
+    help = 'Recount every recipient\'s unread notifications, e.g. after editing notifications by hand'
+
+    # execute
+    def handle(self, *args, **options):
+        recipients = NotificationService.rebuild_counts()
+        self.stdout.write(self.style.SUCCESS(f'Recounted unread notifications for {recipients} recipients'))
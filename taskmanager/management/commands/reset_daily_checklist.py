@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from taskmanager.models import DailyChecklistSubmission
+from taskmanager.services.deletion_service import DeletionService
 from users.models import UserProfile
 from datetime import date
 
@@ -82,7 +83,9 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('No submissions found to delete'))
             return
 
-        submissions.delete()
+        patient_ids = set(submissions.order_by().values_list('patient_id', flat=True).distinct())
+        count = DeletionService.run(DeletionService.delete_checklists(submissions))
+        DailyChecklistSubmission.invalidate_patients(*patient_ids)
         self.stdout.write(
             self.style.SUCCESS(f'Successfully deleted {count} checklist submission(s)')
         )
@@ -0,0 +1,107 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+import logging
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from taskmanager import caching
+from django.db import DatabaseError, close_old_connections, connections
+from taskmanager.services.job_service import JOB_STALE_AFTER, JobService
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for stuck jobs and old finished ones
+MAINTENANCE_INTERVAL = 60
+
+
+def _run_in_thread(job):
+    try:
+        return JobService.run(job)
+    finally:
+        # Each pool thread has its own connection; don't leave it open between jobs
+        connections.close_all()
+
+
+# command to run queued background jobs
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (notifications, bulk task changes, account deletion) in a pool of '
+        'threads, retrying failures with backoff. Run one or more alongside the web server.'
+    )
+
+    # command line args
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Jobs run at once (default: 2)')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds between checks for due jobs while idle (default: 1)',
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=JOB_STALE_AFTER,
+            help=f'Seconds before a running job is presumed lost and queued again (default: {JOB_STALE_AFTER})',
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=7,
+            help='Days to keep finished jobs for job_stats before deleting them (default: 7)',
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once no jobs are due, instead of waiting for more')
+
+    # execute
+    def handle(self, *args, **options):
+        if not caching.is_shared():
+            # Jobs bump cache versions the web workers would never see
+            raise CommandError('run_jobs needs a cache shared with the web server - set CACHE_URL to file:// or redis://')
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker_id = f'{socket.gethostname()[:60]}:{os.getpid()}'
+        threads = options['threads']
+        self.stdout.write(f'Worker {worker_id} running jobs in {threads} threads')
+
+        running = set()
+        next_maintenance = 0
+        with ThreadPoolExecutor(threads, thread_name_prefix='job') as pool:
+            while not self.stopping:
+                close_old_connections()
+                try:
+                    if time.monotonic() >= next_maintenance:
+                        self.maintain(options)
+                        next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+                    claimed = JobService.claim(worker_id, threads - len(running)) if len(running) < threads else []
+                except DatabaseError:
+                    # Locked or unreachable - try again after the poll interval
+                    logger.exception('Could not claim jobs')
+                    claimed = []
+                running.update(pool.submit(_run_in_thread, job) for job in claimed)
+
+                if not running and not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                elif len(running) >= threads or not claimed:
+                    # Full, or nothing more due - wait for a thread to free up
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    self.report_errors(done)
+            # Let running jobs finish; queued ones wait for the next worker
+            done, _ = wait(running)
+            self.report_errors(done)
+        self.stdout.write('Worker stopped')
+
+    def stop(self, signum, frame):
+        self.stdout.write('Finishing running jobs before stopping')
+        self.stopping = True
+
+    def maintain(self, options):
+        JobService.requeue_stale(timedelta(seconds=options['stale_after']))
+        JobService.prune(timedelta(days=options['keep_days']))
+
+    def report_errors(self, done):
+        for future in done:
+            # JobService.run records job errors; this is the worker failing to record them
+            if future.exception() is not None:
+                logger.error('Could not record a job outcome', exc_info=future.exception())
@@ -0,0 +1,87 @@
+from datetime import timedelta
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections
+from taskmanager import caching
+from taskmanager.services.reminder_service import (
+    REMINDER_BATCH_SIZE, REMINDER_LEAD, REMINDER_OVERDUE_LOOKBACK, ReminderService,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# command to send reminders about tasks coming due or overdue
+class Command(BaseCommand):
+    help = (
+        'Send reminder notifications for pending tasks due soon or overdue, once per task, window and '
+        'due date. Run it from cron, or with --loop as a long-running process.'
+    )
+
+    # command line args
+    def add_arguments(self, parser):
+        lead_hours = int(REMINDER_LEAD.total_seconds() // 3600)
+        parser.add_argument(
+            '--lead-hours', type=int, default=lead_hours,
+            help=f'Remind about tasks due within this many hours (default: {lead_hours})',
+        )
+        parser.add_argument(
+            '--overdue-days', type=int, default=REMINDER_OVERDUE_LOOKBACK.days,
+            help=f'Skip tasks overdue for longer than this many days (default: {REMINDER_OVERDUE_LOOKBACK.days})',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=REMINDER_BATCH_SIZE,
+            help=f'Tasks reminded per transaction (default: {REMINDER_BATCH_SIZE})',
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep running, sending reminders every --interval seconds')
+        parser.add_argument(
+            '--interval', type=int, default=300,
+            help='Seconds between runs with --loop (default: 300)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Count the reminders that are due without sending them')
+
+    # execute
+    def handle(self, *args, **options):
+        settings = {
+            'lead': timedelta(hours=options['lead_hours']),
+            'overdue_lookback': timedelta(days=options['overdue_days']),
+        }
+        if options['dry_run']:
+            due = ReminderService.count_due(**settings)
+            self.stdout.write(', '.join(f'{count} {window}' for window, count in due.items()) + ' reminder(s) due')
+            return
+
+        if not caching.is_shared():
+            # New reminders bump the inbox versions and unread counts the web workers cache
+            raise CommandError('send_due_reminders needs a cache shared with the web server - set CACHE_URL to file:// or redis://')
+
+        if not options['loop']:
+            self.send(settings, options['batch_size'])
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopping:
+            close_old_connections()
+            next_run = time.monotonic() + options['interval']
+            try:
+                self.send(settings, options['batch_size'])
+            except DatabaseError:
+                # Locked or unreachable - sent batches are kept, the rest go next run
+                logger.exception('Could not send reminders')
+            while not self.stopping and time.monotonic() < next_run:
+                time.sleep(min(1, next_run - time.monotonic()))
+
+    def send(self, settings, batch_size):
+        started = time.perf_counter()
+        sent = ReminderService.send_reminders(batch_size=batch_size, **settings)
+        summary = ', '.join(f'{count} {window}' for window, count in sent.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {summary} reminder(s) in {time.perf_counter() - started:.2f}s'
+        ))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,72 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .db import REPLICA_PIN_COOKIE, replica_configured
+from .identity import load_identity
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Base class for middleware that works the same under WSGI and ASGI
+
+    Unlike Django's MiddlewareMixin, the hooks run inline in both modes
+    instead of in a worker thread under ASGI, so they must not query the
+    database or do other blocking work.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        return self.process_response(request, await self.get_response(request))
+
+    def process_request(self, request) -> None:
+        pass
+
+    def process_response(self, request, response):
+        return response
+
+
+class ReplicaPinMiddleware(SyncAndAsyncMiddleware):
+    """
+    Keep a client's reads on the primary for a short while after it writes
+
+    Any non-GET/HEAD request sets a short-lived cookie, and read_replica views
+    skip the replica while it is present, so users see their own changes
+    even when the replica lags.
+    """
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_configured():
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class IdentityMiddleware(SyncAndAsyncMiddleware):
+    """
+    Attach the user's Identity to the request as request.identity
+
+    It is loaded on first use, with one query that also caches
+    request.user.profile, so requests that never check permissions don't pay
+    for it. Async views load it with identity.aget_identity. Goes after
+    AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        request.identity = SimpleLazyObject(lambda: load_identity(request.user))
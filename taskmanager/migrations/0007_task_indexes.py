@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0006_dailychecklistsubmission'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='questionnairetemplate',
+            name='task_type',
+            field=models.CharField(choices=[('memory_questionnaire', 'Memory Questionnaire'), ('puzzle', 'Drag & Drop Puzzle'), ('color', 'Color Matching'), ('pairs', 'Related Pairing')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='assigned_by',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_tasks', to='users.userprofile'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='assigned_to',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='users.userprofile'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='task_type',
+            field=models.CharField(choices=[('memory_questionnaire', 'Memory Questionnaire'), ('puzzle', 'Drag & Drop Puzzle'), ('color', 'Color Matching'), ('pairs', 'Related Pairing')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_to', '-created_at'], name='task_to_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_to', 'status', '-created_at'], name='task_to_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_to', 'status', '-completed_at'], name='task_to_status_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_by', '-created_at'], name='task_by_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_by', 'status', '-created_at'], name='task_by_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status__in', [django.db.models.expressions.RawSQL("'assigned'", ()), django.db.models.expressions.RawSQL("'in_progress'", ())])), fields=['assigned_to', 'due_date', 'created_at'], name='task_to_pending_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status__in', [django.db.models.expressions.RawSQL("'assigned'", ()), django.db.models.expressions.RawSQL("'in_progress'", ())])), fields=['assigned_to', '-created_at'], name='task_to_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status__in', [django.db.models.expressions.RawSQL("'assigned'", ()), django.db.models.expressions.RawSQL("'in_progress'", ())])), fields=['assigned_by', '-created_at'], name='task_by_pending_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0007_task_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(blank=True, choices=[('memory_questionnaire', 'Memory Questionnaire'), ('puzzle', 'Drag & Drop Puzzle'), ('color', 'Color Matching'), ('pairs', 'Related Pairing')], max_length=50)),
+                ('activity_date', models.DateField()),
+                ('tasks_assigned', models.IntegerField(default=0)),
+                ('tasks_completed', models.IntegerField(default=0)),
+                ('checklists_submitted', models.IntegerField(default=0)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='users.userprofile')),
+                ('provider', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='patient_daily_activity', to='users.userprofile')),
+            ],
+            options={
+                'ordering': ['-activity_date'],
+                'indexes': [models.Index(fields=['provider', 'activity_date'], name='activity_provider_date_idx')],
+                'unique_together': {('patient', 'activity_date', 'provider', 'task_type')},
+            },
+        ),
+    ]
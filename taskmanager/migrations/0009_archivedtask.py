@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0008_patientdailyactivity'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.IntegerField(unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('task_type', models.CharField(choices=[('memory_questionnaire', 'Memory Questionnaire'), ('puzzle', 'Drag & Drop Puzzle'), ('color', 'Color Matching'), ('pairs', 'Related Pairing')], max_length=50)),
+                ('difficulty', models.CharField(blank=True, choices=[('hard', 'Hard'), ('medium', 'Medium'), ('easy', 'Easy')], max_length=50, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('due_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('payload', models.BinaryField()),
+                ('assigned_by', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_assigned_tasks', to='users.userprofile')),
+                ('assigned_to', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to='users.userprofile')),
+                ('completed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_completed_tasks', to='users.userprofile')),
+            ],
+            options={
+                'ordering': ['-completed_at'],
+                'indexes': [models.Index(fields=['assigned_to', '-completed_at'], name='archived_to_done_idx'), models.Index(fields=['assigned_by', '-completed_at'], name='archived_by_done_idx')],
+            },
+        ),
+    ]
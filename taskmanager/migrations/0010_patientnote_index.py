@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0009_archivedtask'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patientnote',
+            index=models.Index(fields=['patient', '-created_at'], name='note_patient_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0010_patientnote_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskresponse',
+            name='accuracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskresponse',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskresponse',
+            name='max_score',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskresponse',
+            name='metrics_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='taskresponse',
+            name='moves',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_unread(apps, schema_editor):
+    """Start the counters from the notifications already unread"""
+    TaskNotification = apps.get_model('taskmanager', 'TaskNotification')
+    UnreadNotificationCount = apps.get_model('taskmanager', 'UnreadNotificationCount')
+    rows = (
+        TaskNotification.objects.filter(read_at__isnull=True)
+        .values('recipient_id').annotate(unread=Count('id')).order_by()
+    )
+    UnreadNotificationCount.objects.bulk_create(
+        [UnreadNotificationCount(recipient_id=row['recipient_id'], unread=row['unread']) for row in rows],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0011_taskresponse_metrics'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadNotificationCount',
+            fields=[
+                ('recipient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_notifications', serialize=False, to='users.userprofile')),
+                ('unread', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='tasknotification',
+            name='recipient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='users.userprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='tasknotification',
+            index=models.Index(fields=['recipient', 'read_at', '-created_at'], name='notif_recipient_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasknotification',
+            index=models.Index(fields=['recipient', '-created_at'], name='notif_recipient_created_idx'),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0012_notification_inbox'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('task', 'Task Completed'), ('checklist', 'Daily Checklist Submitted')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('message', models.CharField(max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='completion_events', to='users.userprofile')),
+                ('provider', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='patient_completion_events', to='users.userprofile')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['provider', 'id'], name='completion_provider_idx'), models.Index(fields=['patient', 'id'], name='completion_patient_idx'), models.Index(fields=['created_at'], name='completion_created_idx')],
+            },
+        ),
+    ]
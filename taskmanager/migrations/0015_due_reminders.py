@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0014_jobs'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('due_soon', 'Due Soon'), ('overdue', 'Overdue')], max_length=20)),
+                ('due_date', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status__in', [django.db.models.expressions.RawSQL("'assigned'", ()), django.db.models.expressions.RawSQL("'in_progress'", ())])), fields=['due_date'], name='task_pending_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='taskreminder',
+            name='task',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='taskmanager.task'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskreminder',
+            constraint=models.UniqueConstraint(fields=('task', 'window', 'due_date'), name='task_reminder_unique'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_providers(apps, schema_editor):
+    """Fill in the patient's current provider - the one the rollup last counted the submission under"""
+    DailyChecklistSubmission = apps.get_model('taskmanager', 'DailyChecklistSubmission')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    DailyChecklistSubmission.objects.update(provider_id=Subquery(
+        UserProfile.objects.filter(id=OuterRef('patient_id')).values('provider_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0015_due_reminders'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailychecklistsubmission',
+            name='provider',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='patient_checklist_submissions', to='users.userprofile'),
+        ),
+        migrations.RunPython(set_providers, migrations.RunPython.noop),
+    ]
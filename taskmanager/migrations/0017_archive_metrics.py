@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:17
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+from taskmanager.models import response_metrics
+
+BATCH_SIZE = 1000
+
+
+def fill_metrics(apps, schema_editor):
+    """Extract the new metric columns from each archived response in the compressed payload"""
+    ArchivedTask = apps.get_model('taskmanager', 'ArchivedTask')
+    fields = ['max_score', 'accuracy', 'moves', 'duration_seconds']
+    last_pk = 0
+    # Walked by pk, a batch at a time, so no cursor stays open across the updates
+    while batch := list(ArchivedTask.objects.filter(pk__gt=last_pk).only('id', 'payload').order_by('pk')[:BATCH_SIZE]):
+        last_pk = batch[-1].pk
+        for archived in batch:
+            response = json.loads(zlib.decompress(bytes(archived.payload))).get('response')
+            metrics = response_metrics(response['responses'] if response else None)
+            for field in fields:
+                setattr(archived, field, metrics[field])
+        ArchivedTask.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskmanager', '0016_checklist_provider'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtask',
+            name='accuracy',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='max_score',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='moves',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['assigned_to', 'task_type', 'completed_at'], name='archived_to_type_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['assigned_by', 'task_type', 'assigned_to'], name='archived_by_type_idx'),
+        ),
+        migrations.RunPython(fill_metrics, migrations.RunPython.noop),
+    ]
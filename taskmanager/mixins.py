@@ -3,12 +3,15 @@ from django.core.exceptions import PermissionDenied
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.contrib import messages
+from .identity import get_identity
 
 
-class ProviderRequiredMixin(LoginRequiredMixin):
-    """Mixin to ensure user is a provider"""
+class RoleRequiredMixin(LoginRequiredMixin):
+    """Mixin to ensure user has one of required_roles, checked against request.identity"""
+    required_roles = ()
+
     def dispatch(self, request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'provider':
+        if not get_identity(request).has_role(*self.required_roles):
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
             messages.error(request, 'You do not have permission to access this page.')
@@ -16,45 +19,26 @@ class ProviderRequiredMixin(LoginRequiredMixin):
         return super().dispatch(request, *args, **kwargs)
 
 
-class PatientRequiredMixin(LoginRequiredMixin):
+class ProviderRequiredMixin(RoleRequiredMixin):
+    """Mixin to ensure user is a provider"""
+    required_roles = ('provider',)
+
+
+class PatientRequiredMixin(RoleRequiredMixin):
     """Mixin to ensure user is a patient"""
-    def dispatch(self, request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'patient':
-            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('home')
-        return super().dispatch(request, *args, **kwargs)
+    required_roles = ('patient',)
 
 
-class PatientOrCaregiverRequiredMixin(LoginRequiredMixin):
+class PatientOrCaregiverRequiredMixin(RoleRequiredMixin):
     """Mixin to ensure user is a patient or caregiver"""
-    def dispatch(self, request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type not in ['patient', 'caregiver']:
-            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('home')
-        return super().dispatch(request, *args, **kwargs)
+    required_roles = ('patient', 'caregiver')
 
 
-class AdminRequiredMixin(LoginRequiredMixin):
+class AdminRequiredMixin(RoleRequiredMixin):
     """Mixin to ensure user is an admin"""
-    def dispatch(self, request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'admin':
-            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('home')
-        return super().dispatch(request, *args, **kwargs)
+    required_roles = ('admin',)
 
 
-class ProviderOrAdminRequiredMixin(LoginRequiredMixin):
+class ProviderOrAdminRequiredMixin(RoleRequiredMixin):
     """Mixin to ensure user is a provider or admin"""
-    def dispatch(self, request, *args, **kwargs):
-        if not hasattr(request.user, 'profile') or request.user.profile.user_type not in ['provider', 'admin']:
-            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-                return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
-            messages.error(request, 'You do not have permission to access this page.')
-            return redirect('home')
-        return super().dispatch(request, *args, **kwargs) 
\ No newline at end of file
+    required_roles = ('provider', 'admin')
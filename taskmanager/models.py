@@ -1,10 +1,64 @@
 from django.db import models
 from django.contrib.auth.models import User
 from users.models import UserProfile
-from .constants import TASK_TYPES, TASK_STATUS, DIFFICULTY_LEVELS
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .constants import TASK_TYPES, TASK_STATUS, DIFFICULTY_LEVELS, PENDING_STATUSES
+from . import caching
+from typing import Optional
 import json
+import math
+import zlib
 from datetime import date
 
+# Pending filter with the statuses written as SQL literals.
+# SQLite only uses a partial index when the query repeats its WHERE term exactly,
+# and a bound parameter never matches, so the same Q is used for index and queries.
+PENDING_STATUS_Q = models.Q(status__in=[RawSQL(f"'{status}'", ()) for status in PENDING_STATUSES])
+
+# Bump when TaskResponse.extract_metrics changes so backfill_response_metrics redoes old rows
+RESPONSE_METRICS_VERSION = 1
+
+
+def _visible_tasks(queryset, identity):
+    """
+    Tasks (live or archived) an identity can see
+
+    Admins see everything, providers the tasks they assigned, patients the
+    tasks assigned to them. Caregivers see their patient's tasks from their
+    provider, and any task they completed themselves.
+    """
+    if identity.role == 'admin':
+        return queryset
+    if identity.role == 'provider':
+        return queryset.filter(assigned_by_id=identity.profile_id)
+    if identity.role == 'patient':
+        return queryset.filter(assigned_to_id=identity.profile_id)
+    if identity.role == 'caregiver':
+        return queryset.filter(
+            models.Q(assigned_to_id=identity.patient_id, assigned_by_id=identity.provider_id) |
+            models.Q(completed_by_id=identity.profile_id)
+        )
+    return queryset.none()
+
+
+class TaskQuerySet(models.QuerySet):
+    """Common task filters shared by views and services"""
+
+    def visible_to(self, identity):
+        """Tasks the request's Identity can see - see _visible_tasks"""
+        return _visible_tasks(self, identity)
+
+    def pending(self):
+        """Tasks that are assigned or in progress"""
+        return self.filter(PENDING_STATUS_Q)
+
+    def completed(self):
+        """Tasks that have been completed"""
+        return self.filter(status='completed')
+
+
 # DB models and their relations
 class Task(models.Model):
     title = models.CharField(max_length=255)
@@ -20,8 +74,9 @@ class Task(models.Model):
         help_text="Cognitive difficulty level for games"
     )
     
-    assigned_by = models.ForeignKey(UserProfile, related_name='assigned_tasks', on_delete=models.CASCADE)
-    assigned_to = models.ForeignKey(UserProfile, related_name='tasks', on_delete=models.CASCADE)
+    # FK indexes are covered by the composite indexes in Meta
+    assigned_by = models.ForeignKey(UserProfile, related_name='assigned_tasks', on_delete=models.CASCADE, db_index=False)
+    assigned_to = models.ForeignKey(UserProfile, related_name='tasks', on_delete=models.CASCADE, db_index=False)
     completed_by = models.ForeignKey(UserProfile, related_name='completed_tasks', on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=[
         ('assigned', 'Assigned'),
@@ -37,6 +92,8 @@ class Task(models.Model):
     
     # Task configuration - json to keep data easy to use
     task_config = models.JSONField(default=dict, blank=True)
+
+    objects = TaskQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.title} - {self.assigned_to.user.username}"
@@ -50,6 +107,23 @@ class Task(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Indexes follow the dashboard and list access paths
+        # (checked by `manage.py check_query_plans`)
+        indexes = [
+            # Patient/caregiver task lists
+            models.Index(fields=['assigned_to', '-created_at'], name='task_to_created_idx'),
+            models.Index(fields=['assigned_to', 'status', '-created_at'], name='task_to_status_created_idx'),
+            models.Index(fields=['assigned_to', 'status', '-completed_at'], name='task_to_status_done_idx'),
+            # Provider task lists
+            models.Index(fields=['assigned_by', '-created_at'], name='task_by_created_idx'),
+            models.Index(fields=['assigned_by', 'status', '-created_at'], name='task_by_status_created_idx'),
+            # Pending tasks only - small and hot
+            models.Index(fields=['assigned_to', 'due_date', 'created_at'], condition=PENDING_STATUS_Q, name='task_to_pending_due_idx'),
+            models.Index(fields=['assigned_to', '-created_at'], condition=PENDING_STATUS_Q, name='task_to_pending_created_idx'),
+            models.Index(fields=['assigned_by', '-created_at'], condition=PENDING_STATUS_Q, name='task_by_pending_created_idx'),
+            # Due-date reminders across all patients
+            models.Index(fields=['due_date'], condition=PENDING_STATUS_Q, name='task_pending_due_idx'),
+        ]
 
 class QuestionnaireTemplate(models.Model):
     """
@@ -93,13 +167,58 @@ class TaskResponse(models.Model):
     # For scored tasks and games
     score = models.FloatField(null=True, blank=True)  
     notes = models.TextField(blank=True)
+
+    # Game results copied out of responses so they can be filtered and sorted in SQL
+    max_score = models.PositiveIntegerField(null=True, blank=True)
+    # score / max_score, comparable across difficulties
+    accuracy = models.FloatField(null=True, blank=True)
+    moves = models.PositiveIntegerField(null=True, blank=True)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
+    # RESPONSE_METRICS_VERSION the columns were extracted with, 0 if never
+    metrics_version = models.PositiveSmallIntegerField(default=0)
     
     def __str__(self):
         return f"Response to {self.task.title} by {self.task.assigned_to.user.username}"
+
+    def extract_metrics(self):
+        """Fill the metric columns from the responses JSON; anything missing or not a number stays null"""
+        for field, value in response_metrics(self.responses).items():
+            setattr(self, field, value)
+        self.metrics_version = RESPONSE_METRICS_VERSION
     
     class Meta:
         ordering = ['-started_at']
 
+
+def response_metrics(responses) -> dict:
+    """The metric columns for a responses JSON object, as a dict of field name to value"""
+    data = responses if isinstance(responses, dict) else {}
+    score = _to_number(data.get('score'))
+    total = _to_number(data.get('total'))
+    max_score = int(total) if total is not None else None
+    moves = _to_number(data.get('moves'))
+    duration = _to_number(data.get('time'))
+    return {
+        'score': score,
+        'max_score': max_score,
+        'accuracy': score / max_score if score is not None and max_score else None,
+        'moves': int(moves) if moves is not None else None,
+        'duration_seconds': round(duration) if duration is not None else None,
+    }
+
+
+def _to_number(value) -> Optional[float]:
+    """A non-negative number from a JSON value, or None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number) or number < 0:
+        return None
+    return number
+
 class TaskNotification(models.Model):
     """
     Notifications system for task events
@@ -110,7 +229,7 @@ class TaskNotification(models.Model):
     # Task linking to the notification
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='notifications')
     # Who receives the notification
-    recipient = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    recipient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, db_index=False)
     # What the message is
     message = models.CharField(max_length=500)
     notification_type = models.CharField(max_length=50, choices=[
@@ -127,6 +246,142 @@ class TaskNotification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Unread inbox and mark-all-read
+            models.Index(fields=['recipient', 'read_at', '-created_at'], name='notif_recipient_read_idx'),
+            # Whole inbox
+            models.Index(fields=['recipient', '-created_at'], name='notif_recipient_created_idx'),
+        ]
+
+
+class UnreadNotificationCount(models.Model):
+    """
+    Number of unread notifications per recipient
+
+    Kept up to date by NotificationService as notifications are created, read
+    and deleted, with updates relative to the stored value, so the inbox badge
+    reads one row instead of counting the recipient's unread notifications.
+    """
+    recipient = models.OneToOneField(UserProfile, on_delete=models.CASCADE, primary_key=True, related_name='unread_notifications')
+    unread = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"Unread notifications - {self.recipient_id}: {self.unread}"
+
+
+class TaskReminder(models.Model):
+    """
+    A due-date reminder sent about a task
+
+    One row per task, reminder window and due date, written with the
+    reminder notification by ReminderService, so rerunning the scheduler
+    sends nothing twice while a task that is given a new due date is
+    reminded again.
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='reminders', db_index=False)
+    window = models.CharField(max_length=20, choices=[
+        ('due_soon', 'Due Soon'),
+        ('overdue', 'Overdue'),
+    ])
+    # The task's due date when the reminder was sent
+    due_date = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the index the scheduler checks sent reminders with
+            models.UniqueConstraint(fields=['task', 'window', 'due_date'], name='task_reminder_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.window} - {self.task_id} - {self.due_date}"
+
+
+class CompletionEventQuerySet(models.QuerySet):
+
+    def visible_to(self, identity):
+        """
+        Events the request's Identity can follow
+
+        Providers see completions of the tasks they assigned and their
+        patients' checklists; caregivers see their patient's checklists and
+        the tasks from their provider. Keep in step with
+        CompletionFeedService.is_visible, which applies the same rule to
+        events fanned out in memory.
+        """
+        if identity.role == 'provider':
+            return self.filter(provider_id=identity.profile_id)
+        if identity.role == 'caregiver' and identity.patient_id:
+            return self.filter(patient_id=identity.patient_id).filter(
+                models.Q(event_type='checklist') | models.Q(provider_id=identity.provider_id)
+            )
+        return self.none()
+
+    def after(self, event_id: int):
+        """Events newer than event_id, oldest first"""
+        return self.filter(id__gt=event_id).order_by('id')
+
+
+class CompletionEvent(models.Model):
+    """
+    A patient finishing a task or the daily checklist, for the live completion feed
+
+    Appended by CompletionFeedService once a completion commits. The id is
+    the server-sent event id, so a listener that reconnects with
+    Last-Event-ID gets what it missed. prune_completion_events drops old rows.
+    """
+    patient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='completion_events', db_index=False)
+    # provider who assigned the task (patient's provider for checklists)
+    provider = models.ForeignKey(
+        UserProfile, on_delete=models.CASCADE, related_name='patient_completion_events', null=True, blank=True, db_index=False
+    )
+    event_type = models.CharField(max_length=20, choices=[
+        ('task', 'Task Completed'),
+        ('checklist', 'Daily Checklist Submitted'),
+    ])
+    # The task or checklist submission - not a foreign key, so deleting those keeps the event
+    object_id = models.BigIntegerField()
+    message = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CompletionEventQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Replay after Last-Event-ID, per listener
+            models.Index(fields=['provider', 'id'], name='completion_provider_idx'),
+            models.Index(fields=['patient', 'id'], name='completion_patient_idx'),
+            # Pruning
+            models.Index(fields=['created_at'], name='completion_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} - {self.patient_id} - {self.message}"
+
+class AppointmentQuerySet(models.QuerySet):
+
+    def visible_to(self, identity):
+        """
+        Appointments the request's Identity can see
+
+        Admins see everything, providers and patients their own appointments,
+        caregivers their patient's.
+        """
+        if identity.role == 'admin':
+            return self
+        if identity.role == 'provider':
+            return self.filter(provider_id=identity.profile_id)
+        if identity.role == 'patient':
+            return self.filter(patient_id=identity.profile_id)
+        if identity.role == 'caregiver' and identity.patient_id:
+            return self.filter(patient_id=identity.patient_id)
+        return self.none()
+
+    def upcoming(self):
+        """Appointments from now on"""
+        return self.filter(datetime__gte=timezone.now())
+
 
 class Appointment(models.Model):
     """
@@ -143,12 +398,27 @@ class Appointment(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = AppointmentQuerySet.as_manager()
+    
     def __str__(self):
         return f"Appointment: {self.patient.user.get_full_name()} with {self.provider.user.get_full_name()} on {self.datetime}"
     
     class Meta:
         ordering = ['datetime']
 
+class PatientNoteQuerySet(models.QuerySet):
+
+    def visible_to(self, identity):
+        """Notes the request's Identity can see - admins all, providers the ones they sent, caregivers the ones sent to them"""
+        if identity.role == 'admin':
+            return self
+        if identity.role == 'provider':
+            return self.filter(provider_id=identity.profile_id)
+        if identity.role == 'caregiver':
+            return self.filter(caregiver_id=identity.profile_id)
+        return self.none()
+
+
 class PatientNote(models.Model):
     """
     Communication notes between proviers and caregivers surrounding patient care.
@@ -165,12 +435,38 @@ class PatientNote(models.Model):
     # The note to send
     note = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PatientNoteQuerySet.as_manager()
     
     def __str__(self):
         return f"Note from {self.provider.user.get_full_name()} to {self.caregiver.user.get_full_name()} about {self.patient.user.get_full_name()}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Notes lists page newest first within a patient
+            models.Index(fields=['patient', '-created_at'], name='note_patient_created_idx'),
+        ]
+
+class DailyChecklistSubmissionQuerySet(models.QuerySet):
+
+    def visible_to(self, identity):
+        """
+        Submissions the request's Identity can see
+
+        Admins see everything, providers their patients', patients their own,
+        caregivers their patient's.
+        """
+        if identity.role == 'admin':
+            return self
+        if identity.role == 'provider':
+            return self.filter(patient__provider_id=identity.profile_id)
+        if identity.role == 'patient':
+            return self.filter(patient_id=identity.profile_id)
+        if identity.role == 'caregiver' and identity.patient_id:
+            return self.filter(patient_id=identity.patient_id)
+        return self.none()
+
 
 class DailyChecklistSubmission(models.Model):
     """
@@ -184,11 +480,16 @@ class DailyChecklistSubmission(models.Model):
     patient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='daily_checklist_submissions')
     # Dates
     submitted_by = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='submitted_daily_checklists')
+    # The patient's provider at submission, whose activity rollup row counts it
+    provider = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='patient_checklist_submissions', db_index=False)
     submission_date = models.DateField(auto_now_add=True)
     # Response in JSON format to the checklist
     responses = models.JSONField(default=dict)
     # Assigned at?
     created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = DailyChecklistSubmissionQuerySet.as_manager()
     
     class Meta:
         # One submission per day per patient enforced in DB
@@ -201,16 +502,24 @@ class DailyChecklistSubmission(models.Model):
     @classmethod
     def get_today_submission(cls, patient):
         """
-        Get today's submission for a patient, if it exists
+        Get today's submission for a patient (profile or id), if it exists
+        
+        Cached in the patient's namespace until invalidate_patients is called for them.
         
         Returns:
             DailyChecklistSubmission or None if not submitted today
         """
         today = date.today()
-        try:
-            return cls.objects.get(patient=patient, submission_date=today)
-        except cls.DoesNotExist:
-            return None
+        patient_id = getattr(patient, 'pk', patient)
+        return caching.get_or_build(
+            f'checklist_today:{today.isoformat()}', [caching.patient_namespace(patient_id)],
+            lambda: cls.objects.filter(patient_id=patient_id, submission_date=today).first(),
+        )
+    
+    @classmethod
+    def invalidate_patients(cls, *patient_ids):
+        """Invalidate the patients' cached submissions once the current transaction commits"""
+        caching.bump(*(caching.patient_namespace(patient_id) for patient_id in patient_ids))
     
     @classmethod
     def can_submit_today(cls, patient):
@@ -221,3 +530,182 @@ class DailyChecklistSubmission(models.Model):
             bool: True if no submission for today, False otherwise
         """
         return cls.get_today_submission(patient) is None
+
+
+
+class PatientDailyActivity(models.Model):
+    """
+    Pre-aggregated activity per patient, per day, per provider and task type
+
+    Kept up to date by ActivityService as tasks and checklists are written, so
+    trend reports read a few rows per day instead of scanning Task and TaskResponse.
+    Daily checklists are counted on rows with a blank task type.
+    """
+    patient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='daily_activity')
+    # provider who assigned the tasks (patient's provider for checklists)
+    provider = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='patient_daily_activity', null=True, blank=True)
+    task_type = models.CharField(max_length=50, choices=TASK_TYPES, blank=True)
+    activity_date = models.DateField()
+    # Counters
+    tasks_assigned = models.IntegerField(default=0)
+    tasks_completed = models.IntegerField(default=0)
+    checklists_submitted = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['patient', 'activity_date', 'provider', 'task_type']
+        ordering = ['-activity_date']
+        indexes = [
+            models.Index(fields=['provider', 'activity_date'], name='activity_provider_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Activity - {self.patient_id} - {self.activity_date} - {self.task_type or 'checklist'}"
+
+
+class ArchivedTaskQuerySet(models.QuerySet):
+
+    def visible_to(self, identity):
+        """Archived tasks the request's Identity can see, by the same rules as live tasks"""
+        return _visible_tasks(self, identity)
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task and its response, moved out of the hot task tables
+
+    Keeps the original task id so result links keep working. List and analytics
+    filters, including the response metric columns, are columns; the
+    description, configuration and response data are stored together as
+    zlib-compressed JSON.
+    """
+    # Task.id of the archived task
+    task_id = models.IntegerField(unique=True)
+    title = models.CharField(max_length=255)
+    task_type = models.CharField(max_length=50, choices=TASK_TYPES)
+    difficulty = models.CharField(max_length=50, choices=DIFFICULTY_LEVELS, blank=True, null=True)
+    
+    # FK indexes are covered by the composite indexes in Meta
+    assigned_by = models.ForeignKey(UserProfile, related_name='archived_assigned_tasks', on_delete=models.CASCADE, db_index=False)
+    assigned_to = models.ForeignKey(UserProfile, related_name='archived_tasks', on_delete=models.CASCADE, db_index=False)
+    completed_by = models.ForeignKey(UserProfile, related_name='archived_completed_tasks', on_delete=models.SET_NULL, null=True, blank=True)
+    
+    # Dates
+    created_at = models.DateTimeField()
+    due_date = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    # The response's metric columns, as on TaskResponse
+    score = models.FloatField(null=True, blank=True)
+    max_score = models.PositiveIntegerField(null=True, blank=True)
+    accuracy = models.FloatField(null=True, blank=True)
+    moves = models.PositiveIntegerField(null=True, blank=True)
+    duration_seconds = models.PositiveIntegerField(null=True, blank=True)
+    # zlib-compressed JSON - see pack_payload()
+    payload = models.BinaryField()
+
+    objects = ArchivedTaskQuerySet.as_manager()
+    
+    def __str__(self):
+        return f"Archived {self.title} - {self.task_id}"
+    
+    @staticmethod
+    def pack_payload(data: dict) -> bytes:
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+    
+    def get_payload(self) -> dict:
+        return json.loads(zlib.decompress(bytes(self.payload)))
+    
+    def as_task(self):
+        """
+        Rebuild unsaved Task and TaskResponse instances for the results templates
+        
+        Returns:
+            tuple of (task, task_response), task_response is None if none was archived
+        """
+        payload = self.get_payload()
+        task = Task(
+            id=self.task_id,
+            title=self.title,
+            description=payload.get('description'),
+            task_type=self.task_type,
+            difficulty=self.difficulty,
+            assigned_by_id=self.assigned_by_id,
+            assigned_to_id=self.assigned_to_id,
+            completed_by_id=self.completed_by_id,
+            status='completed',
+            created_at=self.created_at,
+            due_date=self.due_date,
+            completed_at=self.completed_at,
+            task_config=payload.get('task_config', {}),
+        )
+        response = payload.get('response')
+        if response is None:
+            return task, None
+        task_response = TaskResponse(
+            task=task,
+            responses=response['responses'],
+            started_at=parse_datetime(response['started_at']) if response['started_at'] else None,
+            completed_at=parse_datetime(response['completed_at']) if response['completed_at'] else None,
+            score=self.score,
+            max_score=self.max_score,
+            accuracy=self.accuracy,
+            moves=self.moves,
+            duration_seconds=self.duration_seconds,
+            metrics_version=RESPONSE_METRICS_VERSION,
+            notes=response['notes'],
+        )
+        return task, task_response
+    
+    class Meta:
+        ordering = ['-completed_at']
+        indexes = [
+            models.Index(fields=['assigned_to', '-completed_at'], name='archived_to_done_idx'),
+            models.Index(fields=['assigned_by', '-completed_at'], name='archived_by_done_idx'),
+            # ResultsService score trends and leaderboards
+            models.Index(fields=['assigned_to', 'task_type', 'completed_at'], name='archived_to_type_done_idx'),
+            models.Index(fields=['assigned_by', 'task_type', 'assigned_to'], name='archived_by_type_idx'),
+        ]
+
+
+class Job(models.Model):
+    """
+    A piece of work queued to run outside the request, by the run_jobs worker
+
+    Written by JobService.enqueue, in the caller's transaction, so a job is
+    only seen once the change that asked for it commits. name picks the
+    function from the jobs.py registry, which is called with kwargs.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    # Not picked up before this - pushed back after each failed attempt
+    run_after = models.DateTimeField(default=timezone.now)
+    # Worker thread holding the job while running
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    # Dates - queue wait and run time are measured from these
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming due jobs, and finding stuck running ones
+            models.Index(fields=['status', 'run_after'], name='job_status_due_idx'),
+            # Metrics over recently finished jobs, and pruning
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} - {self.status}"
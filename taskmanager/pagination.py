@@ -0,0 +1,105 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import List, Optional, Tuple
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+import binascii
+import json
+
+# Rows per page for the task, checklist and note lists
+PAGE_SIZE = 25
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated list, with the cursor for the page after it
+
+    Like a queryset, the page is only fetched when first used; async code
+    awaits afetch() first. A .values() queryset works too, as long as its
+    rows include the order field and 'id'.
+    """
+
+    def __init__(self, queryset, order_field: str, page_size: int):
+        self.queryset = queryset
+        self.order_field = order_field
+        self.page_size = page_size
+
+    @cached_property
+    def _page(self) -> Tuple[List, Optional[str]]:
+        # One extra row says whether there is a next page
+        return self._split(list(self.queryset[:self.page_size + 1]))
+
+    async def afetch(self) -> 'KeysetPage':
+        """Fetch the page with the async ORM, for async views; returns the page"""
+        if '_page' not in self.__dict__:
+            self.__dict__['_page'] = self._split([item async for item in self.queryset[:self.page_size + 1]])
+        return self
+
+    def _split(self, items: List) -> Tuple[List, Optional[str]]:
+        if len(items) <= self.page_size:
+            return items, None
+        items = items[:self.page_size]
+        last = items[-1]
+        if isinstance(last, dict):
+            return items, encode_cursor(last[self.order_field], last['id'])
+        return items, encode_cursor(getattr(last, self.order_field), last.pk)
+
+    @property
+    def items(self) -> List:
+        return self._page[0]
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        return self._page[1]
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def paginate_keyset(queryset, cursor: Optional[str] = None, order_field: str = 'created_at',
+                    page_size: int = PAGE_SIZE, ascending: bool = False) -> KeysetPage:
+    """
+    Newest-first page of a queryset ordered on (-order_field, pk), or
+    oldest-first on (order_field, pk) with ascending=True
+
+    Each page seeks straight to the cursor through the (..., order_field)
+    index and costs the same however many rows come before it. The pk
+    tie-break runs ascending because SQLite keeps the rowid ascending at the
+    end of every index entry, so the index covers the whole ORDER BY.
+
+    Raises:
+        BadRequest: if the cursor was not made by this function for this order_field
+    """
+    queryset = queryset.order_by(order_field if ascending else f'-{order_field}', 'pk')
+    if cursor:
+        value, pk = _decode_cursor(queryset.model, order_field, cursor)
+        bound, beyond = ('gte', 'gt') if ascending else ('lte', 'lt')
+        # The plain bound lets the index seek; the OR breaks ties on the pk
+        queryset = queryset.filter(**{f'{order_field}__{bound}': value}).filter(
+            Q(**{f'{order_field}__{beyond}': value}) | Q(**{order_field: value, 'pk__gt': pk})
+        )
+    return KeysetPage(queryset, order_field, page_size)
+
+
+def encode_cursor(value, pk) -> str:
+    raw = json.dumps([value.isoformat(), pk]).encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(model, order_field: str, cursor: str):
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return model._meta.get_field(order_field).to_python(value), int(pk)
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        raise BadRequest('Invalid page cursor')
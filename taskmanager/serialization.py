@@ -0,0 +1,38 @@
+"""
+JSON encoding for the read API
+
+orjson is used when installed: it serializes dicts, lists, dates and
+datetimes natively and is several times faster than the json module with
+DjangoJSONEncoder. Without it the standard library produces the same
+output, just slower.
+"""
+from datetime import date, datetime
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+
+def _default(value):
+    # Only reached by the json fallback - orjson handles these itself
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data) -> bytes:
+    """Serialize data to compact JSON bytes; datetimes become ISO 8601 strings"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse serialized with dumps()"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
+from users.backends import invalidate_profiles
+from users.models import UserProfile
+from ..models import Task, Appointment, DailyChecklistSubmission
+from .appointment_service import AppointmentService
+from .deletion_service import DeletionService
+from .task_service import TaskService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AccountService:
+    """Service class for removing accounts with everything that hangs off them"""
+
+    @staticmethod
+    def delete_account(user_id: int) -> bool:
+        """
+        Delete a user, their profile and its tasks, checklists and appointments
+
+        Runs as the delete_account job. A user already gone is skipped, so it's
+        safe to repeat.
+
+        Returns:
+            bool: True if the user was deleted
+        """
+        user = User.objects.select_related('profile').filter(id=user_id).first()
+        if user is None:
+            return False
+
+        profile = getattr(user, 'profile', None)
+        if profile is not None:
+            # Delete tasks where user is assigned to or assigned by
+            tasks = Task.objects.filter(assigned_to=profile) | Task.objects.filter(assigned_by=profile)
+
+            owners = TaskService.get_task_owners(tasks)
+            # Appointments go with the profile, read whose lists they were on first
+            appointment_owners = AppointmentService.get_appointment_owners(Appointment.objects.filter(
+                Q(provider=profile) | Q(patient=profile)
+            ))
+
+            # Bulk history goes in short batches, so the final delete only cascades over small tables
+            DeletionService.run(DeletionService.delete_tasks(tasks))
+            DeletionService.run(DeletionService.delete_checklists(
+                DailyChecklistSubmission.objects.filter(patient=profile)
+            ))
+            TaskService.invalidate_task_statistics(*owners)
+
+            # Profiles linked to this one are updated without save signals, so drop their cached users
+            invalidate_profiles(UserProfile.objects.filter(Q(provider=profile) | Q(patient=profile)))
+
+            # If provider, reassign their patients/caregivers
+            if profile.user_type == 'provider':
+                UserProfile.objects.filter(provider=profile).update(provider=None)
+
+            # Delete the profile
+            profile.delete()
+            AppointmentService.invalidate_appointments(*appointment_owners)
+
+        user.delete()
+        logger.info(f'Deleted account {user.username}')
+        return True
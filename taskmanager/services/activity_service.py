@@ -0,0 +1,323 @@
+from typing import Dict, Iterator, List, Tuple
+from collections import defaultdict
+from datetime import date, timedelta
+from django.db import transaction, IntegrityError
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import Task, ArchivedTask, DailyChecklistSubmission, PatientDailyActivity
+import logging
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('tasks_assigned', 'tasks_completed', 'checklists_submitted')
+
+# Rows per delta statement, keeps the CASE and IN lists under SQLite's variable limit
+DELTA_CHUNK_SIZE = 100
+
+
+class ActivityService:
+    """Service class for the per-patient daily activity rollup"""
+
+    @staticmethod
+    def record_task_assigned(task: Task):
+        """Count a newly created task"""
+        ActivityService._apply_delta(
+            task.assigned_to_id, task.assigned_by_id, task.task_type,
+            timezone.localdate(task.created_at), tasks_assigned=1
+        )
+
+    @staticmethod
+    def record_tasks_assigned(tasks: List[Task]) -> None:
+        """Count a batch of newly created tasks with a few set-based queries"""
+        deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        for task in tasks:
+            key = (task.assigned_to_id, task.assigned_by_id, task.task_type, timezone.localdate(task.created_at))
+            deltas[key]['tasks_assigned'] += 1
+        ActivityService._add_deltas(deltas)
+
+    @staticmethod
+    def record_task_completed(task: Task):
+        """Count a task completion"""
+        ActivityService._apply_delta(
+            task.assigned_to_id, task.assigned_by_id, task.task_type,
+            timezone.localdate(task.completed_at), tasks_completed=1
+        )
+
+    @staticmethod
+    def record_checklist_submitted(submission: DailyChecklistSubmission):
+        """Count a daily checklist submission"""
+        ActivityService._apply_delta(
+            submission.patient_id, submission.provider_id, '',
+            submission.submission_date, checklists_submitted=1
+        )
+
+    @staticmethod
+    def remove_tasks(tasks) -> None:
+        """Take a set of tasks out of the rollup - call before deleting them"""
+        deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        ActivityService._add_task_counts(deltas, tasks)
+        ActivityService._subtract_deltas(deltas)
+
+    @staticmethod
+    def remove_completions(tasks) -> None:
+        """Take completions out of the rollup - call before resetting tasks to assigned"""
+        deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        ActivityService._add_completed_counts(deltas, tasks)
+        ActivityService._subtract_deltas(deltas)
+
+    @staticmethod
+    def remove_checklists(submissions) -> None:
+        """Take checklist submissions out of the rollup - call before deleting them"""
+        deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        ActivityService._add_checklist_counts(deltas, submissions)
+        ActivityService._subtract_deltas(deltas)
+
+    @staticmethod
+    def get_daily_trend(patient_profile=None, provider_profile=None, days: int = 30) -> List[Dict]:
+        """
+        Daily totals for a patient or provider (or everyone) over the last N days
+
+        Returns:
+            list of dicts with activity_date and the counters, oldest first
+        """
+        rows = PatientDailyActivity.objects.filter(
+            activity_date__gt=timezone.localdate() - timedelta(days=days)
+        )
+        if patient_profile is not None:
+            rows = rows.filter(patient=patient_profile)
+        if provider_profile is not None:
+            rows = rows.filter(provider=provider_profile)
+
+        return list(
+            rows.values('activity_date')
+            .annotate(**{counter: Sum(counter) for counter in COUNTERS})
+            .order_by('activity_date')
+        )
+
+    @staticmethod
+    def get_task_type_totals(patient_profile=None, provider_profile=None, days: int = 30) -> List[Dict]:
+        """Totals per task type over the last N days, checklists excluded"""
+        rows = PatientDailyActivity.objects.filter(
+            activity_date__gt=timezone.localdate() - timedelta(days=days)
+        ).exclude(task_type='')
+        if patient_profile is not None:
+            rows = rows.filter(patient=patient_profile)
+        if provider_profile is not None:
+            rows = rows.filter(provider=provider_profile)
+
+        return list(
+            rows.values('task_type')
+            .annotate(tasks_assigned=Sum('tasks_assigned'), tasks_completed=Sum('tasks_completed'))
+            .order_by('task_type')
+        )
+
+    @staticmethod
+    def rebuild(chunk_size: int = 1000) -> Iterator[Tuple[str, int]]:
+        """
+        Rebuild the rollup from history in primary key chunks
+
+        Each chunk is aggregated in SQL and merged in its own short transaction.
+        Yields (source, rows processed) after each chunk for progress reporting.
+        """
+        PatientDailyActivity.objects.all().delete()
+
+        for source, queryset, add_counts in (
+            ('tasks', Task.objects.all(), ActivityService._add_task_counts),
+            ('archived tasks', ArchivedTask.objects.all(), ActivityService._add_archived_counts),
+            ('checklists', DailyChecklistSubmission.objects.all(), ActivityService._add_checklist_counts),
+        ):
+            processed = 0
+            last_pk = 0
+            while True:
+                pks = list(
+                    queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+                )
+                if not pks:
+                    break
+
+                chunk = queryset.filter(pk__gte=pks[0], pk__lte=pks[-1])
+                deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+                add_counts(deltas, chunk)
+                with transaction.atomic():
+                    ActivityService._merge_deltas(deltas)
+
+                last_pk = pks[-1]
+                processed += len(pks)
+                yield source, processed
+
+        logger.info('Rebuilt patient daily activity rollup')
+
+    @staticmethod
+    def _add_task_counts(deltas: Dict, tasks) -> None:
+        """Add assigned and completed counts for a task queryset, grouped in SQL"""
+        assigned = (
+            tasks.annotate(day=TruncDate('created_at'))
+            .values('assigned_to_id', 'assigned_by_id', 'task_type', 'day')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        for row in assigned:
+            key = (row['assigned_to_id'], row['assigned_by_id'], row['task_type'], row['day'])
+            deltas[key]['tasks_assigned'] += row['count']
+        ActivityService._add_completed_counts(deltas, tasks)
+
+    @staticmethod
+    def _add_completed_counts(deltas: Dict, tasks) -> None:
+        completed = (
+            tasks.filter(status='completed', completed_at__isnull=False)
+            .annotate(day=TruncDate('completed_at'))
+            .values('assigned_to_id', 'assigned_by_id', 'task_type', 'day')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        for row in completed:
+            key = (row['assigned_to_id'], row['assigned_by_id'], row['task_type'], row['day'])
+            deltas[key]['tasks_completed'] += row['count']
+
+    @staticmethod
+    def _add_archived_counts(deltas: Dict, archived) -> None:
+        """Archived tasks are all completed, so count both sides"""
+        for field, counter in (('created_at', 'tasks_assigned'), ('completed_at', 'tasks_completed')):
+            rows = (
+                archived.filter(**{f'{field}__isnull': False})
+                .annotate(day=TruncDate(field))
+                .values('assigned_to_id', 'assigned_by_id', 'task_type', 'day')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            for row in rows:
+                key = (row['assigned_to_id'], row['assigned_by_id'], row['task_type'], row['day'])
+                deltas[key][counter] += row['count']
+
+    @staticmethod
+    def _add_checklist_counts(deltas: Dict, submissions) -> None:
+        # Keyed on the provider stored at submission, so a patient changing provider since doesn't move the count
+        rows = (
+            submissions.values('patient_id', 'provider_id', 'submission_date')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        for row in rows:
+            key = (row['patient_id'], row['provider_id'], '', row['submission_date'])
+            deltas[key]['checklists_submitted'] += row['count']
+
+    @staticmethod
+    def _apply_delta(patient_id, provider_id, task_type: str, activity_date: date, **counters) -> None:
+        """Add to one rollup row, creating it if needed"""
+        lookup = {
+            'patient_id': patient_id,
+            'provider_id': provider_id,
+            'task_type': task_type,
+            'activity_date': activity_date,
+        }
+        updates = {name: F(name) + value for name, value in counters.items()}
+        if PatientDailyActivity.objects.filter(**lookup).update(**updates):
+            return
+        try:
+            # Savepoint so a lost race doesn't break the caller's transaction
+            with transaction.atomic():
+                PatientDailyActivity.objects.create(**lookup, **counters)
+        except IntegrityError:
+            PatientDailyActivity.objects.filter(**lookup).update(**updates)
+
+    @staticmethod
+    def _add_deltas(deltas: Dict) -> None:
+        """Add grouped counts - new rows are inserted with their counts, existing rows updated in place"""
+        keys = list(deltas)
+        to_shift = {}
+        for start in range(0, len(keys), DELTA_CHUNK_SIZE):
+            chunk = keys[start:start + DELTA_CHUNK_SIZE]
+            existing = ActivityService._get_row_ids(chunk)
+            missing = [key for key in chunk if key not in existing]
+            to_shift.update((key, deltas[key]) for key in chunk if key in existing)
+            if not missing:
+                continue
+            try:
+                # Savepoint so a lost race doesn't break the caller's transaction
+                with transaction.atomic():
+                    PatientDailyActivity.objects.bulk_create(
+                        [ActivityService._new_row(key, **deltas[key]) for key in missing]
+                    )
+            except IntegrityError:
+                PatientDailyActivity.objects.bulk_create(
+                    [ActivityService._new_row(key) for key in missing], ignore_conflicts=True
+                )
+                to_shift.update((key, deltas[key]) for key in missing)
+        ActivityService._shift_deltas(to_shift, 1)
+
+    @staticmethod
+    def _subtract_deltas(deltas: Dict) -> None:
+        """Subtract grouped counts from existing rows"""
+        ActivityService._shift_deltas(deltas, -1)
+
+    @staticmethod
+    def _shift_deltas(deltas: Dict, sign: int) -> None:
+        """Apply grouped counts with one relative CASE update per chunk of rows"""
+        keys = [key for key, counts in deltas.items() if any(counts.values())]
+        for start in range(0, len(keys), DELTA_CHUNK_SIZE):
+            chunk = keys[start:start + DELTA_CHUNK_SIZE]
+            row_ids = ActivityService._get_row_ids(chunk)
+            matched = [(row_ids[key], deltas[key]) for key in chunk if key in row_ids]
+            if not matched:
+                continue
+
+            updates = {}
+            for counter in COUNTERS:
+                whens = [When(pk=pk, then=Value(sign * counts[counter])) for pk, counts in matched if counts[counter]]
+                if whens:
+                    # relative to the stored value, so concurrent writers are not lost
+                    updates[counter] = F(counter) + Case(*whens, default=Value(0))
+            PatientDailyActivity.objects.filter(pk__in=[pk for pk, _ in matched]).update(**updates)
+
+    @staticmethod
+    def _new_row(key: Tuple, **counters) -> PatientDailyActivity:
+        patient_id, provider_id, task_type, activity_date = key
+        return PatientDailyActivity(
+            patient_id=patient_id,
+            provider_id=provider_id,
+            task_type=task_type,
+            activity_date=activity_date,
+            **counters
+        )
+
+    @staticmethod
+    def _get_row_ids(keys: List[Tuple]) -> Dict[Tuple, int]:
+        """Map rollup keys to the primary keys of their existing rows"""
+        return {
+            (patient_id, provider_id, task_type, activity_date): pk
+            for pk, patient_id, provider_id, task_type, activity_date in PatientDailyActivity.objects.filter(
+                patient_id__in={key[0] for key in keys},
+                activity_date__in={key[3] for key in keys},
+            ).values_list('pk', 'patient_id', 'provider_id', 'task_type', 'activity_date')
+        }
+
+    @staticmethod
+    def _merge_deltas(deltas: Dict) -> None:
+        """Add many row deltas with one read, one bulk update and one bulk create (rebuild only)"""
+        if not deltas:
+            return
+
+        patient_ids = {key[0] for key in deltas}
+        days = {key[3] for key in deltas}
+        existing = {
+            (row.patient_id, row.provider_id, row.task_type, row.activity_date): row
+            for row in PatientDailyActivity.objects.filter(patient_id__in=patient_ids, activity_date__in=days)
+        }
+
+        to_update = []
+        to_create = []
+        for key, counts in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                row = ActivityService._new_row(key)
+                to_create.append(row)
+            else:
+                to_update.append(row)
+            for counter in COUNTERS:
+                setattr(row, counter, getattr(row, counter) + counts[counter])
+
+        if to_update:
+            PatientDailyActivity.objects.bulk_update(to_update, COUNTERS)
+        if to_create:
+            PatientDailyActivity.objects.bulk_create(to_create)
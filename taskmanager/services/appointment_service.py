@@ -1,12 +1,17 @@
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional, Set, Tuple
 from django.utils import timezone
 from datetime import datetime
 from ..models import Appointment
+from .. import caching
+from ..caching import patient_namespace, provider_namespace
 from users.models import UserProfile
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Appointment list cache settings
+APPOINTMENTS_CACHE_TIMEOUT = 300  # seconds
+
 
 class AppointmentService:
     """Service class for appointment-related operations"""
@@ -28,6 +33,7 @@ class AppointmentService:
                 notes=notes
             )
             
+            AppointmentService.invalidate_appointments([appointment.provider_id], [appointment.patient_id])
             logger.info(f'Created appointment {appointment.id} for patient {patient_profile.user.username}')
             return appointment
             
@@ -40,6 +46,7 @@ class AppointmentService:
         """Delete an appointment"""
         try:
             appointment.delete()
+            AppointmentService.invalidate_appointments([appointment.provider_id], [appointment.patient_id])
             logger.info(f'Deleted appointment {appointment.id}')
             return True
         except Exception as e:
@@ -48,13 +55,37 @@ class AppointmentService:
     
     @staticmethod
     def get_patient_appointments(patient_profile) -> list:
-        """Get all appointments for a patient"""
-        return Appointment.objects.filter(patient=patient_profile).order_by('datetime')
+        """Get all appointments for a patient (profile or id), cached in the patient's namespace"""
+        patient_id = getattr(patient_profile, 'pk', patient_profile)
+        return caching.get_or_build(
+            'appointments', [patient_namespace(patient_id)],
+            lambda: list(Appointment.objects.filter(patient_id=patient_id).select_related('provider__user').order_by('datetime')),
+            APPOINTMENTS_CACHE_TIMEOUT,
+        )
     
     @staticmethod
     def get_provider_appointments(provider_profile) -> list:
-        """Get all appointments for a provider"""
-        return Appointment.objects.filter(provider=provider_profile).order_by('datetime')
+        """Get all appointments for a provider (profile or id), cached in the provider's namespace"""
+        provider_id = getattr(provider_profile, 'pk', provider_profile)
+        return caching.get_or_build(
+            'appointments', [provider_namespace(provider_id)],
+            lambda: list(Appointment.objects.filter(provider_id=provider_id).select_related('patient__user').order_by('datetime')),
+            APPOINTMENTS_CACHE_TIMEOUT,
+        )
+    
+    @staticmethod
+    def invalidate_appointments(provider_ids: Iterable[int] = (), patient_ids: Iterable[int] = ()):
+        """Invalidate the providers' and patients' cached appointments once the current transaction commits"""
+        caching.bump(
+            *(provider_namespace(provider_id) for provider_id in provider_ids),
+            *(patient_namespace(patient_id) for patient_id in patient_ids),
+        )
+    
+    @staticmethod
+    def get_appointment_owners(appointments) -> Tuple[Set[int], Set[int]]:
+        """The provider and patient ids of a queryset of appointments, read before deleting them"""
+        owners = list(appointments.order_by().values_list('provider_id', 'patient_id').distinct())
+        return {provider_id for provider_id, _ in owners}, {patient_id for _, patient_id in owners}
     
     @staticmethod
     def validate_appointment_access(appointment: Appointment, user_profile) -> bool:
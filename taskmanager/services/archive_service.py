@@ -0,0 +1,123 @@
+from typing import Iterator, Optional, Tuple
+from datetime import datetime
+from ..models import Task, TaskNotification, TaskResponse, ArchivedTask, RESPONSE_METRICS_VERSION, response_metrics
+from .deletion_service import DeletionService, DELETE_BATCH_SIZE, DELETE_BATCH_PAUSE
+from .results_service import METRIC_FIELDS
+from .notification_service import NotificationService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveService:
+    """Service class for moving completed tasks to the archive and reading them back"""
+
+    @staticmethod
+    def archive_tasks(tasks, batch_size: int = DELETE_BATCH_SIZE,
+                      pause: float = DELETE_BATCH_PAUSE) -> Iterator[Tuple[int, int, int]]:
+        """
+        Move completed tasks and their responses into ArchivedTask in short batches
+
+        Pending tasks in the queryset are skipped. The activity rollup is left
+        alone - archived tasks still count towards history.
+        """
+        return DeletionService.run_batches(tasks.completed(), ArchiveService._archive_batch, batch_size, pause)
+
+    @staticmethod
+    def get_completed_before(cutoff: datetime, provider_profile=None, patient_profile=None):
+        """Completed tasks finished before the cutoff, optionally for a provider or patient"""
+        tasks = Task.objects.completed().filter(completed_at__lt=cutoff)
+        if provider_profile is not None:
+            tasks = tasks.filter(assigned_by=provider_profile)
+        if patient_profile is not None:
+            tasks = tasks.filter(assigned_to=patient_profile)
+        return tasks
+
+    @staticmethod
+    def get_task_result(task_id: int, identity=None) -> Tuple[Optional[Task], Optional[TaskResponse]]:
+        """
+        Look a task up in the hot tables, then in the archive
+
+        With an identity, only tasks visible to it are found.
+
+        Returns:
+            tuple of (task, task_response); (None, None) if the task doesn't exist,
+            task_response is None if the task has no response
+        """
+        tasks = Task.objects.all()
+        archived_tasks = ArchivedTask.objects.all()
+        if identity is not None:
+            tasks = tasks.visible_to(identity)
+            archived_tasks = archived_tasks.visible_to(identity)
+
+        task = tasks.filter(id=task_id).first()
+        if task is not None:
+            return task, TaskResponse.objects.filter(task=task).first()
+
+        archived = archived_tasks.filter(task_id=task_id).first()
+        if archived is None:
+            return None, None
+        return archived.as_task()
+
+    @staticmethod
+    def get_archived_tasks(provider_profile=None, patient_profile=None):
+        """Archived tasks for a provider or patient, most recently completed first"""
+        archived = ArchivedTask.objects.all()
+        if provider_profile is not None:
+            archived = archived.filter(assigned_by=provider_profile)
+        if patient_profile is not None:
+            archived = archived.filter(assigned_to=patient_profile)
+        return archived.order_by('-completed_at')
+
+    @staticmethod
+    def _archive_batch(tasks) -> int:
+        batch = list(tasks.select_related('response'))
+        ArchivedTask.objects.bulk_create([ArchiveService._to_archive(task) for task in batch])
+
+        pks = [task.pk for task in batch]
+        TaskResponse.objects.filter(task_id__in=pks).delete()
+        NotificationService.delete_notifications(TaskNotification.objects.filter(task_id__in=pks))
+        Task.objects.filter(pk__in=pks).delete()
+        return len(batch)
+
+    @staticmethod
+    def _get_metrics(response: Optional[TaskResponse]) -> dict:
+        """The response's metric columns, extracted now if they never were"""
+        if response is None:
+            return dict.fromkeys(METRIC_FIELDS)
+        if response.metrics_version < RESPONSE_METRICS_VERSION:
+            return response_metrics(response.responses)
+        return {field: getattr(response, field) for field in METRIC_FIELDS}
+
+    @staticmethod
+    def _to_archive(task: Task) -> ArchivedTask:
+        try:
+            response = task.response
+        except TaskResponse.DoesNotExist:
+            response = None
+
+        payload = {
+            'description': task.description,
+            'task_config': task.task_config,
+            'assigned_at': task.assigned_at.isoformat() if task.assigned_at else None,
+            'response': None if response is None else {
+                'responses': response.responses,
+                'started_at': response.started_at.isoformat() if response.started_at else None,
+                'completed_at': response.completed_at.isoformat() if response.completed_at else None,
+                'notes': response.notes,
+            },
+        }
+        return ArchivedTask(
+            task_id=task.pk,
+            title=task.title,
+            task_type=task.task_type,
+            difficulty=task.difficulty,
+            assigned_by_id=task.assigned_by_id,
+            assigned_to_id=task.assigned_to_id,
+            completed_by_id=task.completed_by_id,
+            created_at=task.created_at,
+            due_date=task.due_date,
+            completed_at=task.completed_at,
+            **ArchiveService._get_metrics(response),
+            payload=ArchivedTask.pack_payload(payload),
+        )
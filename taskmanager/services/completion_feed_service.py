@@ -0,0 +1,121 @@
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import CompletionEvent
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields of an event as listeners receive it
+EVENT_FIELDS = ('id', 'event_type', 'patient_id', 'provider_id', 'object_id', 'message', 'created_at')
+
+
+def _display_name(profile) -> str:
+    return profile.user.get_full_name() or profile.user.username
+
+
+class CompletionFeedService:
+    """Service class for the completion events behind the live feed (see feed.py)"""
+
+    @staticmethod
+    def record_task_completed(task, completed_by) -> None:
+        """Add a task completion to the feed once the surrounding transaction commits"""
+        CompletionFeedService._record_on_commit(CompletionEvent(
+            patient_id=task.assigned_to_id,
+            provider_id=task.assigned_by_id,
+            event_type='task',
+            object_id=task.pk,
+            message=f"{_display_name(completed_by)} completed {task.title}",
+        ))
+
+    @staticmethod
+    def record_checklist_submitted(submission, provider_id: Optional[int]) -> None:
+        """Add a daily checklist submission to the feed once the surrounding transaction commits"""
+        CompletionFeedService._record_on_commit(CompletionEvent(
+            patient_id=submission.patient_id,
+            provider_id=provider_id,
+            event_type='checklist',
+            object_id=submission.pk,
+            message=f"{_display_name(submission.submitted_by)} submitted the daily checklist",
+        ))
+
+    @staticmethod
+    async def aget_events(identity, after_id: int, limit: int, created_before: Optional[datetime] = None) -> List[Dict]:
+        """
+        Up to limit events the identity can see after after_id, oldest first
+
+        With created_before, only events written before then - old enough
+        that no lower id can still commit, so the last one is a safe cursor.
+        """
+        events = CompletionEvent.objects.visible_to(identity).after(after_id)
+        if created_before is not None:
+            events = events.filter(created_at__lt=created_before)
+        return [event async for event in events.values(*EVENT_FIELDS)[:limit]]
+
+    @staticmethod
+    async def aget_new_events(after_id: int, limit: int, gap_ids: Iterable[int] = ()) -> List[Dict]:
+        """Up to limit events of anyone after after_id or among the skipped gap_ids, oldest first - for the fan-out"""
+        gap_ids = list(gap_ids)
+        events = CompletionEvent.objects.after(after_id)
+        if gap_ids:
+            # The plain bound keeps this a range over the primary key; the OR alone scans
+            events = CompletionEvent.objects.filter(id__gte=min(gap_ids)).filter(
+                Q(id__gt=after_id) | Q(id__in=gap_ids)
+            ).order_by('id')
+        return [event async for event in events.values(*EVENT_FIELDS)[:limit]]
+
+    @staticmethod
+    async def alatest_event_id(created_before: Optional[datetime] = None) -> int:
+        """Id of the newest event, or of the newest written before created_before"""
+        events = CompletionEvent.objects.order_by('-id')
+        if created_before is not None:
+            events = CompletionEvent.objects.filter(created_at__lt=created_before).order_by('-created_at', '-id')
+        return await events.values_list('id', flat=True).afirst() or 0
+
+    @staticmethod
+    def listener_key(identity) -> Tuple[str, Optional[int]]:
+        """The fan-out key of the events an identity follows - see is_visible"""
+        if identity.role == 'provider':
+            return ('provider', identity.profile_id)
+        return ('patient', identity.patient_id)
+
+    @staticmethod
+    def is_visible(event: Dict, identity) -> bool:
+        """CompletionEventQuerySet.visible_to for an event row already in memory"""
+        if identity.role == 'provider':
+            return event['provider_id'] == identity.profile_id
+        if identity.role == 'caregiver' and identity.patient_id:
+            return event['patient_id'] == identity.patient_id and (
+                event['event_type'] == 'checklist' or event['provider_id'] == identity.provider_id
+            )
+        return False
+
+    @staticmethod
+    def prune(older_than: timedelta) -> int:
+        """
+        Delete events older than the given age
+
+        Returns:
+            int: number of events deleted
+        """
+        deleted, _ = CompletionEvent.objects.filter(created_at__lt=timezone.now() - older_than).delete()
+        logger.info(f'Pruned {deleted} completion events')
+        return deleted
+
+    @staticmethod
+    def _record_on_commit(event: CompletionEvent) -> None:
+        # feed imports this module
+        from .. import feed
+
+        def record():
+            event.save()
+            feed.wake_listeners()
+
+        # Inserted after the completion commits, in a statement of its own, so
+        # an id is visible moments after it is handed out rather than behind a
+        # long transaction - the fan-out only re-reads skipped ids for a few
+        # seconds. robust: a feed failure must not fail the completion.
+        transaction.on_commit(record, robust=True)
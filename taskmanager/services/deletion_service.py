@@ -0,0 +1,119 @@
+from typing import Callable, Iterator, Tuple
+from django.db import OperationalError, transaction
+from ..models import Task, TaskNotification, TaskResponse, DailyChecklistSubmission
+from .activity_service import ActivityService
+from .notification_service import NotificationService
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rows per transaction - small enough that a batch holds the SQLite write lock for milliseconds
+DELETE_BATCH_SIZE = 100
+# Seconds to sleep between batches so waiting writers can take the lock
+DELETE_BATCH_PAUSE = 0.01
+# Attempts per batch when another writer holds the lock
+DELETE_LOCK_RETRIES = 5
+
+
+class DeletionService:
+    """
+    Service class for chunked bulk deletes and resets
+
+    Each operation walks its queryset in primary key batches, commits each batch
+    in its own short transaction and pauses before the next, so patient
+    submissions are not blocked behind one long write. Operations are
+    generators yielding (rows walked, total rows, rows changed) after each batch.
+    """
+
+    @staticmethod
+    def delete_tasks(tasks, batch_size: int = DELETE_BATCH_SIZE,
+                     pause: float = DELETE_BATCH_PAUSE) -> Iterator[Tuple[int, int, int]]:
+        """Delete tasks with their responses and notifications"""
+        return DeletionService.run_batches(tasks, DeletionService._delete_task_batch, batch_size, pause)
+
+    @staticmethod
+    def reset_responses(tasks, batch_size: int = DELETE_BATCH_SIZE,
+                        pause: float = DELETE_BATCH_PAUSE) -> Iterator[Tuple[int, int, int]]:
+        """Delete task responses and put the tasks back to assigned"""
+        return DeletionService.run_batches(tasks, DeletionService._reset_response_batch, batch_size, pause)
+
+    @staticmethod
+    def delete_checklists(submissions, batch_size: int = DELETE_BATCH_SIZE,
+                          pause: float = DELETE_BATCH_PAUSE) -> Iterator[Tuple[int, int, int]]:
+        """Delete daily checklist submissions"""
+        return DeletionService.run_batches(submissions, DeletionService._delete_checklist_batch, batch_size, pause)
+
+    @staticmethod
+    def run(progress: Iterator[Tuple[int, int, int]]) -> int:
+        """Run an operation to the end and return the number of rows changed"""
+        changed = 0
+        for walked, total, changed in progress:
+            logger.debug(f'Processed {walked}/{total} rows')
+        return changed
+
+    @staticmethod
+    def run_batches(queryset, process_batch: Callable, batch_size: int = DELETE_BATCH_SIZE,
+                    pause: float = DELETE_BATCH_PAUSE) -> Iterator[Tuple[int, int, int]]:
+        """Walk a queryset in pk batches, calling process_batch(batch) in a transaction per batch"""
+        total = queryset.count()
+        walked = 0
+        changed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+
+            # Re-apply the filter so rows changed since the pk read are left alone
+            changed += DeletionService._commit_batch(process_batch, queryset.filter(pk__in=pks), pause)
+
+            last_pk = pks[-1]
+            walked += len(pks)
+            yield walked, total, changed
+            if pause:
+                time.sleep(pause)
+
+        logger.info(f'Processed {walked} {queryset.model._meta.verbose_name_plural} in batches of {batch_size}')
+
+    @staticmethod
+    def _commit_batch(process_batch: Callable, batch, pause: float) -> int:
+        """Run one batch in its own transaction, retrying if it loses the write lock"""
+        # Inside a caller's transaction the lock is already held and a retry can't help
+        attempts = 1 if transaction.get_connection().in_atomic_block else DELETE_LOCK_RETRIES
+        for attempt in range(1, attempts + 1):
+            try:
+                with transaction.atomic():
+                    return process_batch(batch)
+            except OperationalError as e:
+                # SQLite fails a read-to-write upgrade at once instead of waiting for the lock
+                if 'locked' not in str(e) or attempt == attempts:
+                    raise
+                logger.warning(f'Batch hit a locked database, retrying ({attempt}/{attempts})')
+                time.sleep(max(pause, 0.01) * 2 ** attempt)
+
+    @staticmethod
+    def _delete_task_batch(tasks) -> int:
+        ActivityService.remove_tasks(tasks)
+        TaskResponse.objects.filter(task__in=tasks).delete()
+        NotificationService.delete_notifications(TaskNotification.objects.filter(task__in=tasks))
+        _, deleted = tasks.delete()
+        return deleted.get(Task._meta.label, 0)
+
+    @staticmethod
+    def _reset_response_batch(tasks) -> int:
+        count, _ = TaskResponse.objects.filter(task__in=tasks).delete()
+        ActivityService.remove_completions(tasks)
+        tasks.filter(status__in=['completed', 'in_progress']).update(
+            status='assigned',
+            completed_at=None
+        )
+        return count
+
+    @staticmethod
+    def _delete_checklist_batch(submissions) -> int:
+        ActivityService.remove_checklists(submissions)
+        _, deleted = submissions.delete()
+        return deleted.get(DailyChecklistSubmission._meta.label, 0)
@@ -0,0 +1,224 @@
+from datetime import timedelta
+from statistics import median, quantiles
+from typing import Dict, List
+from django.db import close_old_connections
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from ..models import Job
+import logging
+import random
+import time
+import traceback
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Retry settings
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_BASE = 10  # seconds before the first retry, doubled for each one after
+JOB_BACKOFF_MAX = 3600  # seconds
+# Seconds a job may run before its worker is presumed dead and the job is queued again
+JOB_STALE_AFTER = 600
+# Longest traceback kept on a failed attempt
+JOB_ERROR_LENGTH = 5000
+
+FINISHED_STATUSES = ('succeeded', 'failed')
+
+
+class JobService:
+    """
+    Service class for the background job queue
+
+    Jobs are rows in the Job table, so enqueueing joins the caller's
+    transaction and needs no broker. The run_jobs worker claims due jobs,
+    calls the function registered under the job's name in jobs.py and records
+    the outcome. Failed attempts are retried with exponential backoff up to
+    the job's max_attempts.
+    """
+
+    @staticmethod
+    def enqueue(name: str, delay: float = 0, **kwargs) -> Job:
+        """
+        Queue a call of the job function registered as name with kwargs
+
+        kwargs are stored as JSON, so pass ids rather than model instances.
+        Inside a transaction the job is only seen by workers once it commits.
+        """
+        # jobs imports the services that enqueue
+        from .. import jobs
+
+        function = jobs.JOBS.get(name)
+        if function is None:
+            raise ValueError(f'Unknown job {name}')
+        job = Job.objects.create(
+            name=name,
+            kwargs=kwargs,
+            max_attempts=function.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+        logger.info(f'Queued job {job.id} {name}')
+        return job
+
+    @staticmethod
+    def claim(worker_id: str, limit: int) -> List[Job]:
+        """
+        Mark up to limit due jobs as running for a worker
+
+        The update only takes jobs still queued, so when two workers read the
+        same ids each job goes to one of them.
+        """
+        now = timezone.now()
+        ids = list(
+            Job.objects.filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+        Job.objects.filter(id__in=ids, status='queued').update(
+            status='running', locked_by=token, started_at=now, attempts=F('attempts') + 1,
+        )
+        return list(Job.objects.filter(status='running', locked_by=token).order_by('run_after', 'id'))
+
+    @staticmethod
+    def run(job: Job) -> bool:
+        """
+        Run a claimed job and record whether it succeeded, from any thread
+
+        Returns:
+            bool: True if the job succeeded
+        """
+        from .. import jobs
+
+        # Connections belong to the thread; drop any that went stale between jobs
+        close_old_connections()
+        started = time.perf_counter()
+        try:
+            function = jobs.JOBS.get(job.name)
+            if function is None:
+                raise LookupError(f'Unknown job {job.name}')
+            function(**job.kwargs)
+        except Exception as e:
+            JobService._record_failure(job, e)
+            return False
+
+        # Only if this worker still holds it - a job taken back by requeue_stale belongs to another run now
+        Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+            status='succeeded', finished_at=timezone.now(), last_error='',
+        )
+        waited = (job.started_at - job.run_after).total_seconds()
+        logger.info(
+            f'Job {job.id} {job.name} succeeded in {time.perf_counter() - started:.2f}s '
+            f'after {waited:.2f}s in the queue (attempt {job.attempts})'
+        )
+        return True
+
+    @staticmethod
+    def retry(jobs) -> int:
+        """Queue failed jobs again, with a fresh set of attempts"""
+        return jobs.filter(status='failed').update(
+            status='queued', attempts=0, run_after=timezone.now(), locked_by='', finished_at=None,
+        )
+
+    @staticmethod
+    def requeue_stale(older_than: timedelta = timedelta(seconds=JOB_STALE_AFTER)) -> int:
+        """
+        Queue jobs again whose worker stopped without finishing them
+
+        Returns:
+            int: number of jobs queued again or, out of attempts, failed
+        """
+        now = timezone.now()
+        stale = Job.objects.filter(status='running', started_at__lt=now - older_than)
+        requeued = stale.filter(attempts__lt=F('max_attempts')).update(status='queued', locked_by='', run_after=now)
+        failed = stale.update(status='failed', finished_at=now, last_error='Worker stopped before the job finished')
+        if requeued or failed:
+            logger.warning(f'Requeued {requeued} and failed {failed} jobs left running by a lost worker')
+        return requeued + failed
+
+    @staticmethod
+    def prune(older_than: timedelta) -> int:
+        """
+        Delete finished jobs older than the given age
+
+        Returns:
+            int: number of jobs deleted
+        """
+        cutoff = timezone.now() - older_than
+        deleted, _ = Job.objects.filter(status__in=FINISHED_STATUSES, finished_at__lt=cutoff).delete()
+        if deleted:
+            logger.info(f'Pruned {deleted} finished jobs')
+        return deleted
+
+    @staticmethod
+    def get_queue_depth() -> Dict:
+        """Jobs waiting and running now, and how long the oldest due job has waited"""
+        now = timezone.now()
+        depth = Job.objects.filter(status__in=['queued', 'running']).aggregate(
+            queued=Count('id', filter=Q(status='queued')),
+            due=Count('id', filter=Q(status='queued', run_after__lte=now)),
+            running=Count('id', filter=Q(status='running')),
+            oldest_due=Min('run_after', filter=Q(status='queued', run_after__lte=now)),
+        )
+        oldest_due = depth.pop('oldest_due')
+        depth['oldest_wait'] = (now - oldest_due).total_seconds() if oldest_due else 0.0
+        return depth
+
+    @staticmethod
+    def get_metrics(since) -> Dict[str, Dict]:
+        """
+        Outcomes and latency of the jobs finished since a time, by job name
+
+        wait is from when a job was due to when its last attempt started, run
+        is that attempt's duration and total is from enqueue to finish, all in
+        seconds, as (median, 95th percentile).
+        """
+        rows = Job.objects.filter(status__in=FINISHED_STATUSES, finished_at__gte=since).values_list(
+            'name', 'status', 'attempts', 'created_at', 'run_after', 'started_at', 'finished_at'
+        )
+
+        samples = {}
+        for name, status, attempts, created_at, run_after, started_at, finished_at in rows:
+            metrics = samples.setdefault(name, {
+                'succeeded': 0, 'failed': 0, 'retried': 0, 'wait': [], 'run': [], 'total': [],
+            })
+            metrics[status] += 1
+            metrics['retried'] += attempts > 1
+            metrics['wait'].append(max((started_at - run_after).total_seconds(), 0))
+            metrics['run'].append((finished_at - started_at).total_seconds())
+            metrics['total'].append((finished_at - created_at).total_seconds())
+
+        for metrics in samples.values():
+            for key in ('wait', 'run', 'total'):
+                metrics[key] = _summarize(metrics[key])
+        return samples
+
+    @staticmethod
+    def backoff(attempts: int) -> float:
+        """Seconds to wait before retrying a job that has failed attempts times, with jitter"""
+        delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+        # Half fixed, half random, so jobs that failed together don't all retry together
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def _record_failure(job: Job, error: Exception) -> None:
+        now = timezone.now()
+        message = ''.join(traceback.format_exception(error))[-JOB_ERROR_LENGTH:]
+        held = Job.objects.filter(id=job.id, locked_by=job.locked_by)
+        if job.attempts < job.max_attempts:
+            delay = JobService.backoff(job.attempts)
+            held.update(status='queued', run_after=now + timedelta(seconds=delay), locked_by='', last_error=message)
+            logger.warning(
+                f'Job {job.id} {job.name} failed (attempt {job.attempts}/{job.max_attempts}), '
+                f'retrying in {delay:.0f}s: {error}'
+            )
+        else:
+            held.update(status='failed', finished_at=now, last_error=message)
+            logger.error(f'Job {job.id} {job.name} failed after {job.attempts} attempts: {error}')
+
+
+def _summarize(values: List[float]):
+    if not values:
+        return None
+    p95 = quantiles(values, n=20)[18] if len(values) > 1 else values[0]
+    return median(values), p95
@@ -0,0 +1,202 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
+from ..models import Task, TaskNotification, UnreadNotificationCount
+from .. import caching
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Unread count cache settings
+UNREAD_CACHE_TIMEOUT = 300  # seconds
+# Tasks notified per transaction
+NOTIFY_BATCH_SIZE = 500
+
+
+class NotificationService:
+    """
+    Service class for the notification inbox and its unread counters
+
+    Every write that creates, reads or deletes notifications goes through
+    here, so UnreadNotificationCount stays in step with the table. Counters
+    are only ever changed relative to their stored value, by the number of
+    rows a statement actually changed, so concurrent writers can't lose or
+    double-count an update.
+    """
+
+    @staticmethod
+    def notify(task, recipient_id: int, message: str, notification_type: str) -> TaskNotification:
+        """Create a notification and count it as unread"""
+        notification = TaskNotification.objects.create(
+            task=task,
+            recipient_id=recipient_id,
+            message=message,
+            notification_type=notification_type,
+        )
+        NotificationService._shift_unread({recipient_id: 1})
+        return notification
+
+    @staticmethod
+    def notify_many(notifications: List[TaskNotification]) -> List[TaskNotification]:
+        """Create a batch of unsaved notifications with one insert and one counter update"""
+        created = TaskNotification.objects.bulk_create(notifications)
+        NotificationService._shift_unread(Counter(notification.recipient_id for notification in notifications))
+        return created
+
+    @staticmethod
+    def notify_assigned(task_ids: Iterable[int]) -> int:
+        """
+        Tell patients about newly assigned tasks, in batches
+
+        Tasks already notified, completed or deleted since are skipped, so
+        running this again for the same tasks changes nothing.
+
+        Returns:
+            int: number of notifications created
+        """
+        task_ids = list(task_ids)
+        created = 0
+        for start in range(0, len(task_ids), NOTIFY_BATCH_SIZE):
+            with transaction.atomic():
+                tasks = Task.objects.filter(id__in=task_ids[start:start + NOTIFY_BATCH_SIZE]).exclude(
+                    status='completed'
+                ).exclude(notifications__notification_type='assigned').only('id', 'title', 'assigned_to_id')
+                created += len(NotificationService.notify_many([
+                    TaskNotification(
+                        task=task,
+                        recipient_id=task.assigned_to_id,
+                        message=f"New task assigned: {task.title}",
+                        notification_type='assigned'
+                    )
+                    for task in tasks
+                ]))
+        return created
+
+    @staticmethod
+    def notify_completed(task) -> None:
+        """
+        Mark the patient's notifications about a completed task read and tell the provider
+
+        Does nothing if the provider was already told, so running it again is safe.
+        The writes share a transaction: the check relies on the notification
+        existing only together with the unread count changes.
+        """
+        with transaction.atomic():
+            if task.notifications.filter(notification_type='completed').exists():
+                return
+            marked = NotificationService.get_inbox(task.assigned_to_id, unread_only=True).filter(task_id=task.pk).update(
+                read_at=timezone.now()
+            )
+            TaskNotification.objects.create(
+                task=task,
+                recipient_id=task.assigned_by_id,
+                message=f"Task completed: {task.title}",
+                notification_type='completed',
+            )
+            NotificationService._shift_unread({task.assigned_to_id: -marked, task.assigned_by_id: 1})
+
+    @staticmethod
+    def get_inbox(recipient_id: int, unread_only: bool = False):
+        """A recipient's notifications - page them with paginate_keyset, newest first"""
+        notifications = TaskNotification.objects.filter(recipient_id=recipient_id)
+        if unread_only:
+            notifications = notifications.filter(read_at__isnull=True)
+        return notifications
+
+    @staticmethod
+    def get_unread_count(recipient_id: int) -> int:
+        """A recipient's unread notifications, cached until their inbox changes"""
+        return caching.get_or_build(
+            'unread_count', [caching.inbox_namespace(recipient_id)],
+            lambda: UnreadNotificationCount.objects.filter(recipient_id=recipient_id).values_list('unread', flat=True).first() or 0,
+            UNREAD_CACHE_TIMEOUT,
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def mark_read(recipient_id: int, notification_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Mark a recipient's unread notifications read with one UPDATE
+
+        All of them, or only those with the given ids. A notification someone
+        else marked first is not matched, so it is never taken off the
+        counter twice.
+
+        Returns:
+            int: number of notifications marked read
+        """
+        notifications = NotificationService.get_inbox(recipient_id, unread_only=True)
+        if notification_ids is not None:
+            notifications = notifications.filter(id__in=notification_ids)
+        marked = notifications.update(read_at=timezone.now())
+        NotificationService._shift_unread({recipient_id: -marked})
+        return marked
+
+    @staticmethod
+    def delete_notifications(notifications) -> None:
+        """Delete notifications, taking the unread ones off their recipients' counters - call in a transaction"""
+        # Locked, so they can't be marked read between counting and deleting
+        rows = list(notifications.select_for_update().values_list('recipient_id', 'read_at'))
+        if not rows:
+            return
+        unread = Counter(recipient_id for recipient_id, read_at in rows if read_at is None)
+        notifications.delete()
+        NotificationService._shift_unread({recipient_id: -count for recipient_id, count in unread.items()})
+        # Read ones leave the inbox too
+        caching.bump(*(caching.inbox_namespace(recipient_id) for recipient_id, _ in rows))
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild_counts() -> int:
+        """
+        Recount every recipient's unread notifications from the table
+
+        Returns:
+            int: number of recipients with unread notifications
+        """
+        rows = list(
+            TaskNotification.objects.filter(read_at__isnull=True)
+            .values('recipient_id').annotate(unread=Count('id')).order_by()
+        )
+        old_recipients = list(UnreadNotificationCount.objects.values_list('recipient_id', flat=True))
+        UnreadNotificationCount.objects.all().delete()
+        UnreadNotificationCount.objects.bulk_create(
+            [UnreadNotificationCount(recipient_id=row['recipient_id'], unread=row['unread']) for row in rows],
+            batch_size=500,
+        )
+        caching.bump(*(caching.inbox_namespace(recipient_id) for recipient_id in old_recipients),
+                     *(caching.inbox_namespace(row['recipient_id']) for row in rows))
+        logger.info(f'Recounted unread notifications for {len(rows)} recipients')
+        return len(rows)
+
+    @staticmethod
+    def _shift_unread(deltas: Dict[int, int]) -> None:
+        """Add to recipients' counters relative to their stored values, and invalidate their inboxes"""
+        deltas = {recipient_id: delta for recipient_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updated = UnreadNotificationCount.objects.filter(recipient_id__in=deltas).update(
+            unread=F('unread') + Case(
+                *(When(recipient_id=recipient_id, then=Value(delta)) for recipient_id, delta in deltas.items()),
+                default=Value(0),
+            )
+        )
+        if updated < len(deltas):
+            # First notification for some recipients - start their counters
+            existing = set(
+                UnreadNotificationCount.objects.filter(recipient_id__in=deltas).values_list('recipient_id', flat=True)
+            )
+            for recipient_id in deltas.keys() - existing:
+                NotificationService._start_counter(recipient_id, deltas[recipient_id])
+        caching.bump(*(caching.inbox_namespace(recipient_id) for recipient_id in deltas))
+
+    @staticmethod
+    def _start_counter(recipient_id: int, unread: int) -> None:
+        try:
+            # Savepoint so a lost race doesn't break the caller's transaction
+            with transaction.atomic():
+                UnreadNotificationCount.objects.create(recipient_id=recipient_id, unread=unread)
+        except IntegrityError:
+            UnreadNotificationCount.objects.filter(recipient_id=recipient_id).update(unread=F('unread') + unread)
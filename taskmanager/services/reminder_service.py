@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from ..models import Task, TaskNotification, TaskReminder
+from .notification_service import NotificationService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reminder settings
+REMINDER_LEAD = timedelta(hours=24)  # remind about tasks due within this
+REMINDER_OVERDUE_LOOKBACK = timedelta(days=7)  # tasks overdue for longer are left alone
+REMINDER_BATCH_SIZE = 1000  # tasks per transaction
+
+REMINDER_MESSAGES = {
+    'due_soon': 'Reminder: {title} is due {due:%b %d at %H:%M}',
+    'overdue': 'Overdue: {title} was due {due:%b %d at %H:%M}',
+}
+
+
+class ReminderService:
+    """
+    Service class for due-date reminders
+
+    Pending tasks are found through the partial due_date index, a window at a
+    time, and walked in (due_date, id) order. Each batch writes its
+    TaskReminder rows and notifications with one bulk insert each and updates
+    the unread counters once, in one transaction. Tasks already reminded for a
+    window and due date are skipped.
+    """
+
+    @staticmethod
+    def get_windows(now: datetime, lead: timedelta = REMINDER_LEAD,
+                    overdue_lookback: timedelta = REMINDER_OVERDUE_LOOKBACK) -> Dict[str, Tuple[datetime, datetime]]:
+        """Each reminder window as (due after, due at or before)"""
+        return {
+            'due_soon': (now, now + lead),
+            'overdue': (now - overdue_lookback, now),
+        }
+
+    @staticmethod
+    def get_unreminded(window: str, due_after: datetime, due_by: datetime):
+        """Pending tasks due in the range that haven't had this window's reminder for their current due date"""
+        sent = TaskReminder.objects.filter(task_id=OuterRef('pk'), window=window, due_date=OuterRef('due_date'))
+        return Task.objects.pending().filter(
+            due_date__gt=due_after, due_date__lte=due_by
+        ).filter(~Exists(sent)).order_by('due_date', 'id')
+
+    @staticmethod
+    def send_reminders(now: datetime = None, lead: timedelta = REMINDER_LEAD,
+                       overdue_lookback: timedelta = REMINDER_OVERDUE_LOOKBACK,
+                       batch_size: int = REMINDER_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Send every reminder that is due
+
+        Returns:
+            dict: reminders sent per window
+        """
+        now = now or timezone.now()
+        sent = {}
+        for window, (due_after, due_by) in ReminderService.get_windows(now, lead, overdue_lookback).items():
+            sent[window] = 0
+            for batch in ReminderService._walk(window, due_after, due_by, batch_size):
+                sent[window] += ReminderService._send_batch(window, batch)
+            logger.info(f'Sent {sent[window]} {window} reminders')
+        return sent
+
+    @staticmethod
+    def count_due(now: datetime = None, lead: timedelta = REMINDER_LEAD,
+                  overdue_lookback: timedelta = REMINDER_OVERDUE_LOOKBACK) -> Dict[str, int]:
+        """Reminders send_reminders would send now, per window"""
+        now = now or timezone.now()
+        return {
+            window: ReminderService.get_unreminded(window, due_after, due_by).count()
+            for window, (due_after, due_by) in ReminderService.get_windows(now, lead, overdue_lookback).items()
+        }
+
+    @staticmethod
+    def get_batch(window: str, due_after: datetime, due_by: datetime, batch_size: int = REMINDER_BATCH_SIZE,
+                  after: Tuple[datetime, int] = None):
+        """
+        The next batch of tasks to remind, as (id, title, assigned_to_id, due_date) rows
+
+        after is the (due_date, id) of the last task in the batch before, so
+        each batch seeks into the index instead of skipping past earlier ones.
+        """
+        tasks = ReminderService.get_unreminded(window, due_after, due_by)
+        if after is not None:
+            due_date, task_id = after
+            # The plain bound starts the index range here; the OR alone doesn't
+            tasks = tasks.filter(due_date__gte=due_date).filter(Q(due_date__gt=due_date) | Q(id__gt=task_id))
+        return tasks.values_list('id', 'title', 'assigned_to_id', 'due_date')[:batch_size]
+
+    @staticmethod
+    def _walk(window: str, due_after: datetime, due_by: datetime, batch_size: int) -> Iterator[List[Tuple]]:
+        after = None
+        while True:
+            batch = list(ReminderService.get_batch(window, due_after, due_by, batch_size, after))
+            if not batch:
+                return
+            yield batch
+            task_id, _, _, due_date = batch[-1]
+            after = (due_date, task_id)
+
+    @staticmethod
+    def _send_batch(window: str, batch: List[Tuple]) -> int:
+        try:
+            with transaction.atomic():
+                TaskReminder.objects.bulk_create([
+                    TaskReminder(task_id=task_id, window=window, due_date=due_date)
+                    for task_id, _, _, due_date in batch
+                ])
+                NotificationService.notify_many([
+                    TaskNotification(
+                        task_id=task_id,
+                        recipient_id=recipient_id,
+                        message=REMINDER_MESSAGES[window].format(title=title, due=timezone.localtime(due_date)),
+                        notification_type='reminder',
+                    )
+                    for task_id, title, recipient_id, due_date in batch
+                ])
+        except IntegrityError:
+            # Another run sent some of these since they were read - send the rest one by one
+            return sum(ReminderService._send_batch(window, [row]) for row in batch) if len(batch) > 1 else 0
+        return len(batch)
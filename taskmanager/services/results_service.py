@@ -0,0 +1,116 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+from django.db.models import Count, F, Max, Min, Sum
+from ..models import ArchivedTask, Task, TaskResponse, RESPONSE_METRICS_VERSION
+from .deletion_service import DeletionService, DELETE_BATCH_SIZE, DELETE_BATCH_PAUSE
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Response columns returned with each result
+METRIC_FIELDS = ('score', 'max_score', 'accuracy', 'moves', 'duration_seconds')
+
+
+class ResultsService:
+    """
+    Service class for game result trends, leaderboards and filters over the response metric columns
+
+    Per-patient queries walk the task completion index and join each response
+    by its unique task_id, so they never read the responses JSON. Results of
+    archived tasks come from the same columns on ArchivedTask, read in the
+    same query with UNION ALL.
+    """
+
+    @staticmethod
+    def get_score_trend(patient_profile, task_type: str, difficulty: Optional[str] = None):
+        """A patient's results for one game, live and archived, oldest first, as dicts"""
+        tasks = Task.objects.filter(assigned_to=patient_profile, task_type=task_type).completed()
+        archived = ArchivedTask.objects.filter(assigned_to=patient_profile, task_type=task_type)
+        if difficulty:
+            tasks = tasks.filter(difficulty=difficulty)
+            archived = archived.filter(difficulty=difficulty)
+        return ResultsService._union(tasks, archived, 'difficulty', 'completed_at').order_by('completed_at')
+
+    @staticmethod
+    def get_leaderboard(provider_profile, task_type: str, difficulty: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """
+        A provider's patients ranked by their best accuracy on one game, live and archived, as dicts
+
+        Each side is aggregated per patient in SQL; the two rows a patient can
+        have are combined here.
+        """
+        responses = TaskResponse.objects.filter(
+            task__assigned_by=provider_profile,
+            task__task_type=task_type,
+            accuracy__isnull=False,
+        )
+        archived = ArchivedTask.objects.filter(
+            assigned_by=provider_profile,
+            task_type=task_type,
+            accuracy__isnull=False,
+        )
+        if difficulty:
+            responses = responses.filter(task__difficulty=difficulty)
+            archived = archived.filter(difficulty=difficulty)
+        aggregates = {
+            'best_accuracy': Max('accuracy'),
+            'total_accuracy': Sum('accuracy'),
+            'fastest_seconds': Min('duration_seconds'),
+            'plays': Count('id'),
+        }
+        responses = responses.order_by().values(patient_id=F('task__assigned_to')).annotate(**aggregates)
+        archived = archived.order_by().values(patient_id=F('assigned_to')).annotate(**aggregates)
+
+        patients = {}
+        for row in responses.union(archived, all=True):
+            seen = patients.setdefault(row['patient_id'], row)
+            if seen is row:
+                continue
+            seen['best_accuracy'] = max(seen['best_accuracy'], row['best_accuracy'])
+            seen['total_accuracy'] += row['total_accuracy']
+            fastest = [seconds for seconds in (seen['fastest_seconds'], row['fastest_seconds']) if seconds is not None]
+            seen['fastest_seconds'] = min(fastest, default=None)
+            seen['plays'] += row['plays']
+        for row in patients.values():
+            row['average_accuracy'] = row.pop('total_accuracy') / row['plays']
+        return sorted(patients.values(), key=lambda row: (-row['best_accuracy'], row['patient_id']))[:limit]
+
+    @staticmethod
+    def get_low_scores(patient_profile, below: float):
+        """A patient's game results, live and archived, with accuracy under a threshold, most recent first, as dicts"""
+        tasks = Task.objects.filter(assigned_to=patient_profile, response__accuracy__lt=below).completed()
+        archived = ArchivedTask.objects.filter(assigned_to=patient_profile, accuracy__lt=below)
+        return ResultsService._union(tasks, archived, 'task_type', 'difficulty', 'completed_at').order_by('-completed_at')
+
+    @staticmethod
+    def _union(tasks, archived, *fields):
+        """Live and archived results as one values() queryset of task_id, fields and METRIC_FIELDS"""
+        # Concrete fields come before annotations in the SELECT, so both sides list task_id and the metrics last
+        tasks = tasks.order_by().values(
+            *fields, task_id=F('id'), **{field: F(f'response__{field}') for field in METRIC_FIELDS}
+        )
+        archived = archived.order_by().values(*fields, 'task_id', *METRIC_FIELDS)
+        return tasks.union(archived, all=True)
+
+    @staticmethod
+    def backfill_metrics(responses=None, batch_size: int = DELETE_BATCH_SIZE,
+                         pause: float = DELETE_BATCH_PAUSE) -> Iterator[Tuple[int, int, int]]:
+        """
+        Extract the metric columns for responses saved before they existed
+
+        Only rows behind RESPONSE_METRICS_VERSION are walked, so an
+        interrupted run picks up where it stopped.
+        """
+        if responses is None:
+            responses = TaskResponse.objects.all()
+        responses = responses.filter(metrics_version__lt=RESPONSE_METRICS_VERSION)
+        return DeletionService.run_batches(responses, ResultsService._backfill_batch, batch_size, pause)
+
+    @staticmethod
+    def _backfill_batch(responses) -> int:
+        batch = list(responses.select_related('task'))
+        for response in batch:
+            response.extract_metrics()
+            if response.completed_at is None and response.task.status == 'completed':
+                response.completed_at = response.task.completed_at
+        TaskResponse.objects.bulk_update(batch, ['completed_at', *METRIC_FIELDS, 'metrics_version'])
+        return len(batch)
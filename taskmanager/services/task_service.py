@@ -1,13 +1,25 @@
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
 from django.urls import reverse
-from ..models import Task, TaskNotification, TaskResponse
+from ..models import Task, TaskNotification, TaskResponse, ArchivedTask, PENDING_STATUS_Q
 from ..constants import TASK_TYPES, GAME_TYPES
+from .activity_service import ActivityService
+from .completion_feed_service import CompletionFeedService
+from .deletion_service import DeletionService
+from .archive_service import ArchiveService
+from .job_service import JobService
+from .notification_service import NotificationService
+from .. import caching
+from ..caching import TASKS_NAMESPACE, patient_namespace, provider_namespace
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Task statistics cache settings
+STATS_CACHE_TIMEOUT = 300  # seconds
+
 
 class TaskService:
     """Service class for task-related operations"""
@@ -26,21 +38,58 @@ class TaskService:
             **kwargs
         )
         
-        TaskNotification.objects.create(
-            task=task,
-            recipient=assigned_to,
-            message=f"New task assigned: {title}",
-            notification_type='assigned'
-        )
+        JobService.enqueue('notify_assigned', task_ids=[task.id])
         
+        ActivityService.record_task_assigned(task)
+        TaskService.invalidate_task_statistics([task.assigned_by_id], [task.assigned_to_id])
         logger.info(f'Created task {task.id} ({task_type}, {difficulty}) for patient {assigned_to.id}')
         return task
     
     @staticmethod
-    def bulk_create_tasks(patient_profile, provider_profile, tasks_data: List[Dict]) -> List[Task]:
+    def bulk_create_tasks(patient_profile, provider_profile, tasks_data: List[Dict]) -> List[Dict]:
         """Create multiple tasks for a patient"""
-        created_tasks = []
+        created_tasks = TaskService.assign_tasks(provider_profile, [patient_profile], tasks_data)
+        return [
+            {
+                'id': task.id,
+                'title': task.title,
+                'task_type': task.task_type,
+                'difficulty': task.difficulty,
+            }
+            for task in created_tasks
+        ]
+    
+    @staticmethod
+    @transaction.atomic
+    def assign_tasks(provider_profile, patient_profiles, tasks_data: List[Dict]) -> List[Task]:
+        """
+        Assign the same task set to one or many patients as a single batch
+        
+        Tasks are written with bulk_create in one transaction, and the activity
+        rollup and statistics are updated once. The patients are notified by a
+        background job, queued in the same transaction.
+        """
+        task_specs = TaskService._build_task_specs(tasks_data)
+        if not task_specs:
+            return []
+        
+        tasks = Task.objects.bulk_create([
+            Task(assigned_by=provider_profile, assigned_to=patient, **spec)
+            for patient in patient_profiles
+            for spec in task_specs
+        ])
+        JobService.enqueue('notify_assigned', task_ids=[task.id for task in tasks])
+        
+        ActivityService.record_tasks_assigned(tasks)
+        TaskService.invalidate_task_statistics([provider_profile.id], [patient.id for patient in patient_profiles])
+        logger.info(f'Assigned {len(task_specs)} tasks to {len(tasks) // len(task_specs)} patients ({len(tasks)} tasks created)')
+        return tasks
+    
+    @staticmethod
+    def _build_task_specs(tasks_data: List[Dict]) -> List[Dict]:
+        """Normalise requested tasks into title, task_type and difficulty"""
         type_dict = dict(TASK_TYPES)
+        task_specs = []
         
         for task_data in tasks_data:
             task_type = task_data.get('task_type')
@@ -53,43 +102,53 @@ class TaskService:
             else:
                 difficulty = None
             
-            # Always set title to the display name for the selected task_type
-            title = type_dict.get(task_type, task_type.replace('_', ' ').title())
-            
-            task = TaskService.create_task(
-                title=title,
-                task_type=task_type,
-                difficulty=difficulty,
-                assigned_by=provider_profile,
-                assigned_to=patient_profile
-            )
-            
-            created_tasks.append({
-                'id': task.id,
-                'title': title,
+            task_specs.append({
+                # Always set title to the display name for the selected task_type
+                'title': type_dict.get(task_type, task_type.replace('_', ' ').title()),
                 'task_type': task_type,
-                'difficulty': difficulty
+                'difficulty': difficulty,
             })
         
-        logger.info(f'Successfully created {len(created_tasks)} tasks for patient {patient_profile.id}')
-        return created_tasks
+        return task_specs
     
     @staticmethod
-    def complete_task(task: Task, user_profile, responses: Dict) -> TaskResponse:
-        """Complete a task and save responses"""
-        # Get or create task response
-        task_response, created = TaskResponse.objects.get_or_create(task=task)
+    @transaction.atomic
+    def complete_task(task: Task, user_profile, responses: Dict) -> Optional[TaskResponse]:
+        """
+        Complete a task and save responses
         
-        # Save responses
-        task_response.responses = responses
-        task_response.save()
+        The task is claimed with an update that only matches it while pending,
+        so of two submissions racing (a double click, or a patient and their
+        caregiver) only one completes it and counts it.
+        
+        Returns:
+            TaskResponse, or None if the task was already completed
+        """
+        completed_at = timezone.now()
         
         # Mark task as completed
+        claimed = Task.objects.filter(pk=task.pk).pending().update(
+            status='completed', completed_by=user_profile, completed_at=completed_at,
+        )
+        if not claimed:
+            return None
         task.status = 'completed'
         task.completed_by = user_profile
-        task.completed_at = timezone.now()
-        task.save()
+        task.completed_at = completed_at
+        
+        # Get or create task response
+        task_response, created = TaskResponse.objects.get_or_create(task=task)
         
+        # Save responses, with the game results in their own columns
+        task_response.responses = responses
+        task_response.completed_at = completed_at
+        task_response.extract_metrics()
+        task_response.save()
+        
+        JobService.enqueue('notify_completed', task_id=task.id)
+        ActivityService.record_task_completed(task)
+        CompletionFeedService.record_task_completed(task, user_profile)
+        TaskService.invalidate_task_statistics([task.assigned_by_id], [task.assigned_to_id])
         logger.info(f'Task {task.id} completed by {user_profile.user.username}')
         return task_response
     
@@ -97,10 +156,13 @@ class TaskService:
     def delete_task(task: Task) -> bool:
         """Delete a task and related data"""
         try:
-            # Delete related responses and notifications
-            TaskResponse.objects.filter(task=task).delete()
-            TaskNotification.objects.filter(task=task).delete()
-            task.delete()
+            with transaction.atomic():
+                # Delete related responses and notifications
+                ActivityService.remove_tasks(Task.objects.filter(pk=task.pk))
+                TaskResponse.objects.filter(task=task).delete()
+                NotificationService.delete_notifications(TaskNotification.objects.filter(task=task))
+                task.delete()
+            TaskService.invalidate_task_statistics([task.assigned_by_id], [task.assigned_to_id])
             logger.info(f'Deleted task {task.id}')
             return True
         except Exception as e:
@@ -108,15 +170,12 @@ class TaskService:
             return False
     
     @staticmethod
-    def delete_patient_tasks(patient_profile) -> int:
-        """Delete all tasks for a patient"""
-        tasks_to_delete = Task.objects.filter(assigned_to=patient_profile)
-        count = tasks_to_delete.count()
-        
-        # Delete related responses and notifications first
-        TaskResponse.objects.filter(task__in=tasks_to_delete).delete()
-        TaskNotification.objects.filter(task__in=tasks_to_delete).delete()
-        tasks_to_delete.delete()
+    def delete_patient_tasks(patient_profile, created_before=None) -> int:
+        """Delete all tasks for a patient, optionally only those created before a time"""
+        tasks = TaskService._created_before(Task.objects.filter(assigned_to=patient_profile), created_before)
+        owners = TaskService.get_task_owners(tasks)
+        count = DeletionService.run(DeletionService.delete_tasks(tasks))
+        TaskService.invalidate_task_statistics(*owners)
         
         logger.info(f'Deleted {count} tasks for patient {patient_profile.id}')
         return count
@@ -124,69 +183,143 @@ class TaskService:
     @staticmethod
     def clear_completed_tasks(provider_profile=None) -> int:
         """Clear completed tasks, optionally for a specific provider"""
+        completed_tasks = Task.objects.filter(status='completed')
         if provider_profile:
-            completed_tasks = Task.objects.filter(
-                status='completed',
-                assigned_by=provider_profile
-            )
-        else:
-            completed_tasks = Task.objects.filter(status='completed')
-        
-        count = completed_tasks.count()
+            completed_tasks = completed_tasks.filter(assigned_by=provider_profile)
         
-        # Clear related data first
-        TaskResponse.objects.filter(task__in=completed_tasks).delete()
-        TaskNotification.objects.filter(task__in=completed_tasks).delete()
-        completed_tasks.delete()
+        owners = TaskService.get_task_owners(completed_tasks)
+        count = DeletionService.run(DeletionService.delete_tasks(completed_tasks))
+        TaskService.invalidate_task_statistics(*owners)
         
         logger.info(f'Cleared {count} completed tasks')
         return count
     
     @staticmethod
-    def clear_all_tasks(provider_profile=None) -> int:
-        """Clear all tasks, optionally for a specific provider"""
-        if provider_profile:
-            tasks = Task.objects.filter(assigned_by=provider_profile)
-        else:
-            tasks = Task.objects.all()
+    def archive_completed_tasks(provider_profile=None, cutoff=None) -> int:
+        """Move completed tasks to the archive, optionally for a provider or only those finished before cutoff"""
+        tasks = ArchiveService.get_completed_before(cutoff or timezone.now(), provider_profile=provider_profile)
         
-        count = tasks.count()
+        owners = TaskService.get_task_owners(tasks)
+        count = DeletionService.run(ArchiveService.archive_tasks(tasks))
+        TaskService.invalidate_task_statistics(*owners)
         
-        # Clear all related data
-        TaskResponse.objects.filter(task__in=tasks).delete()
-        TaskNotification.objects.filter(task__in=tasks).delete()
-        tasks.delete()
+        logger.info(f'Archived {count} completed tasks')
+        return count
+    
+    @staticmethod
+    def clear_all_tasks(provider_profile=None, created_before=None) -> int:
+        """Clear all tasks, optionally for a specific provider or only those created before a time"""
+        tasks = TaskService._created_before(Task.objects.all(), created_before)
+        if provider_profile:
+            tasks = tasks.filter(assigned_by=provider_profile)
+        
+        owners = TaskService.get_task_owners(tasks)
+        count = DeletionService.run(DeletionService.delete_tasks(tasks))
+        TaskService.invalidate_task_statistics(*owners)
         
         logger.info(f'Cleared all {count} tasks')
         return count
     
     @staticmethod
-    def reset_task_responses(provider_profile=None) -> int:
-        """Reset task responses but keep tasks"""
+    def reset_task_responses(provider_profile=None, created_before=None) -> int:
+        """Reset task responses but keep tasks, optionally only for tasks created before a time"""
+        tasks = TaskService._created_before(Task.objects.all(), created_before)
         if provider_profile:
-            tasks = Task.objects.filter(assigned_by=provider_profile)
-            response_count = TaskResponse.objects.filter(task__in=tasks).count()
-            TaskResponse.objects.filter(task__in=tasks).delete()
-            tasks.filter(status__in=['completed', 'in_progress']).update(
-                status='assigned',
-                completed_at=None
-            )
-        else:
-            response_count = TaskResponse.objects.count()
-            TaskResponse.objects.all().delete()
-            Task.objects.filter(status__in=['completed', 'in_progress']).update(
-                status='assigned',
-                completed_at=None
-            )
+            tasks = tasks.filter(assigned_by=provider_profile)
+        
+        owners = TaskService.get_task_owners(tasks)
+        response_count = DeletionService.run(DeletionService.reset_responses(tasks))
+        TaskService.invalidate_task_statistics(*owners)
         
         logger.info(f'Reset {response_count} task responses')
         return response_count
     
     @staticmethod
-    def get_task_statistics() -> Dict:
-        """Get task statistics"""
-        return {
-            'total_tasks': Task.objects.count(),
-            'pending_tasks_count': Task.objects.filter(status__in=['assigned', 'in_progress']).count(),
-            'completed_tasks_count': Task.objects.filter(status='completed').count(),
-        } 
\ No newline at end of file
+    def get_patient_tasks(patient_profile):
+        """Get all tasks assigned to a patient, newest first"""
+        return Task.objects.filter(assigned_to=patient_profile).order_by('-created_at')
+    
+    @staticmethod
+    def get_patient_pending_tasks(patient_profile):
+        """Get a patient's open tasks, soonest due first"""
+        return Task.objects.filter(assigned_to=patient_profile).pending().order_by('due_date', 'created_at')
+    
+    @staticmethod
+    def get_patient_completed_tasks(patient_profile):
+        """Get a patient's completed tasks, most recently completed first"""
+        return Task.objects.filter(assigned_to=patient_profile).completed().order_by('-completed_at')
+    
+    @staticmethod
+    def get_provider_tasks(provider_profile):
+        """Get all tasks a provider has assigned, newest first"""
+        return Task.objects.filter(assigned_by=provider_profile).order_by('-created_at')
+    
+    @staticmethod
+    def get_task_statistics(provider_profile=None, patient_profile=None) -> Dict:
+        """
+        Get task statistics, cached until the next write to the tasks they count
+        
+        Scoped to a provider's assigned tasks or a patient's tasks (profile or
+        id) when given, otherwise global.
+        """
+        if patient_profile is not None:
+            namespace = patient_namespace(getattr(patient_profile, 'pk', patient_profile))
+        elif provider_profile is not None:
+            namespace = provider_namespace(getattr(provider_profile, 'pk', provider_profile))
+        else:
+            namespace = TASKS_NAMESPACE
+        
+        return caching.get_or_build(
+            'task_stats', [namespace],
+            lambda: TaskService._compute_task_statistics(provider_profile, patient_profile),
+            STATS_CACHE_TIMEOUT,
+        )
+    
+    @staticmethod
+    def invalidate_task_statistics(provider_ids: Iterable[int] = (), patient_ids: Iterable[int] = ()):
+        """Invalidate the global statistics and those of the given providers and patients once the current transaction commits"""
+        caching.bump(
+            TASKS_NAMESPACE,
+            *(provider_namespace(provider_id) for provider_id in provider_ids),
+            *(patient_namespace(patient_id) for patient_id in patient_ids),
+        )
+    
+    @staticmethod
+    def get_task_owners(tasks) -> Tuple[Set[int], Set[int]]:
+        """
+        The provider and patient ids of a queryset of tasks, for invalidate_task_statistics
+        
+        Read it before deleting or archiving the tasks - afterwards they are gone.
+        """
+        owners = list(tasks.order_by().values_list('assigned_by_id', 'assigned_to_id').distinct())
+        return {provider_id for provider_id, _ in owners}, {patient_id for _, patient_id in owners}
+    
+    @staticmethod
+    def _created_before(tasks, created_before):
+        """Keep a bulk operation that ran as a job to the tasks there were when it was queued"""
+        if created_before is None:
+            return tasks
+        return tasks.filter(created_at__lte=created_before)
+    
+    @staticmethod
+    def _compute_task_statistics(provider_profile=None, patient_profile=None) -> Dict:
+        """Count task statistics with one conditional aggregation, plus one count of the archive"""
+        tasks = Task.objects.all()
+        archived = ArchivedTask.objects.all()
+        if patient_profile is not None:
+            tasks = tasks.filter(assigned_to=patient_profile)
+            archived = archived.filter(assigned_to=patient_profile)
+        elif provider_profile is not None:
+            tasks = tasks.filter(assigned_by=provider_profile)
+            archived = archived.filter(assigned_by=provider_profile)
+        
+        stats = tasks.aggregate(
+            total_tasks=Count('id'),
+            pending_tasks_count=Count('id', filter=PENDING_STATUS_Q),
+            completed_tasks_count=Count('id', filter=Q(status='completed')),
+        )
+        # Archived tasks are all completed
+        archived_count = archived.count()
+        stats['total_tasks'] += archived_count
+        stats['completed_tasks_count'] += archived_count
+        return stats
@@ -0,0 +1,52 @@
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from ..caching import FRAGMENT_TIMEOUT, record_fragment
+
+register = template.Library()
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, version, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.version = version
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [self.version.resolve(context), *(var.resolve(context) for var in self.vary_on)]
+        key = make_template_fragment_key(self.name, vary_on)
+        value = cache.get(key)
+        record_fragment(self.name, hit=value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(key, value, FRAGMENT_TIMEOUT)
+        return value
+
+
+@register.tag
+def cachefragment(parser, token):
+    """
+    Cache a template fragment until the data it shows changes
+
+        {% cachefragment "name" version [vary_on ...] %} ... {% endcachefragment %}
+
+    version is a key from caching.make_key() over the namespaces the fragment
+    shows, so a write to any of them renders it again. Hits and misses are
+    counted per name (see fragment_cache_stats). The fragment must not hold
+    per-user values such as {% csrf_token %} unless they are in vary_on.
+    """
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f'{bits[0]!r} tag requires a name and a version')
+    name = bits[1]
+    if not (name[0] == name[-1] and name[0] in ('"', "'")):
+        raise template.TemplateSyntaxError(f'{bits[0]!r} tag name must be a quoted string')
+    return CacheFragmentNode(
+        nodelist,
+        name[1:-1],
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
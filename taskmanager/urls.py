@@ -50,6 +50,26 @@ urlpatterns = [
     path('get-patient-notes/<int:patient_id>/', views.get_patient_notes, name='get_patient_notes'),
     path('delete-patient-note/<int:note_id>/', views.delete_patient_note, name='delete_patient_note'),
     
+    # Notifications
+    path('notifications/mark-read/', views.mark_notifications_read, name='mark_notifications_read'),
+    
+    # Read API (v1)
+    path('api/v1/tasks/', views.api_tasks, name='api_tasks'),
+    path('api/v1/appointments/', views.api_appointments, name='api_appointments'),
+    path('api/v1/notes/', views.api_notes, name='api_notes'),
+    path('api/v1/notifications/', views.api_notifications, name='api_notifications'),
+    path('api/v1/notifications/unread-count/', views.api_unread_count, name='api_unread_count'),
+    path('api/v1/checklist-status/', views.api_checklist_status, name='api_checklist_status'),
+    path('api/v1/statistics/', views.api_statistics, name='api_statistics'),
+    path('api/v1/activity/', views.api_activity, name='api_activity'),
+    path('api/v1/results/', views.api_results, name='api_results'),
+    path('api/v1/bootstrap/provider/', views.api_provider_bootstrap, name='api_provider_bootstrap'),
+    path('api/v1/bootstrap/patient/', views.api_patient_bootstrap, name='api_patient_bootstrap'),
+    path('api/v1/bootstrap/caregiver/', views.api_caregiver_bootstrap, name='api_caregiver_bootstrap'),
+    
+    # Live feed (server-sent events)
+    path('feed/completions/', views.completion_feed, name='completion_feed'),
+    
     # Game Testing URLs
     path('test/puzzle/<str:difficulty>/', views.test_puzzle, name='test_puzzle'),
     path('test/color/<str:difficulty>/', views.test_color, name='test_color'),
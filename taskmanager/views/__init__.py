@@ -39,6 +39,11 @@ from .checklists import (
     ResetDailyChecklistPatientView,
 )
 
+# Import notification views
+from .notifications import (
+    MarkNotificationsReadView,
+)
+
 # Import testing views
 from .testing import (
     TestPuzzleView,
@@ -48,6 +53,66 @@ from .testing import (
     TestDailyChecklistView,
 )
 
+# Import read API views
+from .api import (
+    TaskListAPIView,
+    AppointmentListAPIView,
+    NoteListAPIView,
+    NotificationListAPIView,
+    UnreadCountAPIView,
+    ChecklistStatusAPIView,
+    StatisticsAPIView,
+    ActivityAPIView,
+    ResultsAPIView,
+    ProviderBootstrapAPIView,
+    PatientBootstrapAPIView,
+    CaregiverBootstrapAPIView,
+)
+
+# Import live feed views
+from .feed import (
+    CompletionFeedView,
+)
+
+from django.contrib.auth.decorators import login_required
+from ..decorators import read_replica
+
+# Read API views run through dispatch, so their errors come back as JSON;
+# they are async, and run as such under ASGI
+api_tasks = read_replica(TaskListAPIView.as_view())
+api_appointments = read_replica(AppointmentListAPIView.as_view())
+api_notes = read_replica(NoteListAPIView.as_view())
+api_notifications = read_replica(NotificationListAPIView.as_view())
+api_unread_count = read_replica(UnreadCountAPIView.as_view())
+api_checklist_status = read_replica(ChecklistStatusAPIView.as_view())
+api_statistics = read_replica(StatisticsAPIView.as_view())
+api_activity = read_replica(ActivityAPIView.as_view())
+api_results = read_replica(ResultsAPIView.as_view())
+api_provider_bootstrap = read_replica(ProviderBootstrapAPIView.as_view())
+api_patient_bootstrap = read_replica(PatientBootstrapAPIView.as_view())
+api_caregiver_bootstrap = read_replica(CaregiverBootstrapAPIView.as_view())
+
+# Read from the primary: the feed wakes on commits a replica may not have yet
+completion_feed = CompletionFeedView.as_view()
+
+# Views for one role run through dispatch, so their role mixin applies
+assign_multiple_tasks = AssignMultipleTasksView.as_view()
+provider_task_management = ProviderTaskManagementView.as_view()
+clear_completed_tasks = ClearCompletedTasksView.as_view()
+clear_all_tasks = ClearAllTasksView.as_view()
+clear_task_responses = ClearTaskResponsesView.as_view()
+clear_provider_completed_tasks = ClearProviderCompletedTasksView.as_view()
+clear_provider_all_tasks = ClearProviderAllTasksView.as_view()
+clear_provider_task_responses = ClearProviderTaskResponsesView.as_view()
+test_puzzle = TestPuzzleView.as_view()
+test_color = TestColorView.as_view()
+test_pairs = TestPairsView.as_view()
+test_questionnaire = TestQuestionnaireView.as_view()
+test_daily_checklist = TestDailyChecklistView.as_view()
+
+# Any signed-in profile may call this; dispatch turns its errors into JSON and refuses other methods
+mark_notifications_read = MarkNotificationsReadView.as_view()
+
 # Legacy function-based views (for backward compatibility)
 # These will be gradually replaced by the class-based views above
 
@@ -59,16 +124,12 @@ def assign_task(request, patient_id=None):
     elif request.method == 'POST':
         return view.post(request, patient_id)
 
-def assign_multiple_tasks(request):
-    """Legacy function-based view - delegates to AssignMultipleTasksView"""
-    view = AssignMultipleTasksView()
-    return view.post(request)
-
 def patient_tasks(request, patient_id=None):
     """Legacy function-based view - delegates to PatientTasksView"""
     view = PatientTasksView()
     return view.get(request, patient_id)
 
+@login_required
 def take_task(request, task_id):
     """Legacy function-based view - delegates to TakeTaskView"""
     view = TakeTaskView()
@@ -77,16 +138,12 @@ def take_task(request, task_id):
     elif request.method == 'POST':
         return view.post(request, task_id)
 
+@read_replica
 def task_results(request, task_id):
     """Legacy function-based view - delegates to TaskResultsView"""
     view = TaskResultsView()
     return view.get(request, task_id)
 
-def provider_task_management(request):
-    """Legacy function-based view - delegates to ProviderTaskManagementView"""
-    view = ProviderTaskManagementView()
-    return view.get(request)
-
 def delete_task(request, task_id):
     """Legacy function-based view - delegates to DeleteTaskView"""
     view = DeleteTaskView()
@@ -97,36 +154,6 @@ def delete_all_tasks(request, patient_id):
     view = DeletePatientTasksView()
     return view.post(request, patient_id)
 
-def clear_completed_tasks(request):
-    """Legacy function-based view - delegates to ClearCompletedTasksView"""
-    view = ClearCompletedTasksView()
-    return view.post(request)
-
-def clear_all_tasks(request):
-    """Legacy function-based view - delegates to ClearAllTasksView"""
-    view = ClearAllTasksView()
-    return view.post(request)
-
-def clear_task_responses(request):
-    """Legacy function-based view - delegates to ClearTaskResponsesView"""
-    view = ClearTaskResponsesView()
-    return view.post(request)
-
-def clear_provider_completed_tasks(request):
-    """Legacy function-based view - delegates to ClearProviderCompletedTasksView"""
-    view = ClearProviderCompletedTasksView()
-    return view.post(request)
-
-def clear_provider_all_tasks(request):
-    """Legacy function-based view - delegates to ClearProviderAllTasksView"""
-    view = ClearProviderAllTasksView()
-    return view.post(request)
-
-def clear_provider_task_responses(request):
-    """Legacy function-based view - delegates to ClearProviderTaskResponsesView"""
-    view = ClearProviderTaskResponsesView()
-    return view.post(request)
-
 def create_appointment(request, patient_id):
     """Legacy function-based view - delegates to CreateAppointmentView"""
     view = CreateAppointmentView()
@@ -147,10 +174,11 @@ def create_patient_note(request, patient_id):
     view = CreatePatientNoteView()
     return view.post(request, patient_id)
 
-def get_patient_notes(request, patient_id):
+@read_replica
+async def get_patient_notes(request, patient_id):
     """Legacy function-based view - delegates to GetPatientNotesView"""
     view = GetPatientNotesView()
-    return view.get(request, patient_id)
+    return await view.get(request, patient_id)
 
 def delete_patient_note(request, note_id):
     """Legacy function-based view - delegates to DeletePatientNoteView"""
@@ -165,6 +193,7 @@ def daily_checklist_submit(request):
     elif request.method == 'POST':
         return view.post(request)
 
+@read_replica
 def daily_checklist_results(request, patient_id=None):
     """Legacy function-based view - delegates to DailyChecklistResultsView"""
     view = DailyChecklistResultsView()
@@ -175,46 +204,6 @@ def reset_daily_checklist_patient(request, patient_id):
     view = ResetDailyChecklistPatientView()
     return view.post(request, patient_id)
 
-def test_puzzle(request, difficulty):
-    """Legacy function-based view - delegates to TestPuzzleView"""
-    view = TestPuzzleView()
-    if request.method == 'GET':
-        return view.get(request, difficulty)
-    elif request.method == 'POST':
-        return view.post(request, difficulty)
-
-def test_color(request, difficulty):
-    """Legacy function-based view - delegates to TestColorView"""
-    view = TestColorView()
-    if request.method == 'GET':
-        return view.get(request, difficulty)
-    elif request.method == 'POST':
-        return view.post(request, difficulty)
-
-def test_pairs(request, difficulty):
-    """Legacy function-based view - delegates to TestPairsView"""
-    view = TestPairsView()
-    if request.method == 'GET':
-        return view.get(request, difficulty)
-    elif request.method == 'POST':
-        return view.post(request, difficulty)
-
-def test_questionnaire(request):
-    """Legacy function-based view - delegates to TestQuestionnaireView"""
-    view = TestQuestionnaireView()
-    if request.method == 'GET':
-        return view.get(request)
-    elif request.method == 'POST':
-        return view.post(request)
-
-def test_daily_checklist(request):
-    """Legacy function-based view - delegates to TestDailyChecklistView"""
-    view = TestDailyChecklistView()
-    if request.method == 'GET':
-        return view.get(request)
-    elif request.method == 'POST':
-        return view.post(request)
-
 # Import the process_memory_questionnaire_results function from the service
 from ..services.questionnaire_service import QuestionnaireService
 
@@ -225,6 +214,6 @@ def process_memory_questionnaire_results(responses):
 # Import task statistics function
 from ..services.task_service import TaskService
 
-def get_task_statistics():
+def get_task_statistics(provider_profile=None, patient_profile=None):
     """Legacy function - delegates to TaskService"""
-    return TaskService.get_task_statistics() 
\ No newline at end of file
+    return TaskService.get_task_statistics(provider_profile=provider_profile, patient_profile=patient_profile) 
\ No newline at end of file
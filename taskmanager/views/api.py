@@ -0,0 +1,529 @@
+"""
+Read-only JSON API, version 1 (/taskmanager/api/v1/)
+
+Lists are .values() projections, so no model instances are built, and
+?fields=a,b picks which of a resource's fields to return (all by default);
+names of people are only joined in when asked for. Lists are paged newest
+first like the notes endpoint - pass the response's next_cursor back as
+?after=. Responses are encoded by serialization.dumps, dates as ISO 8601,
+and carry an ETag from the data versions of the caller's namespaces.
+
+The views are async and query through Django's async ORM. Under an ASGI
+server (see the ReadMe), a client whose copy is current can also send
+?wait=<seconds> with If-None-Match to long-poll: the request is held, costing
+a cache read a second and no thread, until the data changes or the wait runs
+out. Under WSGI ?wait is ignored, so a long-poll never ties up a worker.
+The services are synchronous and run in a worker thread via sync_to_async.
+
+Each role also has a bootstrap endpoint returning everything its dashboard
+shows in one request, with each list as {"items": [...], "next_cursor": ...}.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Trim
+from .base import BaseAPIView, ConditionalGetMixin
+from ..constants import DIFFICULTY_LEVELS, GAME_TYPES
+from ..models import Appointment, DailyChecklistSubmission, PatientNote, Task
+from ..pagination import paginate_keyset
+from ..serialization import FastJsonResponse
+from ..services.activity_service import ActivityService
+from ..services.notification_service import NotificationService
+from ..services.results_service import ResultsService
+from ..services.task_service import TaskService
+from ..identity import aget_identity
+from .. import caching
+from users.models import UserProfile
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = 1
+
+# Long-poll settings
+LONG_POLL_MAX_WAIT = 30  # seconds
+LONG_POLL_INTERVAL = 1.0  # seconds between version checks
+
+# Longest activity trend, in days
+ACTIVITY_MAX_DAYS = 365
+
+
+def _full_name(prefix: str = ''):
+    """The full name of the user behind a profile, as a SQL expression"""
+    user = f'{prefix}__user__' if prefix else 'user__'
+    return Trim(Concat(f'{user}first_name', Value(' '), f'{user}last_name'))
+
+
+# Fields each resource exposes: name -> model field or expression
+TASK_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'task_type': 'task_type',
+    'difficulty': 'difficulty',
+    'status': 'status',
+    'created_at': 'created_at',
+    'due_date': 'due_date',
+    'completed_at': 'completed_at',
+    'patient_id': F('assigned_to_id'),
+    'patient_name': _full_name('assigned_to'),
+    'provider_id': F('assigned_by_id'),
+    'provider_name': _full_name('assigned_by'),
+}
+
+APPOINTMENT_FIELDS = {
+    'id': 'id',
+    'datetime': 'datetime',
+    'notes': 'notes',
+    'created_at': 'created_at',
+    'patient_id': 'patient_id',
+    'patient_name': _full_name('patient'),
+    'provider_id': 'provider_id',
+    'provider_name': _full_name('provider'),
+}
+
+NOTE_FIELDS = {
+    'id': 'id',
+    'note': 'note',
+    'created_at': 'created_at',
+    'patient_id': 'patient_id',
+    'patient_name': _full_name('patient'),
+    'provider_id': 'provider_id',
+    'provider_name': _full_name('provider'),
+    'caregiver_id': 'caregiver_id',
+    'caregiver_name': _full_name('caregiver'),
+}
+
+NOTIFICATION_FIELDS = {
+    'id': 'id',
+    'message': 'message',
+    'notification_type': 'notification_type',
+    'created_at': 'created_at',
+    'read_at': 'read_at',
+    'task_id': 'task_id',
+    'task_title': F('task__title'),
+}
+
+
+async def project(queryset, fields: Dict, names: List[str], cursor: Optional[str] = None, order_field: str = 'created_at',
+                  ascending: bool = False) -> Dict:
+    """
+    One page of a queryset as dicts of the named fields, newest first unless ascending
+
+    The id and order field are read as well for the cursor, and dropped again
+    unless they were asked for.
+    """
+    extra = [name for name in dict.fromkeys(('id', order_field)) if name not in names]
+    columns = [name for name in (*names, *extra) if fields[name] == name]
+    expressions = {name: fields[name] for name in (*names, *extra) if fields[name] != name}
+    page = await paginate_keyset(queryset.values(*columns, **expressions), cursor, order_field, ascending=ascending).afetch()
+
+    # The cursor is taken from the last row before its extra fields go
+    next_cursor = page.next_cursor
+    rows = page.items
+    if extra:
+        for row in rows:
+            for name in extra:
+                del row[name]
+    return {'items': rows, 'next_cursor': next_cursor}
+
+
+async def checklist_status(patient_ids: List[int]) -> Dict:
+    """Whether each patient's daily checklist has been submitted today"""
+    today = date.today()
+    submissions = {
+        row['patient_id']: row
+        async for row in DailyChecklistSubmission.objects.filter(patient_id__in=patient_ids, submission_date=today).values(
+            'patient_id', 'id', 'submitted_by_id', 'created_at'
+        )
+    }
+    patients = []
+    for patient_id in patient_ids:
+        submission = submissions.get(patient_id)
+        patients.append({
+            'patient_id': patient_id,
+            'submitted': submission is not None,
+            'submission_id': submission and submission['id'],
+            'submitted_by_id': submission and submission['submitted_by_id'],
+            'submitted_at': submission and submission['created_at'],
+        })
+    return {'date': today, 'patients': patients}
+
+
+class ReadAPIView(ConditionalGetMixin, BaseAPIView):
+    """
+    Base class for the read API views
+
+    Subclasses must define the coroutine get_data(request, identity); the
+    dict it returns is sent with success=True. Routed through dispatch (not a legacy function wrapper), so
+    a PermissionDenied or BadRequest raised anywhere becomes a JSON error.
+    """
+    http_method_names = ['get', 'head', 'options']
+    # Roles allowed to call the endpoint
+    roles = ('admin', 'provider', 'patient', 'caregiver')
+    # Whether the response includes the caller's inbox
+    shows_inbox = False
+
+    async def get(self, request):
+        identity = await aget_identity(request)
+        if not identity.has_role(*self.roles):
+            raise PermissionDenied
+
+        namespaces = await self.get_namespaces(identity)
+        if namespaces is not None and self.shows_inbox:
+            namespaces = [*namespaces, caching.inbox_namespace(identity.profile_id)]
+        etag = None
+        if namespaces is not None:
+            vary = self.get_vary()
+            etag, not_modified = await sync_to_async(self._check_etag)(request, *namespaces, vary=vary)
+            wait = self._get_wait(request)
+            if not_modified and wait:
+                etag, not_modified = await self._wait_for_change(request, namespaces, vary, etag, not_modified, wait)
+            if not_modified:
+                return not_modified
+
+        response = FastJsonResponse({'success': True, 'version': API_VERSION, **await self.get_data(request, identity)})
+        if etag is not None:
+            self._set_etag(response, etag)
+        return response
+
+    async def get_namespaces(self, identity) -> Optional[List[str]]:
+        """
+        The namespaces whose versions the response depends on
+
+        Writes to tasks, appointments and notes bump both the provider's and
+        the patient's namespace. Admins see everything, which no namespace
+        covers, so their responses get no ETag.
+        """
+        if identity.role == 'provider':
+            return [caching.provider_namespace(identity.profile_id)]
+        if identity.role in ('patient', 'caregiver'):
+            return [caching.patient_namespace(self._patient_id(identity))]
+        return None
+
+    def get_vary(self) -> tuple:
+        """Anything besides the namespaces that changes the response"""
+        return ()
+
+    def _patient_id(self, identity) -> Optional[int]:
+        """The patient a patient or caregiver sees"""
+        return identity.profile_id if identity.role == 'patient' else identity.patient_id
+
+    async def _provider_patient_ids(self, identity) -> List[int]:
+        if not hasattr(self, '_patient_ids'):
+            self._patient_ids = [
+                patient_id async for patient_id in
+                UserProfile.objects.filter(user_type='patient', provider_id=identity.profile_id).values_list('id', flat=True)
+            ]
+        return self._patient_ids
+
+    def _get_wait(self, request) -> int:
+        """Seconds a long-poll may be held, from ?wait=; always 0 under WSGI"""
+        wait = self._int_param(request, 'wait')
+        if not wait or not isinstance(request, ASGIRequest):
+            return 0
+        return max(0, min(wait, LONG_POLL_MAX_WAIT))
+
+    async def _wait_for_change(self, request, namespaces, vary, etag, not_modified, wait) -> Tuple:
+        """
+        Hold a long-poll until the response would change or the wait runs out
+
+        Returns the current ETag and the 304 to send, or None if the data
+        changed. A client that disconnects cancels the wait.
+        """
+        deadline = time.monotonic() + wait
+        while (remaining := deadline - time.monotonic()) > 0:
+            await asyncio.sleep(min(LONG_POLL_INTERVAL, remaining))
+            current = await sync_to_async(self._get_etag)(request, *namespaces, vary=vary)
+            if current != etag:
+                return current, None
+        return etag, not_modified
+
+    def _fields(self, request, fields: Dict) -> List[str]:
+        """The fields asked for with ?fields=, or all of them"""
+        requested = request.GET.get('fields')
+        if not requested:
+            return list(fields)
+        names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+        unknown = [name for name in names if name not in fields]
+        if unknown or not names:
+            raise BadRequest(f'Unknown fields: {", ".join(unknown)}; available: {", ".join(fields)}')
+        return names
+
+    def _int_param(self, request, name: str) -> Optional[int]:
+        value = request.GET.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise BadRequest(f'{name} must be an integer')
+
+
+class TaskListAPIView(ReadAPIView):
+    """Tasks the caller can see; ?status=pending|completed and ?patient=<id> filter them"""
+
+    async def get_data(self, request, identity):
+        tasks = Task.objects.visible_to(identity)
+        status = request.GET.get('status')
+        if status == 'pending':
+            tasks = tasks.pending()
+        elif status == 'completed':
+            tasks = tasks.completed()
+        elif status:
+            raise BadRequest('status must be pending or completed')
+        patient_id = self._int_param(request, 'patient')
+        if patient_id is not None:
+            tasks = tasks.filter(assigned_to_id=patient_id)
+
+        page = await project(tasks, TASK_FIELDS, self._fields(request, TASK_FIELDS), request.GET.get('after'))
+        return {'tasks': page['items'], 'next_cursor': page['next_cursor']}
+
+
+class AppointmentListAPIView(ReadAPIView):
+    """Upcoming appointments the caller can see, soonest first like the dashboards; ?patient=<id> filters them"""
+
+    async def get_data(self, request, identity):
+        appointments = Appointment.objects.visible_to(identity).upcoming()
+        patient_id = self._int_param(request, 'patient')
+        if patient_id is not None:
+            appointments = appointments.filter(patient_id=patient_id)
+
+        page = await project(
+            appointments, APPOINTMENT_FIELDS, self._fields(request, APPOINTMENT_FIELDS),
+            request.GET.get('after'), order_field='datetime', ascending=True,
+        )
+        return {'appointments': page['items'], 'next_cursor': page['next_cursor']}
+
+
+class NoteListAPIView(ReadAPIView):
+    """Notes the caller sent or received; ?patient=<id> filters them"""
+
+    async def get_data(self, request, identity):
+        notes = PatientNote.objects.visible_to(identity)
+        patient_id = self._int_param(request, 'patient')
+        if patient_id is not None:
+            notes = notes.filter(patient_id=patient_id)
+
+        page = await project(notes, NOTE_FIELDS, self._fields(request, NOTE_FIELDS), request.GET.get('after'))
+        return {'notes': page['items'], 'next_cursor': page['next_cursor']}
+
+
+class NotificationListAPIView(ReadAPIView):
+    """The caller's notifications with their unread count; ?unread=1 lists only unread ones"""
+    shows_inbox = True
+
+    async def get_namespaces(self, identity):
+        return []
+
+    async def get_data(self, request, identity):
+        notifications = NotificationService.get_inbox(identity.profile_id, unread_only=request.GET.get('unread') == '1')
+        page = await project(notifications, NOTIFICATION_FIELDS, self._fields(request, NOTIFICATION_FIELDS), request.GET.get('after'))
+        return {
+            'notifications': page['items'],
+            'next_cursor': page['next_cursor'],
+            'unread_count': await sync_to_async(NotificationService.get_unread_count)(identity.profile_id),
+        }
+
+
+class UnreadCountAPIView(NotificationListAPIView):
+    """The caller's unread notification count, for polling"""
+
+    async def get_data(self, request, identity):
+        return {'unread_count': await sync_to_async(NotificationService.get_unread_count)(identity.profile_id)}
+
+
+class ChecklistStatusAPIView(ReadAPIView):
+    """Today's daily checklist status of the caller's patients"""
+
+    async def get_namespaces(self, identity):
+        namespaces = await super().get_namespaces(identity)
+        if identity.role == 'provider':
+            # Submissions only bump the patient's namespace
+            namespaces += [caching.patient_namespace(patient_id) for patient_id in await self._provider_patient_ids(identity)]
+        return namespaces
+
+    def get_vary(self):
+        # A new day resets every status without any write
+        return (date.today(),)
+
+    async def get_data(self, request, identity):
+        if identity.role == 'provider':
+            patient_ids = await self._provider_patient_ids(identity)
+        elif identity.role in ('patient', 'caregiver') and self._patient_id(identity):
+            patient_ids = [self._patient_id(identity)]
+        else:
+            patient_ids = []
+        return {'checklist': await checklist_status(patient_ids)}
+
+
+class StatisticsAPIView(ReadAPIView):
+    """Task statistics for the caller: a provider's assigned tasks, a patient's tasks, or all tasks for admins"""
+
+    async def get_namespaces(self, identity):
+        if identity.role == 'admin':
+            return [caching.TASKS_NAMESPACE]
+        return await super().get_namespaces(identity)
+
+    async def get_data(self, request, identity):
+        if identity.role == 'provider':
+            statistics = await sync_to_async(TaskService.get_task_statistics)(provider_profile=identity.profile_id)
+        elif identity.role == 'admin':
+            statistics = await sync_to_async(TaskService.get_task_statistics)()
+        elif self._patient_id(identity):
+            statistics = await sync_to_async(TaskService.get_task_statistics)(patient_profile=self._patient_id(identity))
+        else:
+            raise PermissionDenied
+        return {'statistics': statistics}
+
+
+class ActivityAPIView(ChecklistStatusAPIView):
+    """
+    Daily activity over the last ?days= (default 30), from the pre-aggregated rollup
+
+    Providers get their patients' activity, or one patient's with ?patient=<id>;
+    patients and caregivers get the patient's; admins everyone's or ?patient=.
+    """
+
+    def get_vary(self):
+        # The window moves at midnight without any write
+        return (date.today(),)
+
+    async def get_data(self, request, identity):
+        days = self._int_param(request, 'days')
+        if days is None:
+            days = 30
+        if not 0 < days <= ACTIVITY_MAX_DAYS:
+            raise BadRequest(f'days must be between 1 and {ACTIVITY_MAX_DAYS}')
+
+        patient_id = self._int_param(request, 'patient')
+        provider_id = None
+        if identity.role == 'provider':
+            if patient_id is not None and patient_id not in await self._provider_patient_ids(identity):
+                raise PermissionDenied
+            provider_id = identity.profile_id
+        elif identity.role in ('patient', 'caregiver'):
+            patient_id = self._patient_id(identity)
+            if not patient_id:
+                raise PermissionDenied
+
+        daily = await sync_to_async(ActivityService.get_daily_trend)(patient_id, provider_id, days)
+        task_types = await sync_to_async(ActivityService.get_task_type_totals)(patient_id, provider_id, days)
+        return {'activity': {'days': days, 'patient_id': patient_id, 'daily': daily, 'task_types': task_types}}
+
+
+class ResultsAPIView(ReadAPIView):
+    """
+    Game results for one ?game= (and optional ?difficulty=), live and archived
+
+    Patients and caregivers get the patient's score trend, oldest first, as
+    do providers with ?patient=<id>; without it, providers get their patients
+    ranked by best accuracy.
+    """
+    roles = ('provider', 'patient', 'caregiver')
+
+    async def get_data(self, request, identity):
+        game = request.GET.get('game')
+        if game not in GAME_TYPES:
+            raise BadRequest(f'game must be one of {", ".join(GAME_TYPES)}')
+        difficulty = request.GET.get('difficulty') or None
+        if difficulty is not None and difficulty not in dict(DIFFICULTY_LEVELS):
+            raise BadRequest(f'difficulty must be one of {", ".join(dict(DIFFICULTY_LEVELS))}')
+        results = {'game': game, 'difficulty': difficulty}
+
+        if identity.role == 'provider':
+            patient_id = self._int_param(request, 'patient')
+            if patient_id is None:
+                results['leaderboard'] = await sync_to_async(ResultsService.get_leaderboard)(identity.profile_id, game, difficulty)
+                return {'results': results}
+            if patient_id not in await self._provider_patient_ids(identity):
+                raise PermissionDenied
+        else:
+            patient_id = self._patient_id(identity)
+            if not patient_id:
+                raise PermissionDenied
+
+        results['patient_id'] = patient_id
+        results['trend'] = [row async for row in ResultsService.get_score_trend(patient_id, game, difficulty)]
+        return {'results': results}
+
+
+class ProviderBootstrapAPIView(ChecklistStatusAPIView):
+    """Everything the provider dashboard shows, in one request"""
+    roles = ('provider',)
+    shows_inbox = True
+
+    async def get_data(self, request, identity):
+        patient_ids = await self._provider_patient_ids(identity)
+        provider_tasks = Task.objects.filter(assigned_by_id=identity.profile_id)
+        provider_appointments = Appointment.objects.filter(provider_id=identity.profile_id)
+        return {
+            'provider': {'id': identity.profile_id, 'name': request.user.get_full_name()},
+            'statistics': await sync_to_async(TaskService.get_task_statistics)(provider_profile=identity.profile_id),
+            'patients': [
+                patient async for patient in
+                UserProfile.objects.filter(id__in=patient_ids).values('id', name=_full_name()).order_by('user__last_name', 'user__first_name')
+            ],
+            'caregivers': [
+                caregiver async for caregiver in
+                UserProfile.objects.filter(user_type='caregiver', patient_id__in=patient_ids).values('id', 'patient_id', name=_full_name())
+            ],
+            'recent_tasks': await project(provider_tasks, TASK_FIELDS, ['id', 'title', 'task_type', 'status', 'due_date', 'patient_id']),
+            'pending_tasks': await project(provider_tasks.pending(), TASK_FIELDS, ['id', 'title', 'task_type', 'difficulty', 'due_date', 'patient_id']),
+            'appointments': await project(
+                provider_appointments.upcoming(), APPOINTMENT_FIELDS, ['id', 'datetime', 'notes', 'patient_id'],
+                order_field='datetime', ascending=True,
+            ),
+            'checklist': await checklist_status(patient_ids),
+            'unread_notifications': await sync_to_async(NotificationService.get_unread_count)(identity.profile_id),
+        }
+
+
+class PatientBootstrapAPIView(ChecklistStatusAPIView):
+    """Everything the patient dashboard shows, in one request"""
+    roles = ('patient',)
+    shows_inbox = True
+
+    async def get_data(self, request, identity):
+        patient_tasks = Task.objects.filter(assigned_to_id=identity.profile_id)
+        return {
+            'patient': {'id': identity.profile_id, 'name': request.user.get_full_name()},
+            'statistics': await sync_to_async(TaskService.get_task_statistics)(patient_profile=identity.profile_id),
+            'pending_tasks': await project(patient_tasks.pending(), TASK_FIELDS, ['id', 'title', 'task_type', 'difficulty', 'status', 'due_date']),
+            'appointments': await project(
+                Appointment.objects.filter(patient_id=identity.profile_id).upcoming(), APPOINTMENT_FIELDS,
+                ['id', 'datetime', 'notes', 'provider_name'], order_field='datetime', ascending=True,
+            ),
+            'checklist': await checklist_status([identity.profile_id]),
+            'unread_notifications': await sync_to_async(NotificationService.get_unread_count)(identity.profile_id),
+        }
+
+
+class CaregiverBootstrapAPIView(ChecklistStatusAPIView):
+    """Everything the caregiver dashboard shows, in one request"""
+    roles = ('caregiver',)
+
+    async def get_data(self, request, identity):
+        if not identity.patient_id:
+            return {'caregiver': {'id': identity.profile_id, 'name': request.user.get_full_name()}, 'patient': None}
+
+        tasks = Task.objects.visible_to(identity)
+        task_fields = ['id', 'title', 'task_type', 'difficulty', 'status', 'due_date', 'completed_at']
+        return {
+            'caregiver': {'id': identity.profile_id, 'name': request.user.get_full_name()},
+            'patient': await UserProfile.objects.filter(id=identity.patient_id).values('id', name=_full_name()).afirst(),
+            'statistics': await sync_to_async(TaskService.get_task_statistics)(patient_profile=identity.patient_id),
+            'pending_tasks': await project(tasks.pending(), TASK_FIELDS, task_fields),
+            'completed_tasks': await project(tasks.completed(), TASK_FIELDS, task_fields),
+            'appointments': await project(
+                Appointment.objects.filter(patient_id=identity.patient_id).upcoming(), APPOINTMENT_FIELDS,
+                ['id', 'datetime', 'notes', 'provider_name'], order_field='datetime', ascending=True,
+            ),
+            'notes': await project(PatientNote.objects.visible_to(identity), NOTE_FIELDS, ['id', 'note', 'created_at', 'provider_name']),
+            'checklist': await checklist_status([identity.patient_id]),
+        }
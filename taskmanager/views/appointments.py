@@ -5,9 +5,10 @@ from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from ..mixins import ProviderRequiredMixin, PatientRequiredMixin
-from ..views.base import BaseAPIView
+from ..views.base import BaseAPIView, ConditionalGetMixin
 from ..services.appointment_service import AppointmentService
 from ..models import Appointment
+from .. import caching
 from users.models import UserProfile
 import logging
 
@@ -27,7 +28,7 @@ class CreateAppointmentView(ProviderRequiredMixin, BaseAPIView):
             logger.info(f"Successfully found patient: {patient_profile.user.username}")
             
             # Verify provider manages this patient, or patient has no provider
-            if patient_profile.provider and patient_profile.provider != request.user.profile:
+            if patient_profile.provider_id and patient_profile.provider_id != request.identity.profile_id:
                 logger.error(f"Permission denied: Patient is assigned to another provider.")
                 return self._error_response('Permission denied - not your patient', 403)
             
@@ -73,11 +74,8 @@ class DeleteAppointmentView(ProviderRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request, appointment_id):
         try:
-            appointment = Appointment.objects.get(id=appointment_id)
-            
-            # Verify the provider owns this appointment
-            if appointment.provider != request.user.profile:
-                return self._error_response('Permission denied - not your appointment', 403)
+            # Providers can delete their own appointments
+            appointment = Appointment.objects.visible_to(request.identity.restricted_to('provider')).get(id=appointment_id)
             
             # Use service to delete appointment
             if AppointmentService.delete_appointment(appointment):
@@ -91,13 +89,23 @@ class DeleteAppointmentView(ProviderRequiredMixin, BaseAPIView):
             return self._error_response(f'Error deleting appointment: {str(e)}', 500)
 
 
-class PatientAppointmentsView(PatientRequiredMixin, View):
+class PatientAppointmentsView(ConditionalGetMixin, PatientRequiredMixin, View):
     """View for patients to see their appointments"""
     
     def get(self, request):
-        appointments = AppointmentService.get_patient_appointments(request.user.profile)
+        if not request.identity.has_role('patient'):
+            messages.error(request, 'You do not have permission to access this page.')
+            return redirect('home')
+        
+        # Same namespace as the cached appointment list
+        etag = self._get_etag(request, caching.patient_namespace(request.identity.profile_id))
+        not_modified = self._not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
+        appointments = AppointmentService.get_patient_appointments(request.identity.profile_id)
         
-        return render(request, 'appointments/patient_appointments.html', {
+        return self._set_etag(render(request, 'appointments/patient_appointments.html', {
             'appointments': appointments,
             'user_type': 'Patient'
-        }) 
\ No newline at end of file
+        }), etag)
\ No newline at end of file
@@ -1,8 +1,16 @@
+from typing import Iterable, Optional, Tuple
 from django.views.generic import View
-from django.http import JsonResponse
-from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.core.exceptions import BadRequest, PermissionDenied, ObjectDoesNotExist
 from django.shortcuts import redirect
+from django.template.loader import render_to_string
 from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from ..pagination import paginate_keyset
+from .. import caching
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,15 +20,29 @@ class BaseAPIView(View):
     """Base class for API views with consistent error handling"""
     
     def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
         try:
             return super().dispatch(request, *args, **kwargs)
-        except PermissionDenied:
+        except Exception as e:
+            return self._exception_response(e)
+    
+    async def _adispatch(self, request, *args, **kwargs):
+        # Async handlers raise when awaited, not when called
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Exception as e:
+            return self._exception_response(e)
+    
+    def _exception_response(self, e: Exception) -> JsonResponse:
+        if isinstance(e, PermissionDenied):
             return self._error_response('Permission denied', 403)
-        except ObjectDoesNotExist as e:
+        if isinstance(e, BadRequest):
+            return self._error_response(str(e), 400)
+        if isinstance(e, ObjectDoesNotExist):
             return self._error_response(f'Object not found: {str(e)}', 404)
-        except Exception as e:
-            logger.exception(f'Unexpected error in {self.__class__.__name__}')
-            return self._error_response('Internal server error', 500)
+        logger.exception(f'Unexpected error in {self.__class__.__name__}')
+        return self._error_response('Internal server error', 500)
     
     def _error_response(self, message: str, status: int = 400) -> JsonResponse:
         return JsonResponse({'success': False, 'message': message}, status=status)
@@ -41,6 +63,9 @@ class BaseView(View):
         except PermissionDenied:
             messages.error(request, 'You do not have permission to access this page.')
             return redirect('home')
+        except BadRequest as e:
+            messages.error(request, str(e))
+            return redirect('home')
         except ObjectDoesNotExist as e:
             messages.error(request, f'Object not found: {str(e)}')
             return redirect('home')
@@ -50,6 +75,80 @@ class BaseView(View):
             return redirect('home')
 
 
+class KeysetPaginationMixin:
+    """
+    Mixin for views with newest-first lists paged by keyset
+
+    A page request names its list and the cursor to continue from,
+    ?list=<name>&after=<cursor>; the other lists on the page start over.
+    AJAX requests get just the next rows, for the "Load more" buttons.
+    """
+
+    def _get_page(self, request, queryset, list_name: str, order_field: str = 'created_at'):
+        cursor = request.GET.get('after') if request.GET.get('list') == list_name else None
+        return paginate_keyset(queryset, cursor, order_field)
+
+    def _is_load_more(self, request) -> bool:
+        return request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+    def _load_more_response(self, request, template_name: str, page, **context) -> JsonResponse:
+        html = render_to_string(template_name, {'page': page, **context}, request=request)
+        return JsonResponse({'success': True, 'html': html, 'next_cursor': page.next_cursor})
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for list views that answer a repeat GET with 304 Not Modified
+
+    The ETag is built from the data versions of the namespaces a response
+    shows (see caching.py) and from who is asking for which page, so it
+    costs one cache read and no queries. A client sending it back in
+    If-None-Match gets a 304 before any rows are loaded or templates rendered.
+    """
+
+    def _get_etag(self, request, *namespaces: str, vary: Iterable = ()) -> str:
+        """The ETag of a response showing the namespaces, and anything else in vary"""
+        identity = request.identity
+        parts = [
+            caching.make_key('etag', *namespaces),
+            identity.role,
+            identity.profile_id,
+            request.get_full_path(),
+            # load-more requests get JSON from the same URL
+            request.headers.get('x-requested-with', ''),
+            # pages embed a CSRF token, which a new CSRF cookie invalidates
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            *vary,
+        ]
+        return quote_etag(hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+    def _not_modified(self, request, etag: str) -> Optional[HttpResponse]:
+        """A 304 response if the client's copy is current, otherwise None"""
+        # A pending flash message has to be shown, so send the page
+        if len(messages.get_messages(request)):
+            return None
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            self._set_etag(response, etag)
+        return response
+
+    def _check_etag(self, request, *namespaces: str, vary: Iterable = ()) -> Tuple[str, Optional[HttpResponse]]:
+        """
+        _get_etag and _not_modified in one call
+
+        They read the cache and the session, so async views run this in a
+        worker thread: await sync_to_async(self._check_etag)(request, ...).
+        """
+        etag = self._get_etag(request, *namespaces, vary=vary)
+        return etag, self._not_modified(request, etag)
+
+    def _set_etag(self, response: HttpResponse, etag: str) -> HttpResponse:
+        response.headers['ETag'] = etag
+        # Per user, and checked with the server on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
 class BaseTaskView(BaseView):
     """Base class for task-related views with common task operations"""
     
@@ -59,23 +158,23 @@ class BaseTaskView(BaseView):
         type_dict = dict(TASK_TYPES)
         return type_dict.get(task_type, task_type.replace('_', ' ').title())
     
-    def _validate_task_access(self, task, user_profile):
-        """Validate user has access to this task"""
-        if user_profile.user_type == 'patient':
-            return task.assigned_to == user_profile
-        elif user_profile.user_type == 'caregiver':
-            is_assigned_to_patient = user_profile.patient == task.assigned_to
-            works_for_assigning_provider = user_profile.provider == task.assigned_by
+    def _validate_task_access(self, task, identity):
+        """Validate the request's identity has access to this task"""
+        if identity.role == 'patient':
+            return task.assigned_to_id == identity.profile_id
+        elif identity.role == 'caregiver':
+            is_assigned_to_patient = identity.patient_id == task.assigned_to_id
+            works_for_assigning_provider = identity.provider_id == task.assigned_by_id
             return is_assigned_to_patient and works_for_assigning_provider
-        elif user_profile.user_type == 'provider':
-            return task.assigned_by == user_profile
+        elif identity.role == 'provider':
+            return task.assigned_by_id == identity.profile_id
         return False
     
-    def _get_redirect_url(self, user_profile):
+    def _get_redirect_url(self, identity):
         """Get appropriate redirect URL based on user type"""
-        if user_profile.user_type == 'caregiver':
+        if identity.role == 'caregiver':
             return 'caregiver_dashboard'
-        elif user_profile.user_type == 'provider':
+        elif identity.role == 'provider':
             return 'provider_dashboard'
         else:  # Default to patient
             return 'patient_dashboard' 
\ No newline at end of file
@@ -4,9 +4,13 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
+from django.db import transaction
 from ..mixins import PatientOrCaregiverRequiredMixin, ProviderRequiredMixin
-from ..views.base import BaseAPIView
+from ..views.base import BaseAPIView, ConditionalGetMixin, KeysetPaginationMixin
 from ..models import DailyChecklistSubmission
+from ..services.activity_service import ActivityService
+from ..services.completion_feed_service import CompletionFeedService
+from .. import caching
 from users.models import UserProfile
 import logging
 
@@ -17,24 +21,26 @@ class DailyChecklistSubmitView(PatientOrCaregiverRequiredMixin, View):
     """Submit the daily checklist - can be done by patient or caregiver"""
     
     def get(self, request):
-        user_profile = request.user.profile
+        # The identity loads and caches the profile, so check it first
+        identity = request.identity
         
         # Determine the patient
-        if user_profile.user_type == 'patient':
-            patient = user_profile
-        elif user_profile.user_type == 'caregiver':
-            if not user_profile.patient:
+        if identity.role == 'patient':
+            patient = request.user.profile
+        elif identity.role == 'caregiver':
+            if not identity.patient_id:
                 messages.error(request, 'You are not assigned to any patient.')
                 return redirect('caregiver_dashboard')
-            patient = user_profile.patient
+            patient = request.user.profile.patient
         else:
             messages.error(request, 'Only patients and caregivers can submit the daily checklist.')
             return redirect('home')
+        user_profile = request.user.profile
         
         # Check if already submitted today
         if not DailyChecklistSubmission.can_submit_today(patient):
             messages.info(request, 'The daily checklist has already been submitted today.')
-            if user_profile.user_type == 'patient':
+            if identity.role == 'patient':
                 return redirect('patient_dashboard')
             else:
                 return redirect('caregiver_dashboard')
@@ -46,24 +52,26 @@ class DailyChecklistSubmitView(PatientOrCaregiverRequiredMixin, View):
         return render(request, 'tasks/non-games/checklists/daily_checklist.html', context)
     
     def post(self, request):
-        user_profile = request.user.profile
+        # The identity loads and caches the profile, so check it first
+        identity = request.identity
         
         # Determine the patient
-        if user_profile.user_type == 'patient':
-            patient = user_profile
-        elif user_profile.user_type == 'caregiver':
-            if not user_profile.patient:
+        if identity.role == 'patient':
+            patient = request.user.profile
+        elif identity.role == 'caregiver':
+            if not identity.patient_id:
                 messages.error(request, 'You are not assigned to any patient.')
                 return redirect('caregiver_dashboard')
-            patient = user_profile.patient
+            patient = request.user.profile.patient
         else:
             messages.error(request, 'Only patients and caregivers can submit the daily checklist.')
             return redirect('home')
+        user_profile = request.user.profile
         
         # Check if already submitted today
         if not DailyChecklistSubmission.can_submit_today(patient):
             messages.info(request, 'The daily checklist has already been submitted today.')
-            if user_profile.user_type == 'patient':
+            if identity.role == 'patient':
                 return redirect('patient_dashboard')
             else:
                 return redirect('caregiver_dashboard')
@@ -79,40 +87,47 @@ class DailyChecklistSubmitView(PatientOrCaregiverRequiredMixin, View):
         responses['mood'] = request.POST.get('mood', '')
         responses['memory_entry'] = request.POST.get('memory_entry', '')
         
-        # Create the submission
-        DailyChecklistSubmission.objects.create(
-            patient=patient,
-            submitted_by=user_profile,
-            responses=responses
-        )
+        # Create the submission and count it in the activity rollup
+        with transaction.atomic():
+            submission = DailyChecklistSubmission.objects.create(
+                patient=patient,
+                submitted_by=user_profile,
+                provider_id=patient.provider_id,
+                responses=responses
+            )
+            ActivityService.record_checklist_submitted(submission)
+            CompletionFeedService.record_checklist_submitted(submission, submission.provider_id)
+            DailyChecklistSubmission.invalidate_patients(patient.id)
         
         messages.success(request, 'Daily checklist submitted successfully!')
         
         # Redirect based on user type
-        if user_profile.user_type == 'patient':
+        if identity.role == 'patient':
             return redirect('patient_dashboard')
         else:
             return redirect('caregiver_dashboard')
 
 
-class DailyChecklistResultsView(PatientOrCaregiverRequiredMixin, View):
-    """View daily checklist results - for providers and caregivers"""
+class DailyChecklistResultsView(ConditionalGetMixin, KeysetPaginationMixin, PatientOrCaregiverRequiredMixin, View):
+    """View daily checklist results a page at a time - for providers and caregivers"""
     
     def get(self, request, patient_id=None):
-        user_profile = request.user.profile
+        # The identity loads and caches the profile, so check it first
+        identity = request.identity
+        user_profile = request.user.profile if identity.has_profile else None
         
         # Determine the patient
         if patient_id:
             try:
-                patient = UserProfile.objects.get(id=patient_id, user_type='patient')
+                patient = UserProfile.objects.select_related('user').get(id=patient_id, user_type='patient')
             except UserProfile.DoesNotExist:
                 messages.error(request, 'Patient not found.')
                 return redirect('home')
         else:
-            if user_profile.user_type == 'patient':
+            if identity.role == 'patient':
                 patient = user_profile
-            elif user_profile.user_type == 'caregiver':
-                if not user_profile.patient:
+            elif identity.role == 'caregiver':
+                if not identity.patient_id:
                     messages.error(request, 'You are not assigned to any patient.')
                     return redirect('caregiver_dashboard')
                 patient = user_profile.patient
@@ -121,28 +136,47 @@ class DailyChecklistResultsView(PatientOrCaregiverRequiredMixin, View):
                 return redirect('provider_dashboard')
         
         # Check permissions
-        if user_profile.user_type == 'provider':
-            if patient.provider != user_profile:
+        if identity.role == 'provider':
+            if not identity.manages(patient):
                 messages.error(request, 'You do not have permission to view this patient\'s results.')
                 return redirect('provider_dashboard')
-        elif user_profile.user_type == 'caregiver':
-            if user_profile.patient != patient:
+        elif identity.role == 'caregiver':
+            if identity.patient_id != patient.id:
                 messages.error(request, 'You do not have permission to view this patient\'s results.')
                 return redirect('caregiver_dashboard')
-        elif user_profile.user_type == 'patient':
-            if user_profile != patient:
+        elif identity.role == 'patient':
+            if identity.profile_id != patient.id:
                 messages.error(request, 'You can only view your own results.')
                 return redirect('patient_dashboard')
+        elif not identity.has_profile:
+            messages.error(request, 'You do not have permission to view this patient\'s results.')
+            return redirect('home')
+        
+        # Submissions, resets and renames bump the patient's namespace
+        etag = self._get_etag(request, caching.patient_namespace(patient.id))
+        not_modified = self._not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
+        # Get a page of submissions (most recent first)
+        submissions = self._get_page(
+            request,
+            DailyChecklistSubmission.objects.filter(patient=patient).select_related('submitted_by__user'),
+            'submissions',
+            order_field='submission_date',
+        )
         
-        # Get submissions (most recent first)
-        submissions = DailyChecklistSubmission.objects.filter(patient=patient).order_by('-submission_date')
+        if self._is_load_more(request):
+            return self._set_etag(self._load_more_response(
+                request, 'tasks/non-games/checklists/_checklist_submissions.html', submissions
+            ), etag)
         
         context = {
             'patient': patient,
             'submissions': submissions,
             'user_profile': user_profile
         }
-        return render(request, 'tasks/non-games/checklists/daily_checklist_results.html', context)
+        return self._set_etag(render(request, 'tasks/non-games/checklists/daily_checklist_results.html', context), etag)
 
 
 class ResetDailyChecklistPatientView(ProviderRequiredMixin, BaseAPIView):
@@ -151,12 +185,17 @@ class ResetDailyChecklistPatientView(ProviderRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request, patient_id):
         try:
-            patient = UserProfile.objects.get(id=patient_id, user_type='patient')
-            if patient.provider != request.user.profile:
-                return self._error_response('Access denied', 403)
+            # Providers can reset their own patients
+            patient = UserProfile.objects.visible_to(request.identity.restricted_to('provider')).select_related('user').get(
+                id=patient_id, user_type='patient'
+            )
             
             # Delete all daily checklist submissions for this patient
-            DailyChecklistSubmission.objects.filter(patient=patient).delete()
+            submissions = DailyChecklistSubmission.objects.filter(patient=patient)
+            with transaction.atomic():
+                ActivityService.remove_checklists(submissions)
+                submissions.delete()
+                DailyChecklistSubmission.invalidate_patients(patient.id)
             
             return self._success_response(message=f'Daily checklist reset for {patient.user.get_full_name()}')
             
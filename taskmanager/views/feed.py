@@ -0,0 +1,137 @@
+from datetime import timedelta
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from ..views.base import BaseAPIView
+from ..identity import aget_identity
+from ..serialization import dumps
+from ..services.completion_feed_service import CompletionFeedService
+from .. import feed
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Feed stream settings
+FEED_HEARTBEAT_INTERVAL = 15  # seconds of quiet before a keep-alive comment
+FEED_MAX_AGE = 3600  # seconds a stream stays open before the client is sent to reconnect
+FEED_REPLAY_LIMIT = 100  # missed events replayed on reconnect; beyond that the page reloads
+FEED_RETRY = 3000  # ms before the browser reconnects a dropped stream
+FEED_WSGI_RETRY = 15000  # ms between the short responses served under WSGI
+
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Don't let a proxy buffer the stream
+    'X-Accel-Buffering': 'no',
+}
+
+
+def _event_frame(event: Dict, cursor: Optional[int] = None) -> bytes:
+    # The id is where the client resumes from, so an event that committed late keeps the higher one sent before it
+    return b'id: %d\nevent: completion\ndata: %s\n\n' % (event['id'] if cursor is None else cursor, dumps(event))
+
+
+def _cursor_frame(event_id: int) -> bytes:
+    # An id with no data moves the browser's Last-Event-ID without firing an event
+    return b'id: %d\n\n' % event_id
+
+
+class CompletionFeedView(BaseAPIView):
+    """
+    Server-sent events stream of task and checklist completions, for providers and caregivers
+
+    Each completion arrives as an "event: completion" whose data is the event
+    as JSON. Event ids are the highest CompletionEvent id sent so far, so when
+    EventSource reconnects with Last-Event-ID it gets the events it missed, and
+    a "reset" event if it missed too many to replay. Under ASGI the stream
+    stays open, with a keep-alive comment every FEED_HEARTBEAT_INTERVAL
+    seconds, and also carries events the hub finds committed late below that
+    id. Under WSGI it sends what is new and closes, and the browser comes back
+    after FEED_WSGI_RETRY ms, so a listener never holds a sync worker; it only
+    sends events older than FEED_GAP_TIMEOUT, so the id it leaves the browser
+    with never passes one that may still commit.
+    """
+    http_method_names = ['get']
+
+    async def get(self, request):
+        identity = await aget_identity(request)
+        if not identity.has_role('provider', 'caregiver'):
+            raise PermissionDenied
+        last_event_id = self._last_event_id(request)
+
+        if not isinstance(request, ASGIRequest):
+            settled = timezone.now() - timedelta(seconds=feed.FEED_GAP_TIMEOUT)
+            if last_event_id is None:
+                body = _cursor_frame(await CompletionFeedService.alatest_event_id(created_before=settled))
+            else:
+                body, _, _ = await self._replay(identity, last_event_id, created_before=settled)
+            return HttpResponse(
+                b'retry: %d\n\n' % FEED_WSGI_RETRY + body, content_type='text/event-stream', headers=STREAM_HEADERS
+            )
+        return StreamingHttpResponse(
+            self._stream(identity, last_event_id), content_type='text/event-stream', headers=STREAM_HEADERS
+        )
+
+    async def _stream(self, identity, last_event_id: Optional[int]) -> AsyncIterator[bytes]:
+        hub = feed.get_hub()
+        listener = feed.Listener(identity)
+        # Subscribed before replaying, so nothing committed meanwhile falls between the two
+        start = await hub.subscribe(listener)
+        try:
+            yield b'retry: %d\n\n' % FEED_RETRY
+            if last_event_id is None:
+                # Starting from now: anything at or below start came before
+                floor = last_sent = start
+                replayed = set()
+                yield _cursor_frame(last_sent)
+            else:
+                body, last_sent, replayed = await self._replay(identity, last_event_id)
+                if body:
+                    yield body
+                # The client has everything up to where it left off, or up to the reset
+                floor = last_event_id if replayed else last_sent
+                # Events the hub read before this subscribed are in the replay
+                last_sent = max(last_sent, start)
+
+            deadline = time.monotonic() + FEED_MAX_AGE
+            while not listener.overflowed and time.monotonic() < deadline:
+                try:
+                    event = await asyncio.wait_for(listener.queue.get(), FEED_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b': keep-alive\n\n'
+                    continue
+                # The hub hands out each event once; only the replay can have sent it already
+                if event['id'] <= floor or event['id'] in replayed:
+                    continue
+                last_sent = max(last_sent, event['id'])
+                yield _event_frame(event, last_sent)
+        finally:
+            hub.unsubscribe(listener)
+
+    async def _replay(self, identity, last_event_id: int, created_before=None) -> Tuple[bytes, int, Set[int]]:
+        """
+        Frames of the events after last_event_id, or a reset if there are too many
+
+        Returns:
+            tuple: (frames, id of the last event the client has been sent, ids of the events replayed)
+        """
+        events = await CompletionFeedService.aget_events(identity, last_event_id, FEED_REPLAY_LIMIT + 1, created_before)
+        if len(events) > FEED_REPLAY_LIMIT:
+            latest_id = await CompletionFeedService.alatest_event_id(created_before)
+            return b'id: %d\nevent: reset\ndata: {}\n\n' % latest_id, latest_id, set()
+        if not events:
+            return b'', last_event_id, set()
+        return b''.join(_event_frame(event) for event in events), events[-1]['id'], {event['id'] for event in events}
+
+    def _last_event_id(self, request) -> Optional[int]:
+        """Where the client left off: EventSource's Last-Event-ID, or ?last_event_id= on the first connect"""
+        value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise BadRequest('Last-Event-ID must be an integer')
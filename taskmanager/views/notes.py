@@ -1,11 +1,16 @@
+from asgiref.sync import sync_to_async
 from django.views.generic import View
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import BadRequest
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from ..mixins import ProviderRequiredMixin
-from ..views.base import BaseAPIView
+from ..views.base import BaseAPIView, ConditionalGetMixin
 from ..models import PatientNote
+from ..identity import aget_identity
+from ..pagination import paginate_keyset
+from .. import caching
 from users.models import UserProfile
 import logging
 
@@ -19,7 +24,7 @@ class CreatePatientNoteView(ProviderRequiredMixin, BaseAPIView):
     def post(self, request, patient_id):
         try:
             patient = UserProfile.objects.get(id=patient_id, user_type='patient')
-            if patient.provider != request.user.profile:
+            if not request.identity.manages(patient):
                 return self._error_response('You do not have permission to create notes for this patient', 403)
             
             caregiver_id = request.POST.get('caregiver_id')
@@ -29,7 +34,7 @@ class CreatePatientNoteView(ProviderRequiredMixin, BaseAPIView):
                 return self._error_response('Caregiver and note content are required', 400)
             
             caregiver = UserProfile.objects.get(id=caregiver_id, user_type='caregiver')
-            if caregiver.patient != patient:
+            if caregiver.patient_id != patient.id:
                 return self._error_response('This caregiver is not assigned to this patient', 400)
             
             PatientNote.objects.create(
@@ -38,6 +43,7 @@ class CreatePatientNoteView(ProviderRequiredMixin, BaseAPIView):
                 caregiver=caregiver,
                 note=note_content
             )
+            caching.bump(caching.provider_namespace(request.identity.profile_id), caching.patient_namespace(patient.id))
             
             return self._success_response(message='Note sent successfully')
             
@@ -47,31 +53,28 @@ class CreatePatientNoteView(ProviderRequiredMixin, BaseAPIView):
             return self._error_response(f'Error creating note: {str(e)}', 500)
 
 
-class GetPatientNotesView(ProviderRequiredMixin, BaseAPIView):
-    """Get notes for a specific patient (for providers and caregivers)"""
+class GetPatientNotesView(ConditionalGetMixin, ProviderRequiredMixin, BaseAPIView):
+    """Get a page of notes for a specific patient (for providers and caregivers), newest first - async, for polling"""
     
-    def get(self, request, patient_id):
+    async def get(self, request, patient_id):
         try:
-            patient = UserProfile.objects.get(id=patient_id, user_type='patient')
-            caregiver_id = request.GET.get('caregiver_id')
-            
-            # Check permissions
-            if request.user.profile.user_type == 'provider':
-                if patient.provider != request.user.profile:
-                    return self._error_response('Permission denied', 403)
-            elif request.user.profile.user_type == 'caregiver':
-                if request.user.profile.patient != patient:
-                    return self._error_response('Permission denied', 403)
-            else:
+            identity = await aget_identity(request)
+            if not identity.has_role('provider', 'caregiver'):
                 return self._error_response('Permission denied', 403)
             
-            # Get notes
+            # Note writes bump the patient's namespace
+            etag, not_modified = await sync_to_async(self._check_etag)(request, caching.patient_namespace(patient_id))
+            if not_modified:
+                return not_modified
+            
+            # Providers see the notes they sent, caregivers the ones sent to them
+            notes = PatientNote.objects.visible_to(identity).filter(patient_id=patient_id)
+            caregiver_id = request.GET.get('caregiver_id')
             if caregiver_id:
-                notes = PatientNote.objects.filter(patient=patient, caregiver_id=caregiver_id)
-            elif request.user.profile.user_type == 'provider':
-                notes = PatientNote.objects.filter(patient=patient, provider=request.user.profile)
-            else:  # caregiver
-                notes = PatientNote.objects.filter(patient=patient, caregiver=request.user.profile)
+                notes = notes.filter(caregiver_id=caregiver_id)
+            
+            # ?after=<next_cursor> continues from the previous page
+            notes = await paginate_keyset(notes.select_related('provider__user', 'caregiver__user'), request.GET.get('after')).afetch()
             
             notes_data = []
             for note in notes:
@@ -83,10 +86,12 @@ class GetPatientNotesView(ProviderRequiredMixin, BaseAPIView):
                     'caregiver_name': note.caregiver.user.get_full_name()
                 })
             
-            return self._success_response(data={'notes': notes_data})
+            return self._set_etag(
+                self._success_response(data={'notes': notes_data, 'next_cursor': notes.next_cursor}), etag
+            )
             
-        except UserProfile.DoesNotExist:
-            return self._error_response('Patient not found', 404)
+        except BadRequest as e:
+            return self._error_response(str(e), 400)
         except Exception as e:
             return self._error_response(f'Error retrieving notes: {str(e)}', 500)
 
@@ -97,11 +102,11 @@ class DeletePatientNoteView(ProviderRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request, note_id):
         try:
-            note = PatientNote.objects.get(id=note_id)
-            if note.provider != request.user.profile:
-                return self._error_response('You do not have permission to delete this note', 403)
+            # Providers can delete the notes they sent
+            note = PatientNote.objects.visible_to(request.identity.restricted_to('provider')).get(id=note_id)
             
             note.delete()
+            caching.bump(caching.provider_namespace(note.provider_id), caching.patient_namespace(note.patient_id))
             return self._success_response(message='Note deleted successfully')
             
         except PatientNote.DoesNotExist:
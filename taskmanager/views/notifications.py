@@ -0,0 +1,34 @@
+from django.core.exceptions import BadRequest
+from ..views.base import BaseAPIView
+from ..services.notification_service import NotificationService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MarkNotificationsReadView(BaseAPIView):
+    """Mark the caller's notifications read - those posted as ids, or all of them"""
+    http_method_names = ['post']
+
+    def post(self, request):
+        try:
+            if not request.identity.has_profile:
+                return self._error_response('Permission denied', 403)
+
+            ids = request.POST.getlist('ids')
+            try:
+                notification_ids = [int(notification_id) for notification_id in ids] if ids else None
+            except ValueError:
+                raise BadRequest('ids must be integers')
+
+            # Only the caller's own notifications match
+            marked = NotificationService.mark_read(request.identity.profile_id, notification_ids)
+            return self._success_response(data={
+                'marked': marked,
+                'unread_count': NotificationService.get_unread_count(request.identity.profile_id),
+            }, message=f'Marked {marked} notifications read')
+
+        except BadRequest as e:
+            return self._error_response(str(e), 400)
+        except Exception as e:
+            return self._error_response(f'Error marking notifications read: {str(e)}', 500)
@@ -1,5 +1,5 @@
 from django.views.generic import View, ListView
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.utils import timezone
@@ -7,10 +7,13 @@ from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from ..mixins import ProviderRequiredMixin, PatientOrCaregiverRequiredMixin, AdminRequiredMixin
-from ..views.base import BaseAPIView, BaseTaskView
+from ..views.base import BaseAPIView, BaseTaskView, ConditionalGetMixin, KeysetPaginationMixin
 from ..services.task_service import TaskService
+from ..services.job_service import JobService
+from ..services.archive_service import ArchiveService
 from ..models import Task, TaskResponse, QuestionnaireTemplate
 from ..constants import TASK_TYPES, DIFFICULTY_LEVELS, TASK_TEMPLATES, DIFFICULTY_CONFIGS
+from .. import caching
 from users.models import UserProfile
 import json
 import logging
@@ -41,7 +44,7 @@ class AssignTaskView(ProviderRequiredMixin, BaseAPIView):
             # Validate patient and permissions
             try:
                 patient_profile = UserProfile.objects.get(id=patient_id, user_type='patient')
-                if patient_profile.provider != request.user.profile:
+                if not request.identity.manages(patient_profile):
                     return self._error_response('You do not have permission to assign tasks to this patient.', 403)
             except UserProfile.DoesNotExist:
                 return self._error_response('Patient not found.', 404)
@@ -77,7 +80,7 @@ class AssignTaskView(ProviderRequiredMixin, BaseAPIView):
             patient_profile = UserProfile.objects.get(id=patient_id, user_type='patient')
             
             # Verify provider manages this patient
-            if patient_profile.provider != request.user.profile:
+            if not request.identity.manages(patient_profile):
                 messages.error(request, 'You do not have permission to assign tasks to this patient.')
                 return redirect('provider_dashboard')
             
@@ -129,7 +132,7 @@ class AssignTaskView(ProviderRequiredMixin, BaseAPIView):
             patient_profile = UserProfile.objects.get(id=patient_id, user_type='patient')
             
             # Verify provider manages this patient
-            if patient_profile.provider != request.user.profile:
+            if not request.identity.manages(patient_profile):
                 messages.error(request, 'You do not have permission to assign tasks to this patient.')
                 return redirect('provider_dashboard')
             
@@ -165,18 +168,22 @@ class AssignMultipleTasksView(ProviderRequiredMixin, BaseAPIView):
         try:
             data = json.loads(request.body)
             patient_id = data.get('patient_id')
+            patient_ids = data.get('patient_ids')
             tasks = data.get('tasks', [])
             
-            if not patient_id:
+            if not patient_id and not patient_ids:
                 return self._error_response('Patient ID is required', 400)
             
             if not tasks:
                 return self._error_response('No tasks provided', 400)
             
+            if patient_ids:
+                return self._assign_to_cohort(request, patient_ids, tasks)
+            
             # Get patient profile
             try:
                 patient_profile = UserProfile.objects.get(id=patient_id, user_type='patient')
-                if patient_profile.provider != request.user.profile:
+                if not request.identity.manages(patient_profile):
                     return self._error_response('You do not have permission to assign tasks to this patient.', 403)
             except UserProfile.DoesNotExist:
                 return self._error_response('Patient not found.', 404)
@@ -195,40 +202,79 @@ class AssignMultipleTasksView(ProviderRequiredMixin, BaseAPIView):
         except Exception as e:
             logger.exception(f'Error assigning multiple tasks: {e}')
             return self._error_response(str(e), 500)
+    
+    def _assign_to_cohort(self, request, patient_ids, tasks):
+        """Assign one task set to many patients in a single batch"""
+        if not isinstance(patient_ids, list):
+            return self._error_response('patient_ids must be a list', 400)
+        
+        # Ids come from JSON, so "3" and 3 are the same patient; anything else isn't an id
+        try:
+            patient_ids = {int(patient_id) for patient_id in patient_ids}
+        except (TypeError, ValueError):
+            return self._error_response('patient_ids must be a list of patient ids', 400)
+        patients = list(
+            UserProfile.objects.filter(id__in=patient_ids, user_type='patient', provider=request.user.profile).only('id')
+        )
+        # Unknown ids and other providers' patients are refused the same way
+        if len(patients) != len(patient_ids):
+            return self._error_response('You do not have permission to assign tasks to all of these patients.', 403)
+        
+        created_tasks = TaskService.assign_tasks(request.user.profile, patients, tasks)
+        
+        return self._success_response(
+            data={'patients': len(patients), 'tasks_created': len(created_tasks)},
+            message=f'{len(created_tasks)} tasks assigned to {len(patients)} patients'
+        )
 
 
-class PatientTasksView(PatientOrCaregiverRequiredMixin, BaseTaskView):
-    """View for patients to see their tasks"""
+class PatientTasksView(ConditionalGetMixin, KeysetPaginationMixin, PatientOrCaregiverRequiredMixin, BaseTaskView):
+    """View for patients to see their tasks, a page of each list at a time"""
     
     def get(self, request, patient_id=None):
-        user_profile = request.user.profile
+        identity = request.identity
         
         if patient_id:
             # Provider is viewing a specific patient's tasks
-            if user_profile.user_type != 'provider':
+            if identity.role != 'provider':
                 messages.error(request, 'You do not have permission to view these tasks.')
                 return redirect('home')
             
-            target_patient_profile = get_object_or_404(UserProfile, id=patient_id, user_type='patient')
+            target_patient_profile = get_object_or_404(UserProfile.objects.select_related('user'), id=patient_id, user_type='patient')
             
             # Ensure provider manages this patient
-            if target_patient_profile.provider != user_profile:
+            if not identity.manages(target_patient_profile):
                 messages.error(request, 'You do not have permission to view tasks for this patient.')
                 return redirect('provider_dashboard')
                 
-            all_tasks = Task.objects.filter(assigned_to=target_patient_profile).order_by('-created_at')
+            tasks_patient_id = target_patient_profile.id
+            all_tasks = TaskService.get_patient_tasks(target_patient_profile)
             page_title = f"Tasks for {target_patient_profile.user.get_full_name()}"
         else:
             # Patient or caregiver is viewing their own assigned tasks
-            if user_profile.user_type not in ['patient', 'caregiver']:
+            if not identity.has_role('patient', 'caregiver'):
                 messages.error(request, 'You must be a patient or caregiver to view this page.')
                 return redirect('home')
                 
-            all_tasks = Task.objects.filter(assigned_to=user_profile).order_by('-created_at')
+            tasks_patient_id = identity.profile_id
+            all_tasks = TaskService.get_patient_tasks(identity.profile_id)
             page_title = "My Tasks"
         
-        pending_tasks = all_tasks.filter(status__in=['assigned', 'in_progress'])
-        completed_tasks = all_tasks.filter(status='completed')
+        # Task writes bump the namespace of the patient they are assigned to
+        etag = self._get_etag(request, caching.patient_namespace(tasks_patient_id))
+        not_modified = self._not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
+        pending_tasks = self._get_page(request, all_tasks.pending(), 'pending')
+        completed_tasks = self._get_page(request, all_tasks.completed(), 'completed')
+        
+        if self._is_load_more(request):
+            list_name = 'completed' if request.GET.get('list') == 'completed' else 'pending'
+            page = completed_tasks if list_name == 'completed' else pending_tasks
+            return self._set_etag(
+                self._load_more_response(request, 'tasks/assign/_patient_task_rows.html', page, list_name=list_name), etag
+            )
         
         context = {
             'pending_tasks': pending_tasks,
@@ -236,7 +282,7 @@ class PatientTasksView(PatientOrCaregiverRequiredMixin, BaseTaskView):
             'page_title': page_title,
         }
         
-        return render(request, 'tasks/assign/patient_tasks.html', context)
+        return self._set_etag(render(request, 'tasks/assign/patient_tasks.html', context), etag)
 
 
 class TakeTaskView(PatientOrCaregiverRequiredMixin, BaseTaskView):
@@ -244,17 +290,16 @@ class TakeTaskView(PatientOrCaregiverRequiredMixin, BaseTaskView):
     
     def get(self, request, task_id):
         task = get_object_or_404(Task, id=task_id)
-        user_profile = request.user.profile
         
         # Permission check (validate task access)
-        if not self._validate_task_access(task, user_profile):
+        if not self._validate_task_access(task, request.identity):
             messages.error(request, 'You do not have permission to access this task.')
-            return redirect(self._get_redirect_url(user_profile))
+            return redirect(self._get_redirect_url(request.identity))
         
         # Check if task is already completed (prevent double submission)
         if task.status == 'completed':
             messages.info(request, 'This task has already been completed.')
-            return redirect(self._get_redirect_url(user_profile))
+            return redirect(self._get_redirect_url(request.identity))
         
         # Get or create task response
         task_response = TaskResponse.objects.get_or_create(task=task)[0]
@@ -263,6 +308,7 @@ class TakeTaskView(PatientOrCaregiverRequiredMixin, BaseTaskView):
         if task.status == 'assigned':
             task.status = 'in_progress'
             task.save()
+            TaskService.invalidate_task_statistics([task.assigned_by_id], [task.assigned_to_id])
         
         # Determine template to render (use template_name with {difficulty} if needed)
         try:
@@ -272,7 +318,7 @@ class TakeTaskView(PatientOrCaregiverRequiredMixin, BaseTaskView):
                 template_name = template_name.format(difficulty=task.difficulty)
         except KeyError:
             messages.error(request, f'No template configuration found for task type: {task.task_type}')
-            return redirect(self._get_redirect_url(user_profile))
+            return redirect(self._get_redirect_url(request.identity))
         
         # Use 'default' config for non-game tasks
         config_dict = DIFFICULTY_CONFIGS.get(task.task_type, {})
@@ -293,7 +339,7 @@ class TakeTaskView(PatientOrCaregiverRequiredMixin, BaseTaskView):
         user_profile = request.user.profile
         
         # Permission check
-        if not self._validate_task_access(task, user_profile):
+        if not self._validate_task_access(task, request.identity):
             return JsonResponse({'success': False, 'message': 'Permission denied'}, status=403)
         
         # Check if task is already completed
@@ -307,9 +353,10 @@ class TakeTaskView(PatientOrCaregiverRequiredMixin, BaseTaskView):
                 logger.info(f"JSON submission received for task {task_id}: {data}")
                 
                 # Use service to complete task
-                TaskService.complete_task(task, user_profile, data)
+                if TaskService.complete_task(task, user_profile, data) is None:
+                    return JsonResponse({'success': False, 'message': 'Task already completed'}, status=400)
                 
-                redirect_url = reverse(self._get_redirect_url(user_profile))
+                redirect_url = reverse(self._get_redirect_url(request.identity))
                 return JsonResponse({'success': True, 'redirect': redirect_url})
                 
             except (json.JSONDecodeError, ValueError) as e:
@@ -329,10 +376,11 @@ class TakeTaskView(PatientOrCaregiverRequiredMixin, BaseTaskView):
                 responses['mood'] = request.POST.get('mood', '')
             
             # Use service to complete task
-            TaskService.complete_task(task, user_profile, responses)
+            if TaskService.complete_task(task, user_profile, responses) is None:
+                return JsonResponse({'success': False, 'message': 'Task already completed'}, status=400)
             
             messages.success(request, f'Successfully completed task: "{task.title}"')
-            return redirect(self._get_redirect_url(user_profile))
+            return redirect(self._get_redirect_url(request.identity))
         
         return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
 
@@ -341,35 +389,18 @@ class TaskResultsView(PatientOrCaregiverRequiredMixin, BaseTaskView):
     """View to display the results of a completed task"""
     
     def get(self, request, task_id):
-        task = get_object_or_404(Task, id=task_id)
-        user_profile = request.user.profile
-        
-        # Permission check
-        is_patient_or_provider = (
-            (user_profile.user_type == 'patient' and task.assigned_to == user_profile) or
-            (user_profile.user_type == 'provider' and task.assigned_by == user_profile)
-        )
-        
-        is_authorized_caregiver = (
-            user_profile.user_type == 'caregiver' and
-            (
-                (user_profile.patient == task.assigned_to and user_profile.provider == task.assigned_by) or
-                (task.completed_by == user_profile)
-            )
-        )
+        # Archived tasks keep their id, so old result links still resolve;
+        # tasks the user may not see are looked up as if they didn't exist
+        task, task_response = ArchiveService.get_task_result(task_id, identity=request.identity)
+        if task is None:
+            raise Http404('No Task matches the given query.')
         
-        if not (is_patient_or_provider or is_authorized_caregiver):
-            messages.error(request, 'You do not have permission to view these task results.')
-            return redirect('home')
-        
-        try:
-            task_response = task.response
-        except TaskResponse.DoesNotExist:
+        if task_response is None:
             messages.error(request, 'No response found for this task.')
-            return redirect(self._get_redirect_url(user_profile))
+            return redirect(self._get_redirect_url(request.identity))
         
         # Determine the correct URL to go back to
-        back_url = reverse(self._get_redirect_url(user_profile))
+        back_url = reverse(self._get_redirect_url(request.identity))
         
         # Determine the correct template based on the task type
         try:
@@ -384,7 +415,7 @@ class TaskResultsView(PatientOrCaregiverRequiredMixin, BaseTaskView):
                 
         except KeyError:
             messages.error(request, f'No results template found for task type: {task.task_type}')
-            return redirect(self._get_redirect_url(user_profile))
+            return redirect(self._get_redirect_url(request.identity))
         
         # Process results if they are in a specific format (e.g., questionnaires)
         processed_results = None
@@ -401,18 +432,41 @@ class TaskResultsView(PatientOrCaregiverRequiredMixin, BaseTaskView):
         return render(request, template_name, context)
 
 
-class ProviderTaskManagementView(ProviderRequiredMixin, BaseTaskView):
-    """Provider view to manage all assigned tasks"""
+class ProviderTaskManagementView(ConditionalGetMixin, KeysetPaginationMixin, ProviderRequiredMixin, BaseTaskView):
+    """Provider view to manage all assigned tasks, a page of each list at a time"""
     
     def get(self, request):
-        assigned_tasks = Task.objects.filter(assigned_by=request.user.profile)
+        # Task writes and patient renames bump the provider's namespace
+        etag = self._get_etag(request, caching.provider_namespace(request.identity.profile_id))
+        not_modified = self._not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
+        assigned_tasks = TaskService.get_provider_tasks(request.user.profile).select_related('assigned_to__user')
+        pages = {
+            'pending': self._get_page(request, assigned_tasks.pending(), 'pending'),
+            'completed': self._get_page(request, assigned_tasks.completed(), 'completed'),
+            # Completed tasks moved out by archive_tasks, still linked to their results
+            'archived': self._get_page(
+                request,
+                ArchiveService.get_archived_tasks(provider_profile=request.user.profile).select_related('assigned_to__user'),
+                'archived',
+                order_field='completed_at',
+            ),
+        }
+        
+        if self._is_load_more(request):
+            list_name = request.GET.get('list') if request.GET.get('list') in pages else 'pending'
+            return self._set_etag(
+                self._load_more_response(request, 'tasks/assign/_provider_task_rows.html', pages[list_name], list_name=list_name), etag
+            )
         
         context = {
-            'assigned_tasks': assigned_tasks,
-            'pending_tasks': assigned_tasks.filter(status__in=['assigned', 'in_progress']),
-            'completed_tasks': assigned_tasks.filter(status='completed'),
+            'pending_tasks': pages['pending'],
+            'completed_tasks': pages['completed'],
+            'archived_tasks': pages['archived'],
         }
-        return render(request, 'tasks/assign/provider_task_management.html', context)
+        return self._set_etag(render(request, 'tasks/assign/provider_task_management.html', context), etag)
 
 
 class DeleteTaskView(ProviderRequiredMixin, BaseAPIView):
@@ -423,13 +477,8 @@ class DeleteTaskView(ProviderRequiredMixin, BaseAPIView):
         is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
         
         try:
-            task = Task.objects.get(id=task_id)
-            if task.assigned_by != request.user.profile:
-                if is_ajax:
-                    return self._error_response('You do not have permission to delete this task.', 403)
-                else:
-                    messages.error(request, 'You do not have permission to delete this task.')
-                    return redirect('provider_dashboard')
+            # Providers can delete the tasks they assigned
+            task = Task.objects.visible_to(request.identity.restricted_to('provider')).get(id=task_id)
             
             # Use service to delete task
             if TaskService.delete_task(task):
@@ -462,13 +511,13 @@ class DeletePatientTasksView(ProviderRequiredMixin, BaseAPIView):
             patient = get_object_or_404(UserProfile, id=patient_id, user_type='patient')
             
             # Security check: ensure the provider manages this patient
-            if patient.provider != request.user.profile:
+            if not request.identity.manages(patient):
                 messages.error(request, 'You do not have permission to delete tasks for this patient.')
                 return redirect('provider_dashboard')
             
-            # Use service to delete patient tasks
-            count = TaskService.delete_patient_tasks(patient)
-            messages.success(request, f'Successfully deleted all {count} tasks for {patient.user.get_full_name()}.')
+            # Deleted by a background job, so a long history doesn't hold up the request
+            JobService.enqueue('delete_patient_tasks', patient_id=patient.id, created_before=timezone.now().isoformat())
+            messages.success(request, f'Deleting all tasks for {patient.user.get_full_name()}. They will be gone in a moment.')
             
         except UserProfile.DoesNotExist:
             messages.error(request, 'Patient not found.')
@@ -485,8 +534,8 @@ class ClearCompletedTasksView(AdminRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request):
         try:
-            count = TaskService.clear_completed_tasks()
-            return self._success_response(message=f'Successfully archived {count} completed tasks')
+            JobService.enqueue('archive_completed_tasks', cutoff=timezone.now().isoformat())
+            return self._success_response(message='Archiving all completed tasks in the background')
         except Exception:
             return self._error_response('An error occurred while archiving tasks', 500)
 
@@ -497,8 +546,8 @@ class ClearAllTasksView(AdminRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request):
         try:
-            count = TaskService.clear_all_tasks()
-            return self._success_response(message=f'Successfully removed all {count} tasks from the system')
+            JobService.enqueue('clear_all_tasks', created_before=timezone.now().isoformat())
+            return self._success_response(message='Removing all tasks from the system in the background')
         except Exception:
             return self._error_response('An error occurred while clearing tasks', 500)
 
@@ -509,8 +558,8 @@ class ClearTaskResponsesView(AdminRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request):
         try:
-            count = TaskService.reset_task_responses()
-            return self._success_response(message=f'Successfully reset {count} task responses')
+            JobService.enqueue('reset_task_responses', created_before=timezone.now().isoformat())
+            return self._success_response(message='Resetting all task responses in the background')
         except Exception:
             return self._error_response('An error occurred while resetting task responses', 500)
 
@@ -522,8 +571,10 @@ class ClearProviderCompletedTasksView(ProviderRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request):
         try:
-            count = TaskService.clear_completed_tasks(request.user.profile)
-            return self._success_response(message=f'Successfully archived {count} completed tasks you assigned')
+            JobService.enqueue(
+                'archive_completed_tasks', provider_id=request.user.profile.id, cutoff=timezone.now().isoformat()
+            )
+            return self._success_response(message='Archiving the completed tasks you assigned in the background')
         except Exception:
             return self._error_response('An error occurred while archiving your completed tasks', 500)
 
@@ -534,8 +585,10 @@ class ClearProviderAllTasksView(ProviderRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request):
         try:
-            count = TaskService.clear_all_tasks(request.user.profile)
-            return self._success_response(message=f'Successfully removed all {count} tasks you assigned')
+            JobService.enqueue(
+                'clear_all_tasks', provider_id=request.user.profile.id, created_before=timezone.now().isoformat()
+            )
+            return self._success_response(message='Removing all tasks you assigned in the background')
         except Exception:
             return self._error_response('An error occurred while removing your tasks', 500)
 
@@ -546,7 +599,9 @@ class ClearProviderTaskResponsesView(ProviderRequiredMixin, BaseAPIView):
     @method_decorator(require_POST)
     def post(self, request):
         try:
-            count = TaskService.reset_task_responses(request.user.profile)
-            return self._success_response(message=f'Successfully reset {count} responses to your tasks')
+            JobService.enqueue(
+                'reset_task_responses', provider_id=request.user.profile.id, created_before=timezone.now().isoformat()
+            )
+            return self._success_response(message='Resetting the responses to your tasks in the background')
         except Exception:
             return self._error_response('An error occurred while resetting your task responses', 500) 
\ No newline at end of file
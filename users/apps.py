@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from django.db.models.signals import m2m_changed, post_delete, post_save
+        from .backends import linked_patients_changed, profile_changed, user_changed
+        from .models import UserProfile
+
+        # drop cached users (users/backends.py) when their rows change
+        post_save.connect(user_changed, sender=User, dispatch_uid='users_user_saved')
+        post_delete.connect(user_changed, sender=User, dispatch_uid='users_user_deleted')
+        post_save.connect(profile_changed, sender=UserProfile, dispatch_uid='users_profile_saved')
+        post_delete.connect(profile_changed, sender=UserProfile, dispatch_uid='users_profile_deleted')
+        m2m_changed.connect(
+            linked_patients_changed, sender=UserProfile.linked_patients.through,
+            dispatch_uid='users_linked_patients_changed',
+        )
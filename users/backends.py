@@ -0,0 +1,79 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from taskmanager.identity import load_identity
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cached user, profile and identity settings
+USER_CACHE_KEY = 'auth:user:{}'
+USER_CACHE_TIMEOUT = 300  # seconds
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the session's user from the cache
+
+    The user is cached with its profile and Identity, so with a cached
+    session backend a warm request runs no auth queries at all. Entries are
+    dropped by invalidate_users whenever a user, profile or caregiver link
+    changes (see the receivers below).
+    """
+
+    def get_user(self, user_id):
+        entry = cache.get(USER_CACHE_KEY.format(user_id))
+        if entry is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            # Loads the profile onto the user as well
+            identity = load_identity(user)
+            cache.set(USER_CACHE_KEY.format(user_id), (user, identity), USER_CACHE_TIMEOUT)
+        else:
+            user, identity = entry
+            if not self.user_can_authenticate(user):
+                return None
+        user.cached_identity = identity
+        return user
+
+    async def aget_user(self, user_id):
+        # ModelBackend's version queries directly, skipping the cache
+        return await sync_to_async(self.get_user)(user_id)
+
+
+def invalidate_users(*user_ids) -> None:
+    """Drop the cached users once the current transaction commits"""
+    keys = [USER_CACHE_KEY.format(user_id) for user_id in user_ids if user_id is not None]
+    if keys:
+        # After commit, so a concurrent request can't cache the old rows again
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_profiles(profiles) -> None:
+    """Drop the cached users of a queryset of profiles"""
+    invalidate_users(*profiles.values_list('user_id', flat=True))
+
+
+# Signal receivers, connected in UsersConfig.ready
+
+def user_changed(sender, instance, **kwargs):
+    invalidate_users(instance.pk)
+
+
+def profile_changed(sender, instance, **kwargs):
+    invalidate_users(instance.user_id)
+
+
+def linked_patients_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_users(instance.user_id)
+    elif action == 'pre_clear':
+        # instance is the patient; clear() does not say which caregivers lose it
+        invalidate_profiles(instance.linked_caregivers.all())
+    else:
+        # instance is the patient, pk_set the caregivers
+        invalidate_profiles(model.objects.filter(pk__in=pk_set))
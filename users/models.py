@@ -1,6 +1,27 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+class UserProfileQuerySet(models.QuerySet):
+
+    def visible_to(self, identity):
+        """
+        Profiles the request's Identity can see
+
+        Admins see everyone; everybody sees themselves, providers also their
+        patients and caregivers, caregivers also their patient.
+        """
+        if identity.role == 'admin':
+            return self
+        if identity.profile_id is None:
+            return self.none()
+        visible = models.Q(pk=identity.profile_id)
+        if identity.role == 'provider':
+            visible |= models.Q(provider_id=identity.profile_id)
+        elif identity.role == 'caregiver' and identity.patient_id:
+            visible |= models.Q(pk=identity.patient_id)
+        return self.filter(visible)
+
+
 # Maps user to their specific role
 class UserProfile(models.Model):
     USER_TYPES = (
@@ -24,6 +45,8 @@ class UserProfile(models.Model):
         blank=True,
         help_text="Patients this caregiver can access"  # Caregivers can see these patients
     )
+
+    objects = UserProfileQuerySet.as_manager()
     
     def __str__(self):
         # user name + user type
@@ -5,14 +5,34 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from .models import UserProfile
 from taskmanager.views import get_task_statistics
-from taskmanager.models import Task, Appointment, DailyChecklistSubmission
+from taskmanager.services.task_service import TaskService
+from taskmanager.services.activity_service import ActivityService
+from taskmanager.services.results_service import ResultsService
+from taskmanager.services.appointment_service import AppointmentService
+from taskmanager.services.job_service import JobService
+from taskmanager.decorators import read_replica
+from taskmanager import caching
+from taskmanager.models import Appointment, DailyChecklistSubmission
+from django.db import transaction
+from django.db.models import Prefetch
 from taskmanager.constants import TASK_TYPES, GAME_TYPES, DIFFICULTY_LEVELS, TASK_TEMPLATES
 import logging
+from datetime import date
 from django.db.utils import IntegrityError
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Days of activity the provider dashboard shows for a selected patient
+DASHBOARD_ACTIVITY_DAYS = 30
+
+# Game results under this accuracy are listed for a selected patient, most recent first
+DASHBOARD_LOW_SCORE_ACCURACY = 0.5
+DASHBOARD_LOW_SCORE_COUNT = 5
+
+# Task columns the dashboard task lists render (plus ordering columns)
+DASHBOARD_TASK_FIELDS = ('id', 'title', 'task_type', 'difficulty', 'status', 'created_at', 'due_date', 'completed_at')
+
 def _handle_login(request, user_type, template_name, redirect_url):
     """Helper function to handle login for different user types"""
     if request.method == 'POST':
@@ -54,13 +74,22 @@ def user_logout(request):
     return redirect('home')
 
 @login_required
+@read_replica
 def admin_dashboard(request):
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'admin':
+    """
+    Admin dashboard
+    
+    Query budget: 7 - session, user, profile, task statistics and archive
+    count (cached), providers and their patients (prefetch).
+    """
+    if not request.identity.has_role('admin'):
         messages.error(request, 'You do not have permission to access the admin dashboard.')
         return redirect('home')
     
     # Get all users by role using direct database queries
-    providers = UserProfile.objects.filter(user_type='provider').select_related('user')
+    providers = UserProfile.objects.filter(user_type='provider').select_related('user').prefetch_related(
+        Prefetch('managed_patients', queryset=UserProfile.objects.select_related('user'))
+    )
     caregivers = UserProfile.objects.filter(user_type='caregiver').select_related('user')
     patients = UserProfile.objects.filter(user_type='patient').select_related('user')
     
@@ -79,7 +108,7 @@ def admin_dashboard(request):
 
 @login_required
 def create_provider(request):
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'admin':
+    if not request.identity.has_role('admin'):
         messages.error(request, 'You do not have permission to create provider accounts.')
         return redirect('home')
     
@@ -120,32 +149,61 @@ def create_provider(request):
 
 @login_required
 def provider_dashboard(request):
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'provider':
+    """
+    Provider dashboard
+    
+    Query budget: 9 on GET - session, user, profile, task statistics and archive
+    count (cached), patient ids, then for the panels (cached fragments) patients,
+    their caregivers and appointments (prefetch), caregivers with their patient.
+    Selecting a patient (POST) adds 5: the patient, their tasks, two
+    reads of the activity rollup for the last 30 days and their low game
+    scores, live and archived.
+    """
+    if not request.identity.has_role('provider'):
         messages.error(request, 'You do not have permission to access the provider dashboard.')
         return redirect('home')
     
     provider_profile = request.user.profile
-    patients = UserProfile.objects.filter(user_type='patient', provider=provider_profile)
-    provider_patient_ids = patients.values_list('id', flat=True)
+    patients = UserProfile.objects.filter(
+        user_type='patient', provider=provider_profile
+    ).select_related('user').prefetch_related(
+        Prefetch('caregivers', queryset=UserProfile.objects.select_related('user')),
+        Prefetch('appointments', queryset=Appointment.objects.only('id', 'patient_id', 'datetime')),
+    )
+    provider_patient_ids = list(UserProfile.objects.filter(
+        user_type='patient', provider=provider_profile
+    ).values_list('id', flat=True))
     caregivers = UserProfile.objects.filter(
         user_type='caregiver',
         patient__in=provider_patient_ids
+    ).select_related('user', 'patient__user')
+    # The panels only query patients and caregivers when their fragments miss
+    dashboard_version = caching.make_key(
+        'provider_dashboard',
+        caching.provider_namespace(provider_profile.id),
+        *(caching.patient_namespace(patient_id) for patient_id in provider_patient_ids),
     )
-    task_statistics = get_task_statistics()
-    recent_tasks = Task.objects.filter(
-        assigned_by=provider_profile
-    ).select_related('assigned_to__user').order_by('-created_at')[:10]
+    task_statistics = get_task_statistics(provider_profile=provider_profile)
+    recent_tasks = TaskService.get_provider_tasks(provider_profile).select_related('assigned_to__user')[:10]
     
     # Handle patient selection for task management
     selected_patient = None
     patient_tasks = []
     daily_checklists = []
+    patient_activity = None
+    low_scores = []
     if request.method == 'POST' and 'selected_patient' in request.POST:
         selected_patient_id = request.POST['selected_patient']
         try:
-            selected_patient = UserProfile.objects.get(id=selected_patient_id, user_type='patient', provider=provider_profile)
-            patient_tasks = Task.objects.filter(assigned_to=selected_patient, assigned_by=provider_profile)
+            selected_patient = UserProfile.objects.select_related('user').get(
+                id=selected_patient_id, user_type='patient', provider=provider_profile
+            )
+            patient_tasks = TaskService.get_patient_tasks(selected_patient).filter(
+                assigned_by=provider_profile
+            ).only(*DASHBOARD_TASK_FIELDS)
             daily_checklists = DailyChecklistSubmission.objects.filter(patient=selected_patient).order_by('-submission_date')
+            patient_activity = _get_patient_activity(selected_patient, provider_profile)
+            low_scores = _get_low_scores(selected_patient)
         except UserProfile.DoesNotExist:
             selected_patient = None
             patient_tasks = []
@@ -166,12 +224,37 @@ def provider_dashboard(request):
         'selected_patient': selected_patient,
         'patient_tasks': patient_tasks,
         'daily_checklists': daily_checklists,
+        'patient_activity': patient_activity,
+        'low_scores': low_scores,
+        'dashboard_version': dashboard_version,
     }
     return render(request, 'dashboards/provider_dashboard.html', context)
 
+def _get_patient_activity(patient_profile, provider_profile):
+    """A patient's recent activity on this provider's tasks, from the rollup"""
+    daily = ActivityService.get_daily_trend(patient_profile, provider_profile, DASHBOARD_ACTIVITY_DAYS)
+    task_types = ActivityService.get_task_type_totals(patient_profile, provider_profile, DASHBOARD_ACTIVITY_DAYS)
+    type_names = dict(TASK_TYPES)
+    for row in task_types:
+        row['name'] = type_names.get(row['task_type'], row['task_type'])
+    return {
+        'days': DASHBOARD_ACTIVITY_DAYS,
+        'active_days': sum(1 for row in daily if row['tasks_completed'] or row['checklists_submitted']),
+        'checklists_submitted': sum(row['checklists_submitted'] for row in daily),
+        'task_types': task_types,
+    }
+
+def _get_low_scores(patient_profile):
+    """A patient's most recent game results under DASHBOARD_LOW_SCORE_ACCURACY"""
+    low_scores = list(ResultsService.get_low_scores(patient_profile, DASHBOARD_LOW_SCORE_ACCURACY)[:DASHBOARD_LOW_SCORE_COUNT])
+    type_names = dict(TASK_TYPES)
+    for row in low_scores:
+        row['name'] = type_names.get(row['task_type'], row['task_type'])
+    return low_scores
+
 @login_required
 def create_patient(request):
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'provider':
+    if not request.identity.has_role('provider'):
         messages.error(request, 'You do not have permission to create patient accounts.')
         return redirect('home')
     
@@ -215,7 +298,7 @@ def create_patient(request):
 
 @login_required
 def create_caregiver(request):
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'provider':
+    if not request.identity.has_role('provider'):
         messages.error(request, 'You do not have permission to create caregiver accounts.')
         return redirect('home')
     
@@ -243,28 +326,32 @@ def create_caregiver(request):
 
 @login_required
 def caregiver_dashboard(request):
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'caregiver':
+    """
+    Caregiver dashboard
+    
+    Query budget: 8 - session, user, profile, patient, appointments with provider
+    and today's checklist (cached), pending and completed tasks (cached fragment).
+    """
+    if not request.identity.has_role('caregiver'):
         messages.error(request, 'You do not have permission to access the caregiver dashboard.')
         return redirect('home')
     
-    caregiver_profile = request.user.profile
     patients_with_tasks = []
     
     # Get the assigned patient
-    if caregiver_profile.patient:
-        patient = caregiver_profile.patient
-        completed_tasks = Task.objects.filter(assigned_to=patient, status='completed').order_by('-completed_at')
-        pending_tasks = Task.objects.filter(
-            assigned_to=patient,
-            status__in=['assigned', 'in_progress']
-        ).order_by('due_date', 'created_at')
+    patient = None
+    if request.identity.patient_id:
+        patient = UserProfile.objects.select_related('user').filter(id=request.identity.patient_id).first()
+    if patient:
+        completed_tasks = TaskService.get_patient_completed_tasks(patient).only(*DASHBOARD_TASK_FIELDS)
+        pending_tasks = TaskService.get_patient_pending_tasks(patient).only(*DASHBOARD_TASK_FIELDS)
         
         # Get patient's appointments
-        appointments = Appointment.objects.filter(patient=patient).order_by('datetime')
+        appointments = AppointmentService.get_patient_appointments(patient)
         
-        # Get daily checklist information
-        daily_checklist_submitted = not DailyChecklistSubmission.can_submit_today(patient)
+        # Get daily checklist information (one lookup)
         today_submission = DailyChecklistSubmission.get_today_submission(patient)
+        daily_checklist_submitted = today_submission is not None
         
         patients_with_tasks.append({
             'patient': patient,
@@ -272,32 +359,39 @@ def caregiver_dashboard(request):
             'completed_tasks': completed_tasks,
             'appointments': appointments,
             'daily_checklist_submitted': daily_checklist_submitted,
-            'today_submission': today_submission
+            'today_submission': today_submission,
+            'dashboard_version': caching.make_key('caregiver_dashboard', caching.patient_namespace(patient.id)),
         })
     
     context = {
         'user': request.user,
         'user_type': 'Caregiver',
-        'patients_with_tasks': patients_with_tasks
+        'patients_with_tasks': patients_with_tasks,
+        # The checklist panel changes at midnight without any write
+        'today': date.today(),
     }
     return render(request, 'dashboards/caregiver_dashboard.html', context)
 
 @login_required
 def patient_dashboard(request):
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'patient':
+    """
+    Patient dashboard
+    
+    Query budget: 6 - session, user, profile, appointments with provider and
+    today's checklist (cached), pending tasks (cached fragment).
+    """
+    if not request.identity.has_role('patient'):
         messages.error(request, 'You do not have permission to access the patient dashboard.')
         return redirect('home')
     
     # Fetch all pending tasks for the patient
-    pending_tasks = Task.objects.filter(
-        assigned_to=request.user.profile,
-        status__in=['assigned', 'in_progress']
-    ).order_by('due_date', 'created_at')
-    appointments = Appointment.objects.filter(patient=request.user.profile).order_by('datetime')
+    patient_id = request.identity.profile_id
+    pending_tasks = TaskService.get_patient_pending_tasks(patient_id).only(*DASHBOARD_TASK_FIELDS)
+    appointments = AppointmentService.get_patient_appointments(patient_id)
     
-    # Get daily checklist information
-    daily_checklist_submitted = not DailyChecklistSubmission.can_submit_today(request.user.profile)
-    today_submission = DailyChecklistSubmission.get_today_submission(request.user.profile)
+    # Get daily checklist information (one lookup)
+    today_submission = DailyChecklistSubmission.get_today_submission(patient_id)
+    daily_checklist_submitted = today_submission is not None
     
     context = {
         'user': request.user,
@@ -305,7 +399,10 @@ def patient_dashboard(request):
         'pending_tasks': pending_tasks,
         'appointments': appointments,
         'daily_checklist_submitted': daily_checklist_submitted,
-        'today_submission': today_submission
+        'today_submission': today_submission,
+        'dashboard_version': caching.make_key('patient_dashboard', caching.patient_namespace(patient_id)),
+        # The checklist panel changes at midnight without any write
+        'today': date.today(),
     }
     return render(request, 'dashboards/patient_dashboard.html', context)
 
@@ -345,15 +442,15 @@ def manage_account(request, user_id):
 @login_required
 def assign_caregiver(request, patient_id):
     """View for providers to assign caregivers to patients"""
-    if not hasattr(request.user, 'profile') or request.user.profile.user_type != 'provider':
+    if not request.identity.has_role('provider'):
         messages.error(request, 'You do not have permission to assign caregivers.')
         return redirect('home')
     
     try:
-        patient = UserProfile.objects.get(id=patient_id, user_type='patient')
+        patient = UserProfile.objects.select_related('user').get(id=patient_id, user_type='patient')
         
         # Verify provider manages this patient
-        if patient.provider != request.user.profile:
+        if not request.identity.manages(patient):
             messages.error(request, 'You do not have permission to manage this patient.')
             return redirect('provider_dashboard')
         
@@ -361,7 +458,7 @@ def assign_caregiver(request, patient_id):
         available_caregivers = UserProfile.objects.filter(
             user_type='caregiver',
             provider=request.user.profile
-        )
+        ).select_related('user')
         
         if request.method == 'POST':
             caregiver_id = request.POST.get('caregiver')
@@ -380,7 +477,7 @@ def assign_caregiver(request, patient_id):
                         caregiver.save()
                         messages.success(request, f'Successfully assigned {caregiver.user.get_full_name()} to {patient.user.get_full_name()}')
                     elif action == 'unassign':
-                        if caregiver.patient == patient:
+                        if caregiver.patient_id == patient.id:
                             caregiver.patient = None
                             caregiver.save()
                             messages.success(request, f'Successfully unassigned {caregiver.user.get_full_name()} from {patient.user.get_full_name()}')
@@ -410,10 +507,10 @@ def delete_account(request, user_id):
         
         # Check permissions
         if not request.user.is_superuser:  # Admin can delete any account
-            if request.user.profile.user_type == 'provider':
+            if request.identity.role == 'provider':
                 # Provider can only delete their patients/caregivers
                 if not hasattr(user_to_delete, 'profile') or \
-                   user_to_delete.profile.provider != request.user.profile or \
+                   user_to_delete.profile.provider_id != request.identity.profile_id or \
                    user_to_delete == request.user:
                     messages.error(request, 'You do not have permission to delete this account.')
                     return redirect('provider_dashboard')
@@ -424,34 +521,15 @@ def delete_account(request, user_id):
                     return redirect('home')
         
         if request.method == 'POST':
-            # Delete related tasks first
-            if hasattr(user_to_delete, 'profile'):
-                from taskmanager.models import Task, TaskResponse, TaskNotification
-                
-                # Delete tasks where user is assigned to or assigned by
-                tasks = Task.objects.filter(
-                    assigned_to=user_to_delete.profile
-                ) | Task.objects.filter(
-                    assigned_by=user_to_delete.profile
-                )
-                
-                # Delete related task data
-                TaskResponse.objects.filter(task__in=tasks).delete()
-                TaskNotification.objects.filter(task__in=tasks).delete()
-                tasks.delete()
-                
-                # If provider, reassign their patients/caregivers
-                if user_to_delete.profile.user_type == 'provider':
-                    UserProfile.objects.filter(provider=user_to_delete.profile).update(provider=None)
-                
-                # Delete the profile
-                user_to_delete.profile.delete()
-            
-            # Delete the user
+            # Sign the account out now; its tasks, history and profile can take
+            # a while to delete, so a background job removes them with the user
             username = user_to_delete.username
-            user_to_delete.delete()
+            with transaction.atomic():
+                user_to_delete.is_active = False
+                user_to_delete.save(update_fields=['is_active'])
+                JobService.enqueue('delete_account', user_id=user_to_delete.id)
             
-            messages.success(request, f'Account "{username}" has been deleted successfully.')
+            messages.success(request, f'Account "{username}" has been deleted. Its data will be gone in a moment.')
             
             # If user deleted their own account, log them out
             if user_to_delete == request.user:
@@ -459,7 +537,7 @@ def delete_account(request, user_id):
                 return redirect('home')
             
             # Otherwise return to appropriate dashboard
-            if request.user.profile.user_type == 'admin':
+            if request.identity.role == 'admin':
                 return redirect('admin_dashboard')
             return redirect('provider_dashboard')
         